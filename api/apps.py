@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from . import checks  # noqa: F401
+        from .search import ensure_triggers
+        from .sharding import reserve_id_ranges
+
+        post_migrate.connect(ensure_triggers, sender=self)
+        post_migrate.connect(reserve_id_ranges, sender=self)
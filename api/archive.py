@@ -0,0 +1,219 @@
+"""
+Hot/cold partitioning of posts.
+
+``posts``, ``likes`` and ``comments`` hold the hot partition.
+``manage.py archive_posts`` moves posts older than ``ARCHIVE_AFTER_DAYS``,
+with their likes and comments, to ``posts_archive``, ``likes_archive`` and
+``comments_archive`` (same columns, same ids), ``ARCHIVE_BATCH_SIZE`` posts
+per transaction. The hot tables and their indexes then stay the size of
+the recent past, whatever the age of the site.
+
+* A feed page reads hot posts only, down to the newest archived post (the
+  watermark, cached for ``ARCHIVE_WATERMARK_TTL`` seconds). A page that
+  reaches past it is completed from the archive and merged on
+  (created_at, id), so scrolling into the archive is seamless. The
+  unpaged feed merges both partitions in full.
+* A post's detail and comments are read from the archive when it is not
+  hot; writes to an archived post (likes, comments, deletion) first move
+  it back with ``restore_post``.
+
+What is derived from hot posts is dropped on archival: full-text search
+rows (by the ``posts_fts`` triggers), hashtag and mention references,
+trending scores and notifications. Restoring a post indexes its hashtags
+and mentions again.
+
+With sharding (see api.sharding) each shard archives its own posts, and
+the feed merges the hot and cold pages of every shard.
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import (
+    ArchivedComment,
+    ArchivedLike,
+    ArchivedPost,
+    Comment,
+    HashtagUse,
+    Like,
+    Mention,
+    Post,
+    PostScore
+)
+from .notifications import forget_posts
+from .pagination import decode_cursor, encode_cursor
+from .sharding import aliases, get_by_id, merge, shard_of, using
+from .tags import index_references
+from .trending import forget_post
+
+# (hot model, archive model, column holding the post id), parents first.
+PARTITIONS = [
+    (Post, ArchivedPost, 'id'),
+    (Like, ArchivedLike, 'post_id'),
+    (Comment, ArchivedComment, 'post_id'),
+]
+
+WATERMARK_KEY = 'archive:newest'
+
+
+def get_cache():
+    return caches[settings.ARCHIVE_CACHE_ALIAS]
+
+
+def _move(cursor, source, target, column, post_ids):
+    """Move the rows of post_ids from source's table to target's."""
+    quote = cursor.db.ops.quote_name
+    source_table = quote(source._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in target._meta.concrete_fields)
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    where = f'{quote(column)} IN ({placeholders})'
+    cursor.execute(
+        f'INSERT INTO {quote(target._meta.db_table)} ({columns}) '
+        f'SELECT {columns} FROM {source_table} WHERE {where}',
+        post_ids
+    )
+    cursor.execute(f'DELETE FROM {source_table} WHERE {where}', post_ids)
+
+
+def archive_batch(post_ids, alias=None):
+    """
+    Move hot posts with their likes and comments to the archive, on shard
+    alias if given.
+    """
+    with transaction.atomic(using=alias):
+        forget_posts(post_ids)
+        using(HashtagUse.objects, alias).filter(post_id__in=post_ids).delete()
+        using(Mention.objects, alias).filter(post_id__in=post_ids).delete()
+        PostScore.objects.filter(post_id__in=post_ids).delete()
+        with connections[alias or DEFAULT_DB_ALIAS].cursor() as cursor:
+            for hot, archive, column in PARTITIONS:
+                _move(cursor, hot, archive, column, post_ids)
+    for post_id in post_ids:
+        forget_post(post_id)
+
+
+def archive_posts(days=None, batch_size=None, progress=None):
+    """
+    Archive live posts older than days (ARCHIVE_AFTER_DAYS), oldest first,
+    batch_size posts per transaction. progress(rows) is called after each
+    batch; return the number of posts archived.
+    """
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    total = 0
+    for alias in aliases():
+        while True:
+            post_ids = list(
+                using(Post.objects, alias).filter(created_at__lt=cutoff).order_by(
+                    'created_at', 'id'
+                ).values_list('id', flat=True)[:batch_size]
+            )
+            if not post_ids:
+                break
+            archive_batch(post_ids, alias)
+            get_cache().delete(WATERMARK_KEY)
+            total += len(post_ids)
+            if progress:
+                progress(total)
+            time.sleep(settings.ARCHIVE_BATCH_PAUSE)
+    return total
+
+
+def restore_post(post_id):
+    """
+    Move an archived live post back to the hot tables; return whether there
+    was one.
+    """
+    post = get_by_id(ArchivedPost.objects, post_id)
+    if post is None:
+        return False
+    alias = shard_of(post)
+    with transaction.atomic(using=alias):
+        with connections[alias or DEFAULT_DB_ALIAS].cursor() as cursor:
+            for hot, archive, column in reversed(PARTITIONS):
+                _move(cursor, archive, hot, column, [post_id])
+        index_references([
+            (post.id, None, post.author_id, post.created_at, post.content),
+            *(
+                (post.id, comment_id, author_id, created_at, content)
+                for comment_id, author_id, created_at, content in
+                using(Comment.objects, alias).filter(post_id=post_id).values_list(
+                    'id', 'author_id', 'created_at', 'content'
+                )
+            )
+        ], alias)
+    return True
+
+
+def watermark():
+    """created_at of the newest archived post, or None when there is none."""
+    cache = get_cache()
+    entry = cache.get(WATERMARK_KEY)
+    if entry is None:
+        newest = [
+            using(ArchivedPost.all_objects, alias).aggregate(
+                newest=Max('created_at')
+            )['newest']
+            for alias in aliases()
+        ]
+        entry = (max(filter(None, newest), default=None),)
+        cache.set(WATERMARK_KEY, entry, settings.ARCHIVE_WATERMARK_TTL)
+    return entry[0]
+
+
+def _key(post):
+    return (post.created_at, post.id)
+
+
+def feed_page(hot, cold, limit=None, cursor=None):
+    """
+    Return (posts, next_cursor): posts from the hot and cold (archived)
+    querysets, one of each per shard, newest first, the cold ones only
+    queried when the page reaches the archive. Without limit (and cursor),
+    every post, hot and cold, is returned.
+    """
+    if cursor:
+        created_at, post_id = decode_cursor(cursor, datetime, int)
+        after = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id)
+        hot = [queryset.filter(after) for queryset in hot]
+        cold = [queryset.filter(after) for queryset in cold]
+    hot = [queryset.order_by('-created_at', '-id') for queryset in hot]
+    if limit is None:
+        cold = [queryset.order_by('-created_at', '-id') for queryset in cold]
+        return merge([list(queryset) for queryset in hot + cold], _key), None
+
+    newest_cold = watermark()
+    page = merge([list(queryset[:limit + 1]) for queryset in hot], _key, limit + 1)
+    reaches_archive = newest_cold is not None and (
+        len(page) <= limit or page[limit - 1].created_at <= newest_cold
+    )
+    if reaches_archive:
+        page = merge(
+            [page] + [
+                list(queryset.order_by('-created_at', '-id')[:limit + 1])
+                for queryset in cold
+            ],
+            _key,
+            limit + 1
+        )
+    next_cursor = None
+    if len(page) > limit:
+        next_cursor = encode_cursor(*_key(page[limit - 1]))
+    return page[:limit], next_cursor
+
+
+def find_post(post_id, hot=None, cold=None):
+    """
+    The live post with post_id from hot (Post.objects) or else from cold
+    (ArchivedPost.objects), on whichever shard has it, or None.
+    """
+    post = get_by_id(Post.objects if hot is None else hot, post_id)
+    if post is None:
+        post = get_by_id(ArchivedPost.objects if cold is None else cold, post_id)
+    return post
@@ -3,12 +3,18 @@ from rest_framework.permissions import BasePermission
 from rest_framework.exceptions import AuthenticationFailed
 from django.core import signing
 from django.conf import settings
+from django.db.models import F
 from .models import Member
 
 
 class CookieAuthentication(BaseAuthentication):
     """
     Custom authentication class that uses HttpOnly cookies for session management.
+
+    The cookie carries the member's session generation at login. Logging out
+    increments ``Member.session_generation``, which revokes every cookie
+    issued before; the check reads the member row authentication loads
+    anyway, so revocation costs no extra query and holds across workers.
     """
 
     def authenticate(self, request):
@@ -23,15 +29,19 @@ class CookieAuthentication(BaseAuthentication):
         
         try:
             # Verify and decode the signed cookie
-            member_id = signing.loads(
+            payload = signing.loads(
                 session_id,
                 key=settings.SECRET_KEY,
                 max_age=60 * 60 * 24 * 7  # 7 days
             )
+            # Cookies issued before generations existed hold the bare id.
+            if isinstance(payload, list):
+                member_id, generation = payload
+            else:
+                member_id, generation = payload, 0
             
             # Retrieve the member from database
             member = Member.objects.get(id=member_id)
-            return (member, None)
             
         except signing.SignatureExpired:
             raise AuthenticationFailed('Session expired')
@@ -42,6 +52,10 @@ class CookieAuthentication(BaseAuthentication):
         except Exception:
             return None
 
+        if member.session_generation != generation:
+            raise AuthenticationFailed('Session revoked')
+        return (member, None)
+
 
 class IsAuthenticatedMember(BasePermission):
     """
@@ -59,16 +73,31 @@ class IsAuthenticatedMember(BasePermission):
         )
 
 
-def set_auth_cookie(response, member_id):
+def session_token(member):
+    """Signed session_id value for member's current session generation."""
+    return signing.dumps(
+        [member.id, member.session_generation],
+        key=settings.SECRET_KEY
+    )
+
+
+def revoke_sessions(member):
+    """Invalidate every session cookie issued to member so far."""
+    Member.all_objects.filter(id=member.id).update(
+        session_generation=F('session_generation') + 1
+    )
+    member.session_generation += 1
+
+
+def set_auth_cookie(response, member):
     """
     Set HttpOnly authentication cookie on the response.
     
     Args:
         response: Django Response object
-        member_id: ID of the member to authenticate
+        member: Member to authenticate
     """
-    # Sign the member_id
-    signed_value = signing.dumps(member_id, key=settings.SECRET_KEY)
+    signed_value = session_token(member)
     
     # Set the cookie with secure options
     response.set_cookie(
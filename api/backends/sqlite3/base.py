@@ -0,0 +1,23 @@
+"""
+SQLite backend for the shards after the primary in DATABASE_SHARDS.
+
+Rows on these shards reference members kept on the primary (see
+api.sharding). Foreign keys are therefore not enforced, nor checked after
+schema changes as the stock backend does. The primary uses the stock
+backend and enforces them.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        conn.execute('PRAGMA foreign_keys = OFF')
+        return conn
+
+    def enable_constraint_checking(self):
+        pass
+
+    def check_constraints(self, table_names=None):
+        pass
@@ -0,0 +1,292 @@
+"""
+Online SQLite backups.
+
+``create_backup()`` copies the live database with SQLite's online backup
+API ``BACKUP_STEP_PAGES`` pages at a time, pausing ``BACKUP_STEP_PAUSE``
+seconds between steps.
+
+* In WAL mode (the default, see ``DATABASES``) the copy runs inside one
+  read transaction, so it is a consistent snapshot of the moment it began
+  and writers are never blocked.
+* With a rollback journal each step holds a shared lock, so a writer waits
+  for at most one step. SQLite restarts the copy when another connection
+  writes mid-copy; after ``BACKUP_MAX_RESTARTS`` restarts the rest is
+  copied in a single step so a busy database still gets backed up.
+
+Snapshots are gzip-compressed into ``BACKUP_DIR`` as
+``db-<UTC timestamp>.sqlite3.gz``, and only the newest ``BACKUP_KEEP`` are
+kept. ``restore_backup()`` checks a snapshot's integrity and copies it back
+into the live database through the same API, so open connections see the
+restored data rather than a file swapped underneath them.
+
+With ``DATABASE_SHARDS`` configured every shard is copied too, one after the
+other, into ``db-<UTC timestamp>.<alias>.sqlite3.gz`` next to the primary's
+snapshot; the files of one run are listed, rotated and restored together.
+Each file is consistent on its own, but the shards are copied at slightly
+different moments.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from . import sharding
+
+BACKUP_PREFIX = 'db-'
+BACKUP_SUFFIXES = ('.sqlite3.gz', '.sqlite3')
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    """Raised when a snapshot cannot be taken or restored."""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+class BackupProgress:
+    """
+    Progress callback for Connection.backup: pauses between steps and
+    counts restarts caused by concurrent writes.
+    """
+
+    def __init__(self, pause, max_restarts):
+        self.pause = pause
+        self.max_restarts = max_restarts
+        self.steps = 0
+        self.restarts = 0
+        self.remaining = None
+
+    def __call__(self, status, remaining, total):
+        self.steps += 1
+        if self.remaining is not None and remaining > self.remaining:
+            self.restarts += 1
+            if self.restarts > self.max_restarts:
+                raise _TooManyRestarts()
+        self.remaining = remaining
+        if remaining and self.pause:
+            time.sleep(self.pause)
+
+
+def backup_aliases():
+    """Aliases of the databases a snapshot covers, the primary first."""
+    return list(sharding.get_shards()) or [DEFAULT_DB_ALIAS]
+
+
+def database_path(alias=DEFAULT_DB_ALIAS):
+    name = str(connections[alias].settings_dict['NAME'])
+    if name == ':memory:' or 'mode=memory' in name:
+        raise BackupError('In-memory databases cannot be backed up')
+    return name
+
+
+def copy_database(source_path, target_path, pages=None, pause=None, max_restarts=None):
+    """
+    Copy a live database into target_path step by step and return the
+    BackupProgress describing the copy.
+    """
+    pages = settings.BACKUP_STEP_PAGES if pages is None else pages
+    pause = settings.BACKUP_STEP_PAUSE if pause is None else pause
+    max_restarts = (
+        settings.BACKUP_MAX_RESTARTS if max_restarts is None else max_restarts
+    )
+    progress = BackupProgress(pause, max_restarts)
+    source = sqlite3.connect(source_path, timeout=30, isolation_level=None)
+    target = sqlite3.connect(target_path)
+    try:
+        mode = source.execute('PRAGMA journal_mode').fetchone()[0]
+        if mode == 'wal':
+            # Pin the snapshot: later commits go to the WAL, unseen by the
+            # copy, and do not restart it.
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except _TooManyRestarts:
+            # Writes keep invalidating the copy; take the rest in one step.
+            source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    return progress
+
+
+def check_integrity(path):
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute('PRAGMA quick_check').fetchone()[0]
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise BackupError(f'{path} failed the integrity check: {result}')
+
+
+def backup_stamp(when=None):
+    when = when or timezone.now()
+    return f'{when:%Y%m%dT%H%M%S%fZ}'
+
+
+def _parse_name(name):
+    """(timestamp, alias) of a snapshot file name, or None."""
+    if not name.startswith(BACKUP_PREFIX):
+        return None
+    for suffix in BACKUP_SUFFIXES:
+        if name.endswith(suffix):
+            stamp, _, alias = name[len(BACKUP_PREFIX):-len(suffix)].partition('.')
+            return stamp, alias or DEFAULT_DB_ALIAS
+    return None
+
+
+def snapshot_name(stamp, alias, compress=True):
+    alias_part = '' if alias == DEFAULT_DB_ALIAS else f'.{alias}'
+    return f'{BACKUP_PREFIX}{stamp}{alias_part}{BACKUP_SUFFIXES[0 if compress else 1]}'
+
+
+def list_backups(directory=None):
+    """Paths of the primary's snapshots in directory, newest first."""
+    directory = str(directory or settings.BACKUP_DIR)
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        (
+            name for name in os.listdir(directory)
+            if (_parse_name(name) or (None, None))[1] == DEFAULT_DB_ALIAS
+        ),
+        reverse=True
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+def snapshot_files(path):
+    """
+    The files of the snapshot whose primary file is at path, as
+    {alias: path}.
+    """
+    directory, name = os.path.split(path)
+    parsed = _parse_name(name)
+    if parsed is None or parsed[1] != DEFAULT_DB_ALIAS:
+        raise BackupError(f'{path} is not a snapshot of the primary database')
+    files = {}
+    for other in os.listdir(directory or '.'):
+        other_parsed = _parse_name(other)
+        if other_parsed and other_parsed[0] == parsed[0]:
+            files[other_parsed[1]] = os.path.join(directory, other)
+    return files
+
+
+def rotate_backups(keep=None, directory=None):
+    """Delete all but the newest keep snapshots; return the deleted paths."""
+    keep = settings.BACKUP_KEEP if keep is None else keep
+    expired = [
+        file_path
+        for path in list_backups(directory)[keep:]
+        for file_path in snapshot_files(path).values()
+    ]
+    for path in expired:
+        os.unlink(path)
+    return expired
+
+
+def _snapshot(alias, final_path, compress, copy_options):
+    directory = os.path.dirname(final_path)
+    fd, snapshot = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        progress = copy_database(database_path(alias), snapshot, **copy_options)
+        if compress:
+            fd, compressed = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as raw, open(snapshot, 'rb') as src:
+                    with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as out:
+                        shutil.copyfileobj(src, out, COPY_CHUNK_SIZE)
+                os.replace(compressed, final_path)
+            except BaseException:
+                os.unlink(compressed)
+                raise
+        else:
+            os.replace(snapshot, final_path)
+    finally:
+        if os.path.exists(snapshot):
+            os.unlink(snapshot)
+    return progress
+
+
+def create_backup(directory=None, compress=True, keep=None, **copy_options):
+    """
+    Snapshot the primary and every shard into directory, rotate old
+    snapshots and return [(alias, path, BackupProgress)], the primary first.
+    """
+    directory = str(directory or settings.BACKUP_DIR)
+    os.makedirs(directory, exist_ok=True)
+    stamp = backup_stamp()
+
+    written = []
+    try:
+        # The shards first: the primary's file, written last, is what marks
+        # the snapshot as complete for list_backups().
+        for alias in reversed(backup_aliases()):
+            path = os.path.join(directory, snapshot_name(stamp, alias, compress))
+            progress = _snapshot(alias, path, compress, copy_options)
+            written.insert(0, (alias, path, progress))
+    except BaseException:
+        for _, path, _ in written:
+            os.unlink(path)
+        raise
+
+    rotate_backups(keep, directory)
+    return written
+
+
+def restore_backup(path):
+    """
+    Replace the contents of the primary and every shard with the snapshot
+    whose primary file is at path.
+
+    Writers are blocked while each copy runs; readers see either the old or
+    the restored database. Nothing is restored unless the snapshot covers
+    exactly the configured databases and every file passes the integrity
+    check.
+    """
+    files = snapshot_files(path)
+    aliases = backup_aliases()
+    missing = [alias for alias in aliases if alias not in files]
+    extra = sorted(set(files) - set(aliases))
+    if missing or extra:
+        raise BackupError(
+            f'{path} does not match the configured databases '
+            f'(missing: {", ".join(missing) or "none"}; '
+            f'not configured: {", ".join(extra) or "none"})'
+        )
+
+    restored = {}
+    try:
+        for alias in aliases:
+            target_path = database_path(alias)
+            fd, restored[alias] = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(target_path)),
+                suffix='.restore'
+            )
+            opener = gzip.open if files[alias].endswith('.gz') else open
+            with opener(files[alias], 'rb') as src, os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(src, out, COPY_CHUNK_SIZE)
+            check_integrity(restored[alias])
+
+        for alias in aliases:
+            connections[alias].close()
+            source = sqlite3.connect(restored[alias])
+            target = sqlite3.connect(database_path(alias), timeout=60)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+    finally:
+        for restored_path in restored.values():
+            os.unlink(restored_path)
@@ -0,0 +1,997 @@
+"""
+Benchmark suite run by ``manage.py benchmark``.
+
+Each benchmark is a function registered with ``@benchmark(name)``. It gets
+the parsed command options, runs against a throwaway database created by
+the command, and returns a dict of metrics to report.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+REGISTRY = {}
+
+
+def benchmark(name):
+    """Register a benchmark function under name."""
+    def register(func):
+        REGISTRY[name] = func
+        return func
+    return register
+
+
+@contextmanager
+def timer(results, key):
+    """Store the wall time of the block in results[key] (seconds)."""
+    start = time.perf_counter()
+    yield
+    results[key] = round(time.perf_counter() - start, 4)
+
+
+class StatementTimer:
+    """
+    Execute wrapper recording the slowest statement, i.e. the longest time
+    the database was held by a single write.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.slowest = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.slowest = max(self.slowest, time.perf_counter() - start)
+
+
+def insert_rows(table, columns, rows, batch_size=10000):
+    """Insert raw rows quickly, bypassing the ORM."""
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(table),
+        ', '.join(quote(column) for column in columns),
+        ', '.join(['%s'] * len(columns))
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+def seed_members(count, start=0):
+    """Create count members with ids start+1..start+count."""
+    now = timezone.now()
+    insert_rows(
+        'members',
+        ['id', 'email', 'password', 'first_name', 'last_name', 'bio',
+         'avatar', 'avatar_key', 'city', 'created_at', 'unread_notifications',
+         'session_generation'],
+        (
+            (i, f'member{i}@bench.test', '', 'Bench', str(i), '', '', '', '',
+             now, 0, 0)
+            for i in range(start + 1, start + count + 1)
+        )
+    )
+
+
+def seed_post(post_id, author_id, likes, comments):
+    """Create a post liked by members 1..likes with comments from them."""
+    now = timezone.now()
+    insert_rows(
+        'posts',
+        ['id', 'author_id', 'content', 'created_at', 'updated_at'],
+        [(post_id, author_id, 'Benchmark post', now, now)]
+    )
+    insert_rows(
+        'likes',
+        ['member_id', 'post_id', 'created_at'],
+        ((member_id, post_id, now) for member_id in range(1, likes + 1))
+    )
+    seed_comments(
+        (member_id, post_id, 'Nice', now) for member_id in range(1, comments + 1)
+    )
+
+
+def seed_comments(rows):
+    """
+    Create top-level comments from (author_id, post_id, content, created_at)
+    rows, then set their thread paths, which need the ids.
+    """
+    insert_rows(
+        'comments',
+        ['author_id', 'post_id', 'content', 'created_at', 'path', 'reply_count'],
+        ((*row, '', 0) for row in rows)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE comments SET path = printf(%s, id) WHERE path = ''",
+            ['%08x']
+        )
+
+
+@benchmark('cascade_delete')
+def bench_cascade_delete(options):
+    """
+    Compare Django's cascading delete of a viral post with soft deletion
+    plus the chunked purge. The cascade holds the write lock for its whole
+    transaction; the purge holds it for one chunk at a time.
+    """
+    from .deletion import run_job, soft_delete_post
+    from .models import DeletionJob, Post
+
+    likes = options['rows']
+    comments = max(1, likes // 10)
+    results = {'likes': likes, 'comments': comments}
+
+    with timer(results, 'seed_seconds'):
+        seed_members(likes)
+        seed_post(1, 1, likes, comments)
+        seed_post(2, 1, likes, comments)
+
+    cascade = StatementTimer()
+    with connection.execute_wrapper(cascade):
+        with timer(results, 'cascade_delete_seconds'):
+            Post.all_objects.get(id=1).delete()
+    results['cascade_slowest_statement_seconds'] = round(cascade.slowest, 4)
+
+    # Purge in the foreground so it can be timed.
+    with override_settings(DELETION_PURGE_IN_BACKGROUND=False):
+        with timer(results, 'soft_delete_seconds'):
+            job = soft_delete_post(Post.objects.get(id=2))
+
+    purge = StatementTimer()
+    with connection.execute_wrapper(purge):
+        with timer(results, 'purge_seconds'):
+            run_job(job)
+    results['purge_statements'] = purge.count
+    results['purge_slowest_statement_seconds'] = round(purge.slowest, 4)
+    results['purge_rows'] = DeletionJob.objects.get(id=job.id).rows_deleted
+    return results
+
+
+STARTUP_RUNS = 5
+
+STARTUP_PROBE = """
+import json, os, resource, sys, time
+start = time.perf_counter()
+import config.wsgi
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+}))
+"""
+
+
+def probe_startup(lean):
+    """Load config.wsgi in a fresh interpreter and return its measurements."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='config.settings')
+    env['DJANGO_LEAN_STARTUP'] = '1' if lean else '0'
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP_PROBE],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        check=True,
+        text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@benchmark('startup')
+def bench_startup(options):
+    """
+    Compare the cold start of the full and the lean (DJANGO_LEAN_STARTUP)
+    configurations: the time to load config.wsgi in a fresh interpreter,
+    i.e. what gunicorn's master pays before forking, and the resulting RSS,
+    which is each worker's footprint before it serves a request.
+    """
+    results = {'runs': STARTUP_RUNS}
+    for mode, lean in (('full', False), ('lean', True)):
+        probes = [probe_startup(lean) for _ in range(STARTUP_RUNS)]
+        results[f'{mode}_startup_seconds'] = round(
+            statistics.median(probe['seconds'] for probe in probes), 4
+        )
+        results[f'{mode}_rss_mb'] = round(
+            statistics.median(probe['rss_kb'] for probe in probes) / 1024, 1
+        )
+        results[f'{mode}_modules'] = probes[-1]['modules']
+    return results
+
+
+# MIDDLEWARE before API requests bypassed the browser-only middleware.
+FULL_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.routers.PrimaryPinningMiddleware',
+    'api.profiling.ProfilingMiddleware',
+]
+
+MIDDLEWARE_REQUESTS = 1000
+MIDDLEWARE_ROUNDS = 3
+
+
+def time_requests(path, count, **extra):
+    """Mean seconds per request to path through a fresh test client."""
+    from django.test import Client
+
+    client = Client()
+    client.get(path, **extra)
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(path, **extra)
+    return (time.perf_counter() - start) / count
+
+
+@benchmark('middleware')
+def bench_middleware(options):
+    """
+    Per-request cost of the middleware stack on an API endpoint that does
+    no work (an unauthenticated trending request), with every middleware
+    in MIDDLEWARE as before and with the browser-only middleware bypassed.
+    """
+    from .authentication import session_token
+    from .models import Member
+
+    member = Member.objects.create(email='bench@bench.test', first_name='Bench')
+    cookie = session_token(member)
+    path = '/api/posts/trending'
+    results = {'requests': MIDDLEWARE_REQUESTS}
+    configurations = (
+        ('full', {'MIDDLEWARE': FULL_MIDDLEWARE}),
+        ('bypass', {}),
+    )
+    # Alternate the configurations and keep each one's best round.
+    timings = {}
+    for _ in range(MIDDLEWARE_ROUNDS):
+        for mode, overrides in configurations:
+            with override_settings(**overrides):
+                for kind, extra in (
+                    ('anonymous', {}),
+                    ('signed_in', {'HTTP_COOKIE': f'session_id={cookie}'}),
+                ):
+                    seconds = time_requests(path, MIDDLEWARE_REQUESTS, **extra)
+                    key = f'{mode}_{kind}_us'
+                    timings[key] = min(timings.get(key, seconds), seconds)
+    for key, seconds in timings.items():
+        results[key] = round(seconds * 1e6, 1)
+    for kind in ('anonymous', 'signed_in'):
+        results[f'{kind}_saved_us'] = round(
+            results[f'full_{kind}_us'] - results[f'bypass_{kind}_us'], 1
+        )
+    return results
+
+
+SEARCH_VOCABULARY = 50_000
+SEARCH_WORDS_PER_POST = 12
+SEARCH_FRIENDS = 200
+SEARCH_RUNS = 20
+SEARCH_QUERIES = {
+    'common': 'word1',
+    'frequent': 'word100',
+    'rare': 'word20000',
+    'two_terms': 'word1 word50',
+    'prefix': 'word12*',
+}
+
+
+@benchmark('search')
+def bench_search(options):
+    """
+    Full-text post search over --rows posts with Zipf-distributed words:
+    index maintenance cost on insert and p50/p99 latency of the first and
+    fifth result pages for common, rare, multi-word and prefix queries.
+    """
+    import itertools
+    import random
+
+    from .models import Member
+    from .search import search_posts
+
+    rows = options['rows']
+    members = max(SEARCH_FRIENDS + 1, rows // 100)
+    rng = random.Random(0)
+    words = [f'word{i}' for i in range(1, SEARCH_VOCABULARY + 1)]
+    cum_weights = list(itertools.accumulate(1 / i for i in range(1, SEARCH_VOCABULARY + 1)))
+    now = timezone.now()
+    results = {'posts': rows, 'members': members}
+
+    seed_members(members)
+    insert_rows(
+        'friendships',
+        ['member_id', 'friend_id', 'created_at'],
+        ((1, friend_id, now) for friend_id in range(2, SEARCH_FRIENDS + 2))
+    )
+    with timer(results, 'insert_with_index_seconds'):
+        insert_rows(
+            'posts',
+            ['id', 'author_id', 'content', 'created_at', 'updated_at'],
+            (
+                (
+                    i,
+                    rng.randint(1, members),
+                    ' '.join(rng.choices(words, cum_weights=cum_weights, k=SEARCH_WORDS_PER_POST)),
+                    now,
+                    now
+                )
+                for i in range(1, rows + 1)
+            )
+        )
+    results['insert_rows_per_second'] = round(rows / results['insert_with_index_seconds'])
+
+    viewer = Member.objects.get(id=1)
+    for name, text in SEARCH_QUERIES.items():
+        first, fifth = [], []
+        for _ in range(SEARCH_RUNS):
+            start = time.perf_counter()
+            ranks, cursor = search_posts(viewer, text, settings.SEARCH_PAGE_SIZE)
+            first.append(time.perf_counter() - start)
+            for _ in range(4):
+                if cursor is None:
+                    break
+                start = time.perf_counter()
+                ranks, cursor = search_posts(viewer, text, settings.SEARCH_PAGE_SIZE, cursor)
+            fifth.append(time.perf_counter() - start)
+        first.sort()
+        fifth.sort()
+        results[f'{name}_p50_ms'] = round(statistics.median(first) * 1000, 2)
+        results[f'{name}_p99_ms'] = round(first[int(0.99 * (len(first) - 1))] * 1000, 2)
+        results[f'{name}_page5_p50_ms'] = round(statistics.median(fifth) * 1000, 2)
+    return results
+
+
+AUTH_CALLS = 5000
+
+
+@benchmark('auth')
+def bench_auth(options):
+    """
+    Cost of CookieAuthentication with the session-generation check against
+    the signature check and member lookup alone (the cost before logout
+    revoked cookies), and the queries each authentication runs.
+    """
+    from django.core import signing
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.exceptions import AuthenticationFailed
+
+    from .authentication import CookieAuthentication, revoke_sessions, session_token
+    from .models import Member
+
+    seed_members(options['rows'])
+    member = Member.objects.get(id=max(1, options['rows'] // 2))
+    request = RequestFactory().get('/api/auth/me')
+    request.COOKIES['session_id'] = session_token(member)
+    authentication = CookieAuthentication()
+
+    def lookup_only():
+        member_id, _ = signing.loads(
+            request.COOKIES['session_id'],
+            key=settings.SECRET_KEY,
+            max_age=60 * 60 * 24 * 7
+        )
+        return Member.objects.get(id=member_id)
+
+    timings = {}
+    for _ in range(MIDDLEWARE_ROUNDS):
+        for mode, func in (
+            ('lookup_only', lookup_only),
+            ('with_revocation', lambda: authentication.authenticate(request)),
+        ):
+            start = time.perf_counter()
+            for _ in range(AUTH_CALLS):
+                func()
+            seconds = (time.perf_counter() - start) / AUTH_CALLS
+            timings[mode] = min(timings.get(mode, seconds), seconds)
+
+    results = {'calls': AUTH_CALLS}
+    for mode, seconds in timings.items():
+        results[f'{mode}_us'] = round(seconds * 1e6, 1)
+    results['overhead_us'] = round(
+        results['with_revocation_us'] - results['lookup_only_us'], 1
+    )
+    with CaptureQueriesContext(connection) as queries:
+        authentication.authenticate(request)
+    results['queries_per_auth'] = len(queries)
+
+    revoke_sessions(member)
+    try:
+        authentication.authenticate(request)
+        results['revoked_rejected'] = False
+    except AuthenticationFailed:
+        results['revoked_rejected'] = True
+    return results
+
+
+FRIEND_CHECKS = 5000
+
+
+@benchmark('friends')
+def bench_friends(options):
+    """
+    is_friend answered by a Friendship query against the cached friend-id
+    set, and the feed query with the friends subquery against the inlined
+    cached ids, for a member with --rows friends.
+    """
+    from django.db.models import Q
+
+    from .friends import clear_local, friend_ids, is_friend, visible_to
+    from .models import Friendship, Member, Post
+
+    rows = options['rows']
+    now = timezone.now()
+    seed_members(rows + 1)
+    insert_rows(
+        'friendships',
+        ['member_id', 'friend_id', 'created_at'],
+        ((1, friend_id, now) for friend_id in range(2, rows + 2))
+    )
+    insert_rows(
+        'posts',
+        ['id', 'author_id', 'content', 'created_at', 'updated_at'],
+        ((i, i % (rows + 1) + 1, 'Post', now, now) for i in range(1, 10 * rows + 1))
+    )
+    member = Member.objects.get(id=1)
+    results = {'friends': rows, 'checks': FRIEND_CHECKS}
+
+    def best(func, count):
+        times = []
+        for _ in range(MIDDLEWARE_ROUNDS):
+            start = time.perf_counter()
+            for i in range(count):
+                func(i)
+            times.append((time.perf_counter() - start) / count)
+        return round(min(times) * 1e6, 1)
+
+    results['is_friend_query_us'] = best(
+        lambda i: Friendship.objects.filter(member_id=1, friend_id=i).exists(),
+        FRIEND_CHECKS
+    )
+    clear_local()
+    with timer(results, 'load_seconds'):
+        friend_ids(1)
+    results['is_friend_cached_us'] = best(lambda i: is_friend(1, i), FRIEND_CHECKS)
+
+    subquery = Friendship.objects.filter(member_id=1).values('friend_id')
+    feed = Post.objects.order_by('-created_at')
+    results['feed_subquery_us'] = best(
+        lambda i: list(feed.filter(Q(author_id=1) | Q(author_id__in=subquery))[:20]),
+        100
+    )
+    results['feed_cached_us'] = best(
+        lambda i: list(feed.filter(visible_to(member))[:20]),
+        100
+    )
+    return results
+
+
+COMPRESSION_FRIENDS = 50
+COMPRESSION_PATHS = {
+    'feed': '/api/posts',
+    'members': '/api/members',
+}
+
+
+@benchmark('compression')
+def bench_compression(options):
+    """
+    Bytes on the wire for a feed page and the member list sent as they
+    are, gzipped at levels 1, 6 and 9 and brotli-compressed (when the
+    package is installed), with the time each compression takes.
+    """
+    import random
+
+    from django.test import Client
+
+    from .authentication import session_token
+    from .compression import brotli, compress
+    from .models import Member
+
+    rng = random.Random(0)
+    words = [f'word{i}' for i in range(2000)]
+    now = timezone.now()
+    seed_members(COMPRESSION_FRIENDS + 1)
+    insert_rows(
+        'friendships',
+        ['member_id', 'friend_id', 'created_at'],
+        ((1, friend_id, now) for friend_id in range(2, COMPRESSION_FRIENDS + 2))
+    )
+    insert_rows(
+        'posts',
+        ['id', 'author_id', 'content', 'created_at', 'updated_at'],
+        (
+            (i, rng.randint(1, COMPRESSION_FRIENDS + 1),
+             ' '.join(rng.choices(words, k=30)), now, now)
+            for i in range(1, options['rows'] + 1)
+        )
+    )
+
+    client = Client(HTTP_COOKIE=f'session_id={session_token(Member.objects.get(id=1))}')
+    encodings = [('gzip', level) for level in (1, 6, 9)]
+    if brotli is not None:
+        encodings += [('br', 5), ('br', 11)]
+    results = {}
+    for name, path in COMPRESSION_PATHS.items():
+        body = client.get(path, HTTP_ACCEPT_ENCODING='identity').content
+        results[f'{name}_bytes'] = len(body)
+        for encoding, level in encodings:
+            key = f'{name}_{encoding}{level}'
+            start = time.perf_counter()
+            compressed = compress(body, encoding, level)
+            results[f'{key}_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            results[f'{key}_bytes'] = len(compressed)
+        # What the middleware sends with the configured settings.
+        response = client.get(path, HTTP_ACCEPT_ENCODING='gzip, br')
+        results[f'{name}_sent_bytes'] = len(response.content)
+        results[f'{name}_sent_encoding'] = response.get('Content-Encoding', 'identity')
+    return results
+
+
+class WriteProbe:
+    """
+    Background writer committing one small insert after another through its
+    own connection, recording how long each commit waited.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.latencies = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        import sqlite3
+
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS write_probe '
+            '(id INTEGER PRIMARY KEY, at REAL)'
+        )
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            conn.execute('INSERT INTO write_probe (at) VALUES (?)', (start,))
+            self.latencies.append(time.perf_counter() - start)
+            time.sleep(0.001)
+        conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self, prefix):
+        latencies = sorted(self.latencies) or [0.0]
+        return {
+            f'{prefix}_writes': len(self.latencies),
+            f'{prefix}_write_p99_ms': round(
+                latencies[int(0.99 * (len(latencies) - 1))] * 1000, 2
+            ),
+            f'{prefix}_write_max_ms': round(latencies[-1] * 1000, 2),
+        }
+
+
+@benchmark('backup')
+def bench_backup(options):
+    """
+    Online backup throughput and the write stalls it causes: snapshot a
+    database of --rows ~1 KB posts (use --on-disk; 1M rows is about 1 GB)
+    in one step and in incremental steps while a writer keeps committing.
+    """
+    import tempfile
+
+    from .backup import copy_database, database_path
+
+    path = database_path()
+    results = {'rows': options['rows']}
+    with timer(results, 'seed_seconds'):
+        seed_members(1)
+        now = timezone.now()
+        insert_rows(
+            'posts',
+            ['author_id', 'content', 'created_at', 'updated_at'],
+            ((1, f'{i:08d}' + 'x' * 1000, now, now) for i in range(options['rows']))
+        )
+    connection.close()
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    results['database_mb'] = round(size_mb, 1)
+
+    with WriteProbe(path) as idle:
+        time.sleep(1)
+    results.update(idle.summary('idle'))
+
+    for label, pages in (('one_step', -1), ('stepped', settings.BACKUP_STEP_PAGES)):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            target = os.path.join(tmpdir, 'snapshot.sqlite3')
+            with WriteProbe(path) as probe:
+                start = time.perf_counter()
+                progress = copy_database(path, target, pages=pages)
+                elapsed = time.perf_counter() - start
+        results[f'{label}_seconds'] = round(elapsed, 3)
+        results[f'{label}_mb_per_second'] = round(size_mb / elapsed, 1)
+        results[f'{label}_restarts'] = progress.restarts
+        results.update(probe.summary(label))
+    return results
+
+
+@benchmark('export')
+def bench_export(options):
+    """
+    Peak Python memory of streaming a member export at --rows / 10 and
+    --rows posts, comments and likes: it should not grow with the account.
+    """
+    import tracemalloc
+
+    from .export import stream_export
+
+    rows = options['rows']
+    now = timezone.now()
+    seed_members(2)
+    results = {}
+    for member_id, count in ((1, max(1, rows // 10)), (2, rows)):
+        start = (member_id - 1) * rows + 1
+        insert_rows(
+            'posts',
+            ['id', 'author_id', 'content', 'created_at', 'updated_at'],
+            ((i, member_id, f'Post {i} ' + 'x' * 200, now, now)
+             for i in range(start, start + count))
+        )
+        seed_comments((member_id, i, 'Nice', now) for i in range(start, start + count))
+        insert_rows(
+            'likes',
+            ['member_id', 'post_id', 'created_at'],
+            ((member_id, i, now) for i in range(start, start + count))
+        )
+        for export_format in ('ndjson', 'zip'):
+            size = 0
+            tracemalloc.start()
+            with timer(results, f'{export_format}_{count}_seconds'):
+                for chunk in stream_export(member_id, export_format):
+                    size += len(chunk)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[f'{export_format}_{count}_mb'] = round(size / 2**20, 1)
+            results[f'{export_format}_{count}_peak_mb'] = round(peak / 2**20, 2)
+    return results
+
+
+ARCHIVE_FRIENDS = 50
+ARCHIVE_SPAN_DAYS = 730
+
+
+@benchmark('archive')
+def bench_archive(options):
+    """
+    Feed latency over --rows posts spread over two years, before and after
+    archiving the ones older than ARCHIVE_AFTER_DAYS: the first page and a
+    page a year back (through a cursor), plus the archival run itself.
+    """
+    from datetime import timedelta
+
+    from django.test import Client
+
+    from .archive import archive_posts, get_cache
+    from .authentication import session_token
+    from .models import ArchivedPost, Member, Post
+    from .pagination import encode_cursor
+
+    rows = options['rows']
+    now = timezone.now()
+    step = timedelta(days=ARCHIVE_SPAN_DAYS) / rows
+    seed_members(ARCHIVE_FRIENDS + 1)
+    insert_rows(
+        'friendships',
+        ['member_id', 'friend_id', 'created_at'],
+        ((1, friend_id, now) for friend_id in range(2, ARCHIVE_FRIENDS + 2))
+    )
+    insert_rows(
+        'posts',
+        ['id', 'author_id', 'content', 'created_at', 'updated_at'],
+        (
+            (i, i % (ARCHIVE_FRIENDS + 1) + 1, f'Post {i}', now - step * i, now - step * i)
+            for i in range(1, rows + 1)
+        )
+    )
+    insert_rows(
+        'likes',
+        ['member_id', 'post_id', 'created_at'],
+        ((i % ARCHIVE_FRIENDS + 2, i, now) for i in range(1, rows + 1))
+    )
+
+    client = Client(HTTP_COOKIE=f'session_id={session_token(Member.objects.get(id=1))}')
+    deep = encode_cursor(now - timedelta(days=settings.ARCHIVE_AFTER_DAYS + 30), rows + 1)
+    paths = {
+        'first_page': '/api/posts?limit=20',
+        'deep_page': f'/api/posts?limit=20&cursor={deep}',
+    }
+    results = {'posts': rows}
+
+    def measure(label):
+        get_cache().clear()
+        for name, path in paths.items():
+            client.get(path)
+            times = []
+            for _ in range(MIDDLEWARE_ROUNDS):
+                start = time.perf_counter()
+                for _ in range(100):
+                    client.get(path)
+                times.append((time.perf_counter() - start) / 100)
+            results[f'{name}_{label}_ms'] = round(min(times) * 1000, 3)
+
+    measure('unarchived')
+    with timer(results, 'archive_seconds'):
+        results['archived'] = archive_posts()
+    results['hot'] = Post.objects.count()
+    results['cold'] = ArchivedPost.objects.count()
+    measure('archived')
+    return results
+
+
+INDEX_MEMBERS = 1000
+INDEX_FRIENDS = 50
+
+
+def query_plan(queryset):
+    """EXPLAIN QUERY PLAN steps of queryset, joined with ' / '."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return ' / '.join(row[-1] for row in cursor.fetchall())
+
+
+@benchmark('indexes')
+def bench_indexes(options):
+    """
+    Plans and timings of the hot queries on the schema before the index
+    audit (migration 0012, default orderings) and after it, over --rows
+    posts with likes and comments, 1000 members and 50 friends each.
+    """
+    import random
+    from datetime import timedelta
+
+    from django.core.management import call_command
+    from django.db.models import Count
+    from django.test import Client
+
+    from .authentication import session_token
+    from .friends import visible_to
+    from .models import Comment, Friendship, Like, Member, Post
+    from .serializers import annotate_post_stats
+
+    rows = options['rows']
+    rng = random.Random(0)
+    now = timezone.now()
+    seed_members(INDEX_MEMBERS)
+    insert_rows(
+        'friendships',
+        ['member_id', 'friend_id', 'created_at'],
+        (
+            (member_id, friend_id, now)
+            for member_id in range(1, INDEX_MEMBERS + 1)
+            for friend_id in rng.sample(
+                [i for i in range(1, INDEX_MEMBERS + 1) if i != member_id],
+                INDEX_FRIENDS
+            )
+        )
+    )
+    insert_rows(
+        'posts',
+        ['id', 'author_id', 'content', 'created_at', 'updated_at'],
+        (
+            (i, rng.randint(1, INDEX_MEMBERS), f'Post {i}',
+             now - timedelta(minutes=rows - i), now)
+            for i in range(1, rows + 1)
+        )
+    )
+    insert_rows(
+        'likes',
+        ['member_id', 'post_id', 'created_at'],
+        (
+            (member_id, i, now)
+            for i in range(1, rows + 1)
+            for member_id in rng.sample(range(1, INDEX_MEMBERS + 1), 3)
+        )
+    )
+    seed_comments(
+        (rng.randint(1, INDEX_MEMBERS), i, 'Nice', now) for i in range(1, rows + 1)
+    )
+
+    member = Member.objects.get(id=1)
+    post_id = rows // 2
+    client = Client(HTTP_COOKIE=f'session_id={session_token(member)}')
+    # (name, queryset on the old schema, queryset on the new one); the old
+    # ones carry the default orderings the models had then.
+    queries = [
+        ('feed',
+         annotate_post_stats(Post.objects.filter(visible_to(member)), member).order_by(
+             '-created_at', '-id')[:21],
+         None),
+        ('feed_recent',
+         Post.objects.filter(
+             visible_to(member), created_at__gt=now - timedelta(minutes=rows // 10)
+         ).order_by('-created_at', '-id').values_list('id', flat=True),
+         None),
+        ('post_likers',
+         Like.objects.filter(post_id=post_id).order_by('-created_at').values_list(
+             'member_id', flat=True),
+         Like.objects.filter(post_id=post_id).values_list('member_id', flat=True)),
+        ('post_comment_count',
+         Comment.objects.filter(post_id=post_id).values('post_id').annotate(
+             total=Count('*')).values('total'),
+         None),
+        ('followers',
+         Friendship.objects.filter(friend_id=1).order_by('-created_at').values_list(
+             'member_id', flat=True),
+         Friendship.objects.filter(friend_id=1).values_list('member_id', flat=True)),
+        ('login',
+         Member.objects.filter(email='member1@bench.test'),
+         None),
+        ('archive_batch',
+         Post.objects.filter(created_at__lt=now - timedelta(minutes=rows // 2)).order_by(
+             'created_at', 'id').values_list('id', flat=True)[:500],
+         None),
+        ('export_posts',
+         Post.objects.filter(author_id=1).order_by('id').values('id', 'content'),
+         Post.objects.filter(author_id=1).order_by('created_at', 'id').values(
+             'id', 'content')),
+        ('export_likes',
+         Like.objects.filter(member_id=1).order_by('id').values('post_id', 'created_at'),
+         Like.objects.filter(member_id=1).order_by('post_id').values(
+             'post_id', 'created_at')),
+    ]
+
+    def best_us(func, count=50):
+        times = []
+        for _ in range(MIDDLEWARE_ROUNDS):
+            start = time.perf_counter()
+            for _ in range(count):
+                func()
+            times.append((time.perf_counter() - start) / count)
+        return round(min(times) * 1e6, 1)
+
+    results = {'posts': rows}
+
+    def measure(label, index):
+        for query in queries:
+            name, queryset = query[0], query[index] or query[1]
+            results[f'{name}_{label}_plan'] = query_plan(queryset)
+            results[f'{name}_{label}_us'] = best_us(lambda: list(queryset.all()))
+        results[f'feed_request_{label}_us'] = best_us(
+            lambda: client.get('/api/posts?limit=20')
+        )
+
+    call_command('migrate', 'api', '0012', verbosity=0)
+    measure('before', 1)
+    call_command('migrate', 'api', verbosity=0)
+    measure('after', 2)
+    return results
+
+
+SHARD_COUNTS = (1, 2, 4)
+SHARD_WRITERS = 8
+SHARD_SECONDS = 3
+
+
+@benchmark('shards')
+def bench_shards(options):
+    """
+    Write throughput of SHARD_WRITERS threads creating and liking posts for
+    SHARD_SECONDS on 1 (unsharded), 2 and 4 shards, and the latency of the
+    feed merged from them (run with --on-disk: every shard is a file).
+    """
+    import itertools
+    import tempfile
+
+    from django.core.management import call_command
+    from django.core.management.base import CommandError
+    from django.db import connections
+    from django.test import Client
+
+    from .authentication import session_token
+    from .models import Like, Member, Post
+    from .sharding import add_shard_database, aliases, shard_for_member, using
+
+    if connection.is_in_memory_db():
+        raise CommandError('The shards benchmark needs --on-disk.')
+    members = SHARD_WRITERS * 4
+    now = timezone.now()
+    seed_members(members)
+    insert_rows(
+        'friendships',
+        ['member_id', 'friend_id', 'created_at'],
+        ((1, friend_id, now) for friend_id in range(2, members + 1))
+    )
+    tmpdir = tempfile.TemporaryDirectory(prefix='shards-')
+    shards = ['default'] + [f'bench_shard{i}' for i in range(1, max(SHARD_COUNTS))]
+    with override_settings(DATABASE_SHARDS=shards):
+        for alias in shards[1:]:
+            add_shard_database(alias, os.path.join(tmpdir.name, f'{alias}.sqlite3'))
+            call_command('migrate', database=alias, verbosity=0)
+
+    def writer(index, stop, latencies):
+        try:
+            for author_id in itertools.cycle(range(index + 1, members + 1, SHARD_WRITERS)):
+                if stop.is_set():
+                    break
+                alias = shard_for_member(author_id)
+                start = time.perf_counter()
+                post = using(Post.objects, alias).create(
+                    author_id=author_id,
+                    content='Benchmark post'
+                )
+                middle = time.perf_counter()
+                using(Like.objects, alias).create(member_id=author_id, post=post)
+                latencies += [middle - start, time.perf_counter() - middle]
+        finally:
+            connections.close_all()
+
+    client = Client(HTTP_COOKIE=f'session_id={session_token(Member.objects.get(id=1))}')
+    results = {'writers': SHARD_WRITERS, 'seconds': SHARD_SECONDS}
+    try:
+        for count in SHARD_COUNTS:
+            with override_settings(DATABASE_SHARDS=shards[:count] if count > 1 else []):
+                stop = threading.Event()
+                latencies = [[] for _ in range(SHARD_WRITERS)]
+                threads = [
+                    threading.Thread(target=writer, args=(index, stop, latencies[index]))
+                    for index in range(SHARD_WRITERS)
+                ]
+                for thread in threads:
+                    thread.start()
+                time.sleep(SHARD_SECONDS)
+                stop.set()
+                for thread in threads:
+                    thread.join()
+                writes = sorted(itertools.chain(*latencies))
+                results[f'shards_{count}_writes_per_second'] = round(
+                    len(writes) / SHARD_SECONDS
+                )
+                for label, quantile in (('p50', 0.5), ('p99', 0.99)):
+                    results[f'shards_{count}_write_{label}_ms'] = round(
+                        writes[int(len(writes) * quantile)] * 1000, 2
+                    )
+
+                client.get('/api/posts?limit=20')
+                times = []
+                for _ in range(MIDDLEWARE_ROUNDS):
+                    start = time.perf_counter()
+                    for _ in range(100):
+                        client.get('/api/posts?limit=20')
+                    times.append((time.perf_counter() - start) / 100)
+                results[f'shards_{count}_feed_ms'] = round(min(times) * 1000, 3)
+
+                for alias in aliases():
+                    using(Like.objects, alias).all().delete()
+                    using(Post.all_objects, alias).all().delete()
+    finally:
+        for alias in shards[1:]:
+            connections[alias].close()
+        tmpdir.cleanup()
+    return results
@@ -0,0 +1,173 @@
+"""
+Cache backend shared by every process on the host, kept in an SQLite file.
+
+The LocMem cache is per process, so gunicorn workers and the ASGI server
+would each see their own copy. This backend stores entries in one SQLite
+database (WAL, one connection per thread and process), which needs no
+server and makes ``add`` and ``incr`` atomic across processes: each is a
+single statement. Integers are stored as SQL integers so ``incr`` can
+update them in place; other values are pickled.
+
+    CACHES = {"shared": {"BACKEND": "api.cache.SQLiteCache",
+                         "LOCATION": "/path/to/cache.sqlite3"}}
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# A writer waits this long for another process's write to finish.
+BUSY_TIMEOUT = 5
+
+# Expired entries are culled every this many writes of a connection.
+CULL_EVERY = 1000
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        # Connections are not shared with forked workers (preload_app).
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT,
+            isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode=wal')
+        # Losing recent entries on a power cut is fine for a cache.
+        connection.execute('PRAGMA synchronous=off')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+        )
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        self._local.writes = 0
+        return connection
+
+    def _execute(self, sql, params=()):
+        return self._connection().execute(sql, params)
+
+    def _written(self):
+        self._local.writes += 1
+        if self._local.writes % CULL_EVERY == 0:
+            self._cull()
+
+    def _cull(self):
+        self._execute('DELETE FROM cache WHERE expires <= ?', [time.time()])
+        count = self._execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            self._execute(
+                'DELETE FROM cache WHERE rowid IN '
+                '(SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+                [count // self._cull_frequency]
+            )
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    def _key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires <= ?',
+            [
+                self._key(key, version),
+                self._encode(value),
+                self.get_backend_timeout(timeout),
+                time.time()
+            ]
+        )
+        self._written()
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        rows = self._execute(
+            'SELECT value FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            [self._key(key, version), time.time()]
+        ).fetchall()
+        return self._decode(rows[0][0]) if rows else default
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join(['?'] * len(keys))
+        rows = self._execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            [*keys, time.time()]
+        )
+        return {keys[key]: self._decode(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            [
+                self._key(key, version),
+                self._encode(value),
+                self.get_backend_timeout(timeout)
+            ]
+        )
+        self._written()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            [self.get_backend_timeout(timeout), self._key(key, version), time.time()]
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        cursor = self._execute(
+            'DELETE FROM cache WHERE key = ?', [self._key(key, version)]
+        )
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            placeholders = ', '.join(['?'] * len(keys))
+            self._execute(f'DELETE FROM cache WHERE key IN ({placeholders})', keys)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def incr(self, key, delta=1, version=None):
+        rows = self._execute(
+            'UPDATE cache SET value = value + ? '
+            'WHERE key = ? AND typeof(value) = \'integer\' '
+            'AND (expires IS NULL OR expires > ?) RETURNING value',
+            [delta, self._key(key, version), time.time()]
+        ).fetchall()
+        if not rows:
+            raise ValueError(f"Key '{key}' not found")
+        return rows[0][0]
+
+    def clear(self):
+        self._execute('DELETE FROM cache')
@@ -0,0 +1,39 @@
+"""
+System checks for settings that only work in some configurations.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Settings naming a cache every worker must see the same entries in, with
+# a test of whether the current configuration uses it.
+SHARED_CACHE_SETTINGS = {
+    'EVENTS_CACHE_ALIAS': lambda: settings.EVENTS_BROKER == 'api.events.CacheBroker',
+    'FRIEND_CACHE_ALIAS': lambda: True,
+    'REPLICA_PIN_CACHE_ALIAS': lambda: bool(settings.DATABASE_REPLICAS),
+    'SINGLEFLIGHT_CACHE_ALIAS': lambda: True,
+    'THROTTLE_CACHE_ALIAS': lambda: (
+        settings.THROTTLE_STORE == 'api.throttling.CacheWindowStore'
+    ),
+}
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """Reject per-process caches where state is shared between workers."""
+    errors = []
+    for name, in_use in SHARED_CACHE_SETTINGS.items():
+        alias = getattr(settings, name)
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if in_use() and backend in PER_PROCESS_CACHES:
+            errors.append(Error(
+                f'{name} names the cache {alias!r}, which is private to '
+                'each process.',
+                hint='Name a cache shared between processes, such as "shared".',
+                id='api.E001',
+            ))
+    return errors
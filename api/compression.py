@@ -0,0 +1,122 @@
+"""
+Response compression.
+
+``CompressionMiddleware`` compresses API responses of at least
+``RESPONSE_COMPRESSION_MIN_SIZE`` bytes whose type is listed in
+``RESPONSE_COMPRESSION_TYPES``, with brotli when the client accepts it and
+the ``brotli`` package is installed, gzip otherwise. Smaller bodies are
+sent as they are: below about a kilobyte compression saves less than it
+costs. Streaming responses (event streams, exports) are never buffered.
+
+Only paths under ``API_PATH_PREFIX`` are compressed. The admin's pages
+carry CSRF tokens, which compression would expose to BREACH.
+
+``compress_file`` writes the ``.gz`` (and ``.br``) siblings nginx serves
+for built static assets; see ``manage.py precompress_static``.
+"""
+import gzip
+import os
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encodings(header):
+    """Encodings accepted by an Accept-Encoding header (q=0 excluded)."""
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            encodings.add(name)
+    return encodings
+
+
+def choose_encoding(header):
+    encodings = accepted_encodings(header)
+    if brotli is not None and 'br' in encodings:
+        return 'br'
+    if 'gzip' in encodings or '*' in encodings:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, level=None):
+    """Compress data with encoding at level (the configured one by default)."""
+    if encoding == 'br':
+        quality = settings.RESPONSE_COMPRESSION_BROTLI_QUALITY if level is None else level
+        return brotli.compress(data, quality=quality)
+    compresslevel = settings.RESPONSE_COMPRESSION_GZIP_LEVEL if level is None else level
+    return gzip.compress(data, compresslevel=compresslevel, mtime=0)
+
+
+def compress_file(path):
+    """
+    Write path.gz, and path.br when brotli is installed, at the highest
+    levels (this runs once per build). Returns {suffix: size} of the files
+    written; a compressed copy that would not be smaller is skipped.
+    """
+    with open(path, 'rb') as source:
+        data = source.read()
+    stat = os.stat(path)
+    written = {}
+    for encoding, suffix, level in (('gzip', '.gz', 9), ('br', '.br', 11)):
+        if encoding == 'br' and brotli is None:
+            continue
+        compressed = compress(data, encoding, level)
+        if len(compressed) >= len(data):
+            continue
+        with open(path + suffix, 'wb') as target:
+            target.write(compressed)
+        # Same mtime as the original, so nginx sends the same Last-Modified.
+        os.utime(path + suffix, (stat.st_atime, stat.st_mtime))
+        written[suffix] = len(compressed)
+    return written
+
+
+class CompressionMiddleware:
+    """
+    Compress large API responses for clients that accept it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path_info.startswith(settings.API_PATH_PREFIX):
+            return response
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in settings.RESPONSE_COMPRESSION_TYPES:
+            return response
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+
+        # Caches must keep the variants apart even for clients that get
+        # the identity encoding.
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,327 @@
+"""
+Soft deletion with chunked background purging.
+
+Deleting a post or member only stamps ``deleted_at`` (which the default
+managers filter out) and queues a ``DeletionJob``. The job then removes
+related rows with raw SQL in chunks of ``DELETION_CHUNK_SIZE``, each in its
+own short transaction, so SQLite is never write-locked for long and the
+related rows are never loaded into Python.
+
+Jobs run on a background thread of the worker that queued them when
+``DELETION_PURGE_IN_BACKGROUND`` is set; ``manage.py purge_deleted`` runs
+whatever is left (e.g. after a worker restart). A running job beats its
+``heartbeat_at`` after every chunk; one silent for ``DELETION_JOB_LEASE``
+(its worker was killed) is claimed again and resumes: purging is
+idempotent. A job that raised is retried the same way after
+``DELETION_JOB_RETRY_DELAY``, doubled per failure, up to
+``DELETION_JOB_MAX_ATTEMPTS`` runs.
+
+With sharding (see api.sharding) a post's rows are purged on its shard and
+a member's on every shard.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    close_old_connections,
+    connections,
+    models,
+    transaction
+)
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .friends import friend_removed
+from .models import (
+    ArchivedComment,
+    ArchivedLike,
+    ArchivedPost,
+    Comment,
+    DeletionJob,
+    Friendship,
+    Like,
+    Member,
+    Post
+)
+from .notifications import clear_post_notifications
+from .sharding import aliases, databases, get_by_id, is_sharded, shard_of, using
+from .singleflight import invalidate
+
+logger = logging.getLogger(__name__)
+
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def soft_delete_post(post):
+    """Hide a post immediately and queue the purge of its rows."""
+    with transaction.atomic():
+        using(Post.all_objects, shard_of(post)).filter(id=post.id).update(
+            deleted_at=timezone.now()
+        )
+        clear_post_notifications(post)
+        job = DeletionJob.objects.create(
+            kind=DeletionJob.KIND_POST,
+            object_id=post.id
+        )
+        schedule_purge()
+    return job
+
+
+def soft_delete_member(member):
+    """Hide a member and their posts immediately and queue the purge."""
+    now = timezone.now()
+    friends, post_ids = _cached_dependants(Member, member.id)
+    with transaction.atomic():
+        Member.all_objects.filter(id=member.id).update(deleted_at=now)
+        for alias in aliases():
+            for model in (Post, ArchivedPost):
+                using(model.all_objects, alias).filter(
+                    author_id=member.id,
+                    deleted_at__isnull=True
+                ).update(deleted_at=now)
+        job = DeletionJob.objects.create(
+            kind=DeletionJob.KIND_MEMBER,
+            object_id=member.id
+        )
+        schedule_purge()
+    # Their likes, comments and friendships no longer count.
+    invalidate(*_cache_keys(friends, post_ids))
+    return job
+
+
+def schedule_purge():
+    """Wake the background purger once the current transaction commits."""
+    if settings.DELETION_PURGE_IN_BACKGROUND:
+        transaction.on_commit(_start_worker)
+
+
+def _start_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_worker_loop,
+                name='deletion-purger',
+                daemon=True
+            )
+            _worker.start()
+    _wake.set()
+
+
+def _worker_loop():
+    while True:
+        _wake.wait()
+        _wake.clear()
+        try:
+            run_pending_jobs()
+        except Exception:
+            logger.exception('Deletion purger crashed')
+        finally:
+            close_old_connections()
+
+
+def claimable():
+    """
+    Pending jobs, running ones whose worker stopped beating, and failed ones
+    whose retry delay has passed.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.DELETION_JOB_LEASE)
+    condition = Q(status=DeletionJob.STATUS_PENDING) | Q(
+        status=DeletionJob.STATUS_RUNNING,
+        heartbeat_at__lt=stale
+    )
+    for attempts in range(1, settings.DELETION_JOB_MAX_ATTEMPTS):
+        delay = settings.DELETION_JOB_RETRY_DELAY * 2 ** (attempts - 1)
+        condition |= Q(
+            status=DeletionJob.STATUS_FAILED,
+            attempts=attempts,
+            heartbeat_at__lt=now - timedelta(seconds=delay)
+        )
+    return condition
+
+
+def run_pending_jobs():
+    """Run every claimable job, returning how many were processed."""
+    count = 0
+    for job in DeletionJob.objects.filter(claimable()).order_by('id'):
+        run_job(job)
+        count += 1
+    return count
+
+
+def run_job(job):
+    """Claim and run a single job, recording the outcome on it."""
+    claimed = DeletionJob.objects.filter(claimable(), id=job.id).update(
+        status=DeletionJob.STATUS_RUNNING,
+        heartbeat_at=timezone.now(),
+        attempts=F('attempts') + 1
+    )
+    if not claimed:
+        # Another worker got it first.
+        return
+
+    model = Post if job.kind == DeletionJob.KIND_POST else Member
+    try:
+        alias = DEFAULT_DB_ALIAS
+        if is_sharded(model):
+            post = get_by_id(Post.all_objects, job.object_id)
+            alias = shard_of(post) if post is not None else DEFAULT_DB_ALIAS
+        purge_object(model, job.object_id, job, using=alias)
+    except Exception as exc:
+        logger.exception('Purging %s failed', job)
+        DeletionJob.objects.filter(id=job.id).update(
+            status=DeletionJob.STATUS_FAILED,
+            error=str(exc),
+            heartbeat_at=timezone.now()
+        )
+    else:
+        DeletionJob.objects.filter(id=job.id).update(
+            status=DeletionJob.STATUS_DONE,
+            finished_at=timezone.now()
+        )
+
+
+def _relations(model):
+    """Reverse foreign keys pointing at model that need handling on delete."""
+    return [
+        rel for rel in model._meta.related_objects
+        if rel.on_delete in (models.CASCADE, models.SET_NULL)
+        and not rel.many_to_many
+    ]
+
+
+def _has_cascades(model):
+    return any(rel.on_delete is models.CASCADE for rel in _relations(model))
+
+
+def _record_progress(job, rows):
+    if job is not None:
+        DeletionJob.objects.filter(id=job.id).update(
+            rows_deleted=F('rows_deleted') + rows,
+            heartbeat_at=timezone.now()
+        )
+
+
+def _cached_dependants(model, pk):
+    """
+    (friend ids, post ids) whose cached entries reflect rows referencing
+    the row pk of model: the friend sets and profiles (friends_count) of a
+    member's friends, and the posts (counts) they liked or commented on.
+    """
+    if model is Post:
+        return [], {pk}
+    if model is not Member:
+        return [], set()
+    friends = list(
+        Friendship.objects.filter(member_id=pk).values_list('friend_id', flat=True)
+    )
+    post_ids = set()
+    for alias in aliases():
+        liked, *others = [
+            using(child.objects, alias).filter(**{field: pk}).values_list(
+                'post_id', flat=True
+            )
+            for child, field in [
+                (Like, 'member_id'),
+                (Comment, 'author_id'),
+                (ArchivedLike, 'member_id'),
+                (ArchivedComment, 'author_id'),
+            ]
+        ]
+        post_ids.update(liked.union(*others))
+    return friends, post_ids
+
+
+def _cache_keys(friends, post_ids):
+    return [
+        *(f'member:{friend_id}' for friend_id in friends),
+        *(f'post:{post_id}' for post_id in post_ids),
+    ]
+
+
+def _child_databases(model, child, using):
+    """Aliases holding child rows of a model row stored on using."""
+    if is_sharded(model) and is_sharded(child):
+        return [using]
+    return databases(child)
+
+
+def purge_object(model, pk, job=None, using=DEFAULT_DB_ALIAS):
+    """
+    Delete one row of model, stored on the database using, after clearing
+    everything that references it.
+
+    Children that have dependants of their own (a member's posts) are
+    purged one by one; leaf tables are deleted in chunks. The shared caches
+    holding the purged relations are updated afterwards.
+    """
+    friends, post_ids = _cached_dependants(model, pk)
+    for rel in _relations(model):
+        child = rel.related_model
+        column = rel.field.column
+        for alias in _child_databases(model, child, using):
+            if rel.on_delete is models.SET_NULL:
+                purge_chunks(child, column, pk, job, nullify=True, using=alias)
+            elif _has_cascades(child):
+                # Materialize the ids: SQLite cursors do not tolerate
+                # writes to the table being iterated.
+                child_ids = list(
+                    child._base_manager.using(alias).filter(
+                        **{column: pk}
+                    ).values_list('pk', flat=True)
+                )
+                for child_id in child_ids:
+                    purge_object(child, child_id, job, using=alias)
+            else:
+                purge_chunks(child, column, pk, job, using=alias)
+
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk_column = connection.ops.quote_name(model._meta.pk.column)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {pk_column} = %s', [pk])
+        rows = cursor.rowcount
+    _record_progress(job, rows)
+    for friend_id in friends:
+        friend_removed(friend_id, pk)
+    invalidate(*_cache_keys(friends, post_ids))
+
+
+def purge_chunks(
+    model, column, value, job=None, nullify=False, using=DEFAULT_DB_ALIAS
+):
+    """
+    Delete (or detach, with nullify) rows of model where column = value,
+    on the database using.
+
+    Each chunk is one statement in its own transaction; the short pause
+    between chunks lets queued writers take the database lock.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    pk_column = quote(model._meta.pk.column)
+    column = quote(column)
+    chunk = f'SELECT {pk_column} FROM {table} WHERE {column} = %s LIMIT %s'
+    if nullify:
+        sql = f'UPDATE {table} SET {column} = NULL WHERE {pk_column} IN ({chunk})'
+    else:
+        sql = f'DELETE FROM {table} WHERE {pk_column} IN ({chunk})'
+
+    total = 0
+    while True:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(sql, [value, settings.DELETION_CHUNK_SIZE])
+            rows = cursor.rowcount
+        total += rows
+        _record_progress(job, rows)
+        if rows < settings.DELETION_CHUNK_SIZE:
+            return total
+        time.sleep(settings.DELETION_CHUNK_PAUSE)
@@ -0,0 +1,249 @@
+"""
+Publish/subscribe plumbing for real-time feed events.
+
+Write paths call ``publish_post_event`` and the server-sent events stream in
+``api.streams`` subscribes to the broker configured by ``EVENTS_BROKER``.
+"""
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Friendship
+
+
+class Subscription:
+    """
+    A single connected client waiting for events addressed to a member.
+    """
+
+    def __init__(self, member_id, loop, maxsize):
+        self.member_id = member_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        """Hand an event to the subscriber's event loop (thread-safe)."""
+        try:
+            self.loop.call_soon_threadsafe(self._put_nowait, event)
+        except RuntimeError:
+            # Event loop already closed, the client is gone.
+            pass
+
+    def _put_nowait(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop rather than buffer without bound.
+            self.dropped += 1
+
+    async def get(self, timeout):
+        """Wait for the next event, returning None on timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """
+    In-process broker fanning events out to subscribers of this worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, member_id, loop=None):
+        """Register a subscription for events addressed to member_id."""
+        subscription = Subscription(
+            member_id,
+            loop or asyncio.get_running_loop(),
+            settings.EVENTS_QUEUE_SIZE
+        )
+        with self._lock:
+            self._subscribers.setdefault(member_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription once its client disconnects."""
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.member_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.member_id]
+
+    def publish(self, member_ids, event):
+        """Send an event to every subscriber of the given members."""
+        self.deliver(member_ids, event)
+
+    def deliver(self, member_ids, event):
+        """Push an event to the local subscribers of the given members."""
+        with self._lock:
+            targets = [
+                subscription
+                for member_id in member_ids
+                for subscription in self._subscribers.get(member_id, ())
+            ]
+        for subscription in targets:
+            subscription.put(event)
+
+    def stats(self):
+        """Return connection counts for this worker."""
+        with self._lock:
+            return {
+                'members': len(self._subscribers),
+                'connections': sum(len(s) for s in self._subscribers.values())
+            }
+
+
+class CacheBroker(LocalBroker):
+    """
+    Cross-process broker relaying events through a shared Django cache.
+
+    Events are appended to a sequence of cache keys; one polling thread per
+    process reads new entries and delivers them to local subscribers, so any
+    shared cache backend with an atomic ``incr`` (api.cache, memcached,
+    redis) can link the workers. A publisher takes a sequence number before
+    it writes the event, so a missing entry is waited for up to
+    ``EVENTS_GAP_SECONDS`` before the poller moves past it.
+    """
+
+    sequence_key = 'events:seq'
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[settings.EVENTS_CACHE_ALIAS]
+        self._poller = None
+        self._last_seen = None
+        # (sequence, monotonic time) of the first missing entry waited for.
+        self._gap = None
+
+    def _event_key(self, sequence):
+        return f'events:{sequence}'
+
+    def _current_sequence(self):
+        return self.cache.get(self.sequence_key, 0)
+
+    def publish(self, member_ids, event):
+        """Append the event to the shared log."""
+        self.cache.add(self.sequence_key, 0, timeout=None)
+        sequence = self.cache.incr(self.sequence_key)
+        self.cache.set(
+            self._event_key(sequence),
+            {'member_ids': list(member_ids), 'event': event},
+            timeout=settings.EVENTS_CACHE_TTL
+        )
+
+    def subscribe(self, member_id, loop=None):
+        """Register a subscription and make sure the poller is running."""
+        subscription = super().subscribe(member_id, loop)
+        with self._lock:
+            if self._poller is None:
+                self._last_seen = self._current_sequence()
+                self._poller = threading.Thread(
+                    target=self._poll,
+                    name='events-cache-poller',
+                    daemon=True
+                )
+                self._poller.start()
+        return subscription
+
+    def _poll(self):
+        while True:
+            time.sleep(settings.EVENTS_POLL_INTERVAL)
+            try:
+                self.poll_once()
+            except Exception:
+                # A cache hiccup must not kill the poller thread.
+                continue
+
+    def poll_once(self):
+        """
+        Deliver the events appended since the last poll, in order, up to
+        the first one still being written.
+        """
+        current = self._current_sequence()
+        if current <= self._last_seen:
+            if current < self._last_seen:
+                # Sequence was reset (cache flushed).
+                self._last_seen = current
+            return
+        sequences = range(self._last_seen + 1, current + 1)
+        entries = self.cache.get_many(
+            [self._event_key(sequence) for sequence in sequences]
+        )
+        for sequence in sequences:
+            entry = entries.get(self._event_key(sequence))
+            if entry is None and not self._gap_expired(sequence):
+                break
+            if entry is not None:
+                self.deliver(entry['member_ids'], entry['event'])
+            self._last_seen = sequence
+
+    def _gap_expired(self, sequence):
+        """
+        Whether to give up on the missing entry for sequence: its publisher
+        died between taking the number and writing it, or it expired.
+        """
+        now = time.monotonic()
+        if self._gap is None or self._gap[0] != sequence:
+            self._gap = (sequence, now)
+        return now - self._gap[1] >= settings.EVENTS_GAP_SECONDS
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by EVENTS_BROKER."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENTS_BROKER)()
+    return _broker
+
+
+def get_audience(author_id):
+    """
+    Return ids of members whose feed shows posts by author_id.
+
+    The feed lists a member's own posts and posts of members they have
+    added as friends, so the audience is the author plus everyone who
+    has the author in their friend list.
+    """
+    follower_ids = Friendship.objects.filter(
+        friend_id=author_id
+    ).values_list('member_id', flat=True)
+    return {author_id, *follower_ids}
+
+
+def publish_post_event(event_type, post, actor, **data):
+    """
+    Publish a feed event about a post to its author's audience.
+
+    Delivery happens after the surrounding transaction commits so clients
+    never receive events for rows they cannot read yet.
+    """
+    event = {
+        'type': event_type,
+        'post_id': post.id,
+        'author_id': post.author_id,
+        'actor_id': actor.id,
+        'created_at': timezone.now().isoformat(),
+        **data
+    }
+
+    def send():
+        get_broker().publish(get_audience(post.author_id), event)
+
+    transaction.on_commit(send)
@@ -0,0 +1,178 @@
+"""
+Streaming export of a member's data.
+
+Each section is read with ``.values().iterator(chunk_size=EXPORT_CHUNK_SIZE)``
+in primary-key order, so rows are fetched from the cursor in chunks and
+never cached in a queryset. Rows are encoded and yielded as they arrive:
+
+* ``ndjson``: one JSON object per line, tagged with its ``type``;
+* ``zip``: ``profile.json`` plus one NDJSON file per section, deflated into
+  a zip written to the stream (entries use data descriptors, so no seeking
+  is needed).
+
+Memory use is bounded by one chunk of rows plus ``EXPORT_BUFFER_SIZE`` bytes
+of output, whatever the account's size. Sharded sections (see api.sharding)
+are read shard by shard.
+"""
+import json
+import zipfile
+from itertools import chain
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import (
+    ArchivedComment,
+    ArchivedLike,
+    ArchivedPost,
+    Comment,
+    Friendship,
+    Like,
+    Member,
+    Post
+)
+from .sharding import aliases, using
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'zip': ('application/zip', 'zip'),
+}
+
+PROFILE_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'bio', 'avatar', 'city',
+    'created_at',
+)
+
+encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def export_sections(member_id):
+    """
+    Map each section name to a lazily evaluated iterator of row dicts.
+    """
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+
+    # Each section is read in the order of the index it is looked up by,
+    # so streaming it needs no sort.
+    def rows(queryset, ordering, *fields):
+        return queryset.order_by(*ordering).values(*fields).iterator(
+            chunk_size=chunk_size
+        )
+
+    # Hot rows, then those moved to the archive (see api.archive).
+    return {
+        'posts': chain(
+            *(rows(
+                using(model.objects, alias).filter(author_id=member_id),
+                ('created_at', 'id'),
+                'id', 'content', 'created_at', 'updated_at'
+            ) for model in (Post, ArchivedPost) for alias in aliases())
+        ),
+        'comments': chain(
+            *(rows(
+                using(model.objects, alias).filter(author_id=member_id),
+                ('id',),
+                'id', 'post_id', 'parent_id', 'content', 'created_at'
+            ) for model in (Comment, ArchivedComment) for alias in aliases())
+        ),
+        'likes': chain(
+            *(rows(
+                using(model.objects, alias).filter(member_id=member_id),
+                ('post_id',),
+                'post_id', 'created_at'
+            ) for model in (Like, ArchivedLike) for alias in aliases())
+        ),
+        'friendships': rows(
+            Friendship.objects.filter(member_id=member_id),
+            ('friend_id',),
+            'friend_id', 'created_at'
+        ),
+    }
+
+
+def export_profile(member_id):
+    return Member.objects.values(*PROFILE_FIELDS).get(id=member_id)
+
+
+def _buffered(pieces):
+    """Join small byte strings into chunks of about EXPORT_BUFFER_SIZE."""
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= settings.EXPORT_BUFFER_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _line(record):
+    return (encoder.encode(record) + '\n').encode()
+
+
+def stream_ndjson(member_id):
+    """Yield the export as NDJSON byte chunks."""
+    def lines():
+        yield _line({'type': 'profile', **export_profile(member_id)})
+        for section, records in export_sections(member_id).items():
+            kind = section[:-1]
+            for record in records:
+                yield _line({'type': kind, **record})
+
+    return _buffered(lines())
+
+
+class _StreamBuffer:
+    """
+    Write-only file object collecting what zipfile writes so it can be
+    yielded; it cannot seek, so zipfile streams entries.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def stream_zip(member_id):
+    """Yield the export as zip archive byte chunks."""
+    output = _StreamBuffer()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            'profile.json',
+            json.dumps(export_profile(member_id), cls=DjangoJSONEncoder, indent=2)
+        )
+        yield output.drain()
+        for section, records in export_sections(member_id).items():
+            with archive.open(f'{section}.ndjson', 'w', force_zip64=True) as entry:
+                for record in records:
+                    entry.write(_line(record))
+                    if len(output.buffer) >= settings.EXPORT_BUFFER_SIZE:
+                        yield output.drain()
+            yield output.drain()
+    yield output.drain()
+
+
+def stream_export(member_id, export_format):
+    if export_format == 'zip':
+        return stream_zip(member_id)
+    return stream_ndjson(member_id)
+
+
+def export_filename(member_id, export_format):
+    return f'member-{member_id}-export.{EXPORT_FORMATS[export_format][1]}'
@@ -0,0 +1,165 @@
+"""
+Cached friend-id sets.
+
+The feed, search, hashtag timelines and every ``is_friend`` answer need the
+ids of the viewer's friends. They are kept per member as a sorted
+``array('q')`` (8 bytes an id, binary-searched), in two layers:
+
+* the cache named by ``FRIEND_CACHE_ALIAS``, shared by every worker (a
+  per-process cache is rejected by the api.E001 check), holds the array's
+  bytes for ``FRIEND_CACHE_TTL`` seconds;
+* each worker keeps the arrays it used in a bounded LRU and trusts them for
+  ``FRIEND_CACHE_LOCAL_TTL`` seconds, so a friend change made through
+  another worker shows up there after at most that long.
+
+``FriendToggleView`` updates both layers in place instead of dropping them.
+The arrays are never mutated: an update swaps in a new one, so a thread
+iterating the old array is not affected.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+from .models import Friendship
+from .sharding import get_shards
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+class FriendIds:
+    """
+    Sorted, immutable set of member ids.
+    """
+    __slots__ = ('ids',)
+
+    def __init__(self, ids=()):
+        self.ids = ids if isinstance(ids, array) else array('q', sorted(ids))
+
+    @classmethod
+    def frombytes(cls, data):
+        ids = array('q')
+        ids.frombytes(data)
+        return cls(ids)
+
+    def tobytes(self):
+        return self.ids.tobytes()
+
+    def __contains__(self, member_id):
+        index = bisect_left(self.ids, member_id)
+        return index < len(self.ids) and self.ids[index] == member_id
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def with_id(self, member_id):
+        if member_id in self:
+            return self
+        ids = array('q', self.ids)
+        ids.insert(bisect_left(ids, member_id), member_id)
+        return FriendIds(ids)
+
+    def without_id(self, member_id):
+        if member_id not in self:
+            return self
+        ids = array('q', self.ids)
+        del ids[bisect_left(ids, member_id)]
+        return FriendIds(ids)
+
+
+def get_cache():
+    return caches[settings.FRIEND_CACHE_ALIAS]
+
+
+def _cache_key(member_id):
+    return f'friends:{member_id}'
+
+
+def _remember(member_id, ids):
+    with _local_lock:
+        _local[member_id] = (time.monotonic() + settings.FRIEND_CACHE_LOCAL_TTL, ids)
+        _local.move_to_end(member_id)
+        while len(_local) > settings.FRIEND_CACHE_LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def clear_local():
+    """Forget this worker's copies (the shared cache is left alone)."""
+    with _local_lock:
+        _local.clear()
+
+
+def friend_ids(member_id):
+    """The FriendIds of member_id's friends, loaded once per cache lifetime."""
+    with _local_lock:
+        entry = _local.get(member_id)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+
+    cache = get_cache()
+    data = cache.get(_cache_key(member_id))
+    if data is None:
+        ids = FriendIds(array('q', Friendship.objects.filter(
+            member_id=member_id
+        ).order_by('friend_id').values_list('friend_id', flat=True)))
+        cache.set(_cache_key(member_id), ids.tobytes(), settings.FRIEND_CACHE_TTL)
+    else:
+        ids = FriendIds.frombytes(data)
+    _remember(member_id, ids)
+    return ids
+
+
+def is_friend(member_id, other_id):
+    """Whether member_id has other_id in their friend list."""
+    return member_id != other_id and other_id in friend_ids(member_id)
+
+
+def _update(member_id, change):
+    # Concurrent changes by the same member through two workers can lose
+    # one update here; the entry then heals when FRIEND_CACHE_TTL expires.
+    cache = get_cache()
+    data = cache.get(_cache_key(member_id))
+    if data is not None:
+        cache.set(
+            _cache_key(member_id),
+            change(FriendIds.frombytes(data)).tobytes(),
+            settings.FRIEND_CACHE_TTL
+        )
+    with _local_lock:
+        entry = _local.get(member_id)
+    if entry is not None:
+        _remember(member_id, change(entry[1]))
+
+
+def friend_added(member_id, friend_id):
+    """Record a new friendship in the cached sets."""
+    _update(member_id, lambda ids: ids.with_id(friend_id))
+
+
+def friend_removed(member_id, friend_id):
+    """Record a removed friendship in the cached sets."""
+    _update(member_id, lambda ids: ids.without_id(friend_id))
+
+
+def visible_to(member, field='author_id'):
+    """
+    Q matching rows whose field is member or one of their friends. The ids
+    are inlined; sets over FRIEND_CACHE_MAX_INLINE use a subquery, which
+    is cheaper than a long IN list, unless the rows are on shards, which
+    have no friendships.
+    """
+    ids = friend_ids(member.id)
+    if len(ids) > settings.FRIEND_CACHE_MAX_INLINE and not get_shards():
+        friends = Friendship.objects.filter(member_id=member.id).values('friend_id')
+    else:
+        friends = list(ids)
+    return Q(**{field: member.id}) | Q(**{f'{field}__in': friends})
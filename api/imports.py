@@ -0,0 +1,293 @@
+"""
+Bulk member import (``manage.py import_members``).
+
+The input (CSV with a header row, or NDJSON) is read row by row and handled
+in batches of ``IMPORT_BATCH_SIZE``:
+
+1. each row is validated with the registration rules
+   (``MemberImportSerializer``);
+2. emails are checked against the database with one ``IN`` query per batch
+   and against earlier rows of the same import;
+3. passwords are hashed on a process pool, the next batch's hashes being
+   computed while the current batch is inserted;
+4. members are inserted with ``bulk_create`` in one transaction per batch.
+
+After every committed batch the number of input rows done is written to a
+state file next to the input, so an interrupted import resumes where it
+stopped. Rows may carry an already hashed ``password_hash`` instead of a
+``password``; it is stored as is.
+"""
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .models import Member
+from .serializers import RegisterSerializer
+
+
+class MemberImportSerializer(RegisterSerializer):
+    """
+    Registration rules for one imported row; email uniqueness is checked
+    per batch instead of per row.
+    """
+    password = serializers.CharField(min_length=8, write_only=True, required=False)
+    password_hash = serializers.CharField(max_length=128, required=False)
+    bio = serializers.CharField(required=False, allow_blank=True)
+    city = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+    def validate_email(self, value):
+        return value
+
+    def validate_password_hash(self, value):
+        try:
+            identify_hasher(value)
+        except ValueError:
+            raise serializers.ValidationError('Unknown password hash format.')
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get('password') and not attrs.get('password_hash'):
+            raise serializers.ValidationError(
+                'Either password or password_hash is required.'
+            )
+        return attrs
+
+
+class ImportStats:
+    """
+    Counters reported while importing.
+    """
+
+    def __init__(self, rows=0, imported=0, duplicates=0, invalid=0):
+        self.rows = rows
+        self.imported = imported
+        self.duplicates = duplicates
+        self.invalid = invalid
+        self.started = time.monotonic()
+        self.resumed_rows = rows
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return (self.rows - self.resumed_rows) / elapsed if elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+        }
+
+
+def read_rows(path, input_format=None):
+    """
+    Yield the input's rows as dicts, streaming the file. An NDJSON line that
+    is not valid JSON is yielded as its text, to be rejected as invalid.
+    """
+    input_format = input_format or (
+        'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+    )
+    with open(path, newline='', encoding='utf-8') as source:
+        if input_format == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield line.rstrip('\n')
+
+
+def state_path(path):
+    return f'{path}.import-state.json'
+
+
+def load_state(path):
+    """Saved progress of an earlier run over the same input, or None."""
+    try:
+        with open(state_path(path)) as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return None
+    if state.get('size') != os.path.getsize(path):
+        return None
+    return state
+
+
+def save_state(path, stats):
+    state = dict(stats.as_dict(), size=os.path.getsize(path))
+    tmp_path = state_path(path) + '.tmp'
+    with open(tmp_path, 'w') as state_file:
+        json.dump(state, state_file)
+    os.replace(tmp_path, state_path(path))
+
+
+def _init_worker():
+    # Needed when the pool spawns rather than forks its processes.
+    import django
+
+    django.setup()
+
+
+def _hash_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class MemberImporter:
+    """
+    Import members from a file; see the module docstring.
+    """
+
+    def __init__(self, path, input_format=None, batch_size=None, workers=None,
+                 resume=True, reject=None, progress=None):
+        self.path = path
+        self.input_format = input_format
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.workers = workers or os.cpu_count() or 1
+        self.resume = resume
+        self.reject = reject or (lambda line, row, reason: None)
+        self.progress = progress or (lambda stats: None)
+        self.seen_emails = set()
+
+    def run(self):
+        state = load_state(self.path) if self.resume else None
+        stats = ImportStats(**{
+            key: state[key] for key in ('rows', 'imported', 'duplicates', 'invalid')
+        }) if state else ImportStats()
+
+        rows = read_rows(self.path, self.input_format)
+        # Line numbers count data rows from 1.
+        numbered = (
+            (number, row) for number, row in enumerate(rows, 1)
+            if number > stats.rows
+        )
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker
+        ) as executor:
+            pending = deque()
+            for batch in _batches(numbered, self.batch_size):
+                pending.append(self.prepare(batch, executor))
+                # Keep one batch hashing while the previous one is inserted.
+                if len(pending) > 1:
+                    self.insert(pending.popleft(), stats)
+            while pending:
+                self.insert(pending.popleft(), stats)
+        return stats
+
+    def prepare(self, batch, executor):
+        """
+        Validate a batch, drop known emails and start hashing its passwords.
+        Counters are applied when the batch is inserted, so the saved state
+        always matches the committed rows.
+        """
+        prepared = {'last_row': batch[-1][0], 'invalid': 0, 'duplicates': 0}
+        valid = []
+        for number, row in batch:
+            if not isinstance(row, dict):
+                prepared['invalid'] += 1
+                self.reject(number, row, 'not a JSON object')
+                continue
+            serializer = MemberImportSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((number, row, serializer.validated_data))
+            else:
+                prepared['invalid'] += 1
+                self.reject(number, row, json.dumps(serializer.errors))
+
+        emails = [data['email'] for _, _, data in valid]
+        # Soft-deleted members keep their email until they are purged.
+        existing = set(
+            Member.all_objects.filter(email__in=emails).values_list('email', flat=True)
+        )
+        members = []
+        # Input line and row of each member, for rejecting it on insert.
+        sources = []
+        passwords = []
+        for number, row, data in valid:
+            email = data['email']
+            if email in existing or email in self.seen_emails:
+                prepared['duplicates'] += 1
+                self.reject(number, row, 'duplicate email')
+                continue
+            self.seen_emails.add(email)
+            members.append(Member(
+                email=email,
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                bio=data.get('bio', ''),
+                city=data.get('city', ''),
+                password=data.get('password_hash', '')
+            ))
+            sources.append((number, row))
+            passwords.append(data.get('password'))
+
+        to_hash = [
+            (index, password) for index, password in enumerate(passwords)
+            if password
+        ]
+        chunk = max(1, -(-len(to_hash) // self.workers))
+        prepared['members'] = members
+        prepared['sources'] = sources
+        prepared['futures'] = [
+            (
+                [index for index, _ in to_hash[start:start + chunk]],
+                executor.submit(
+                    _hash_passwords,
+                    [password for _, password in to_hash[start:start + chunk]]
+                )
+            )
+            for start in range(0, len(to_hash), chunk)
+        ]
+        return prepared
+
+    def insert(self, prepared, stats):
+        members = prepared['members']
+        for indexes, future in prepared['futures']:
+            for index, hashed in zip(indexes, future.result()):
+                members[index].password = hashed
+        try:
+            with transaction.atomic():
+                Member.objects.bulk_create(members, batch_size=self.batch_size)
+        except IntegrityError:
+            # Someone registered one of these emails since the check.
+            taken = set(Member.all_objects.filter(
+                email__in=[member.email for member in members]
+            ).values_list('email', flat=True))
+            stats.duplicates += len(taken)
+            kept = []
+            for member, (number, row) in zip(members, prepared['sources']):
+                if member.email in taken:
+                    self.reject(number, row, 'duplicate email')
+                else:
+                    kept.append(member)
+            members = kept
+            with transaction.atomic():
+                Member.objects.bulk_create(members, batch_size=self.batch_size)
+        stats.imported += len(members)
+        stats.invalid += prepared['invalid']
+        stats.duplicates += prepared['duplicates']
+        stats.rows = prepared['last_row']
+        save_state(self.path, stats)
+        self.progress(stats)
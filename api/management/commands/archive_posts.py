@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from api.archive import archive_posts
+
+
+class Command(BaseCommand):
+    """
+    Move posts older than ARCHIVE_AFTER_DAYS, with their likes and
+    comments, to the archive tables.
+    """
+    help = 'Archive old posts with their likes and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Archive posts older than this (default: ARCHIVE_AFTER_DAYS).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Posts moved per transaction.'
+        )
+
+    def handle(self, *args, **options):
+        total = archive_posts(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            progress=lambda rows: self.stdout.write(f'{rows} posts archived')
+        )
+        self.stdout.write(f'Archived {total} posts.')
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from api.tags import backfill
+
+
+class Command(BaseCommand):
+    """
+    Index the hashtags and mentions of posts and comments written before
+    they were indexed at write time.
+    """
+    help = 'Extract hashtags and mentions from existing posts and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            choices=['posts', 'comments'],
+            help='Backfill only this table.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows read and indexed per transaction.'
+        )
+        parser.add_argument(
+            '--after',
+            type=int,
+            default=0,
+            help='Resume after this id (printed as progress); needs --only.'
+        )
+
+    def handle(self, *args, **options):
+        sources = [options['only']] if options['only'] else ['posts', 'comments']
+        for source in sources:
+            def progress(last_id, rows):
+                self.stdout.write(f'{source}: {rows} rows, last id {last_id}')
+
+            total = backfill(
+                source,
+                batch_size=options['batch_size'],
+                after=options['after'] if options['only'] else 0,
+                progress=progress
+            )
+            self.stdout.write(f'Indexed {total} {source}.')
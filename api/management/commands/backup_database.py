@@ -0,0 +1,94 @@
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.backup import BackupError, create_backup, list_backups, snapshot_files
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Take an online snapshot of the database and of every shard.
+
+    Run once (e.g. from cron) or with --every as a long-running scheduled
+    job, as supervisord does in the Docker image.
+    """
+    help = 'Snapshot the database with the online backup API and rotate old snapshots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every',
+            type=float,
+            help='Keep running and take a snapshot every this many seconds.'
+        )
+        parser.add_argument(
+            '--step-pages',
+            type=int,
+            default=settings.BACKUP_STEP_PAGES,
+            help='Pages copied per step; -1 copies everything in one step.'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=settings.BACKUP_STEP_PAUSE,
+            help='Seconds to pause between steps so writers can commit.'
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=settings.BACKUP_KEEP,
+            help='Number of snapshots to keep.'
+        )
+        parser.add_argument(
+            '--no-compress',
+            action='store_true',
+            help='Store the snapshot uncompressed.'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List the existing snapshots and exit.'
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for path in list_backups():
+                size = sum(
+                    os.path.getsize(file_path)
+                    for file_path in snapshot_files(path).values()
+                )
+                self.stdout.write(f'{path} ({size} bytes)')
+            return
+
+        if not options['every']:
+            self.snapshot(options)
+            return
+
+        while True:
+            try:
+                self.snapshot(options)
+            except Exception:
+                logger.exception('Scheduled backup failed')
+            time.sleep(options['every'])
+
+    def snapshot(self, options):
+        start = time.monotonic()
+        try:
+            written = create_backup(
+                compress=not options['no_compress'],
+                keep=options['keep'],
+                pages=options['step_pages'],
+                pause=options['pause']
+            )
+        except BackupError as exc:
+            raise CommandError(str(exc))
+        for alias, path, progress in written:
+            self.stdout.write(
+                f'Wrote {alias} to {path} ({os.path.getsize(path)} bytes): '
+                f'{progress.steps} steps, {progress.restarts} restarts.'
+            )
+        self.stdout.write(f'Snapshot taken in {time.monotonic() - start:.2f}s.')
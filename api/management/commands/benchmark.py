@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.benchmarks import REGISTRY
+
+
+class Command(BaseCommand):
+    """
+    Run a benchmark from api.benchmarks against a throwaway database.
+    """
+    help = 'Run a registered benchmark and print its metrics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='Benchmark to run.')
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List available benchmarks.'
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=100_000,
+            help='Size of the seeded data set.'
+        )
+        parser.add_argument(
+            '--on-disk',
+            action='store_true',
+            help='Use a temporary database file instead of an in-memory one.'
+        )
+
+    def handle(self, *args, **options):
+        if options['list'] or not options['name']:
+            for name, func in sorted(REGISTRY.items()):
+                summary = (func.__doc__ or '').strip().splitlines()[0:1]
+                self.stdout.write(f'{name}: {" ".join(summary)}')
+            return
+
+        func = REGISTRY.get(options['name'])
+        if func is None:
+            raise CommandError(f'Unknown benchmark {options["name"]!r}')
+
+        tmpdir = None
+        if options['on_disk']:
+            tmpdir = tempfile.mkdtemp(prefix='benchmark-')
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                tmpdir, 'benchmark.sqlite3'
+            )
+        old_name = connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            serialize=False
+        )
+        try:
+            results = func(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if tmpdir:
+                os.rmdir(tmpdir)
+
+        for key, value in results.items():
+            self.stdout.write(f'{key}: {value}')
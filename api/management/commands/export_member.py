@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import EXPORT_FORMATS, export_filename, stream_export
+from api.models import Member
+
+
+class Command(BaseCommand):
+    """
+    Write a member's data export to a file or stdout.
+    """
+    help = 'Stream a member\'s profile, posts, comments, likes and friendships.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('member', help='Member id or email.')
+        parser.add_argument(
+            '--format',
+            choices=sorted(EXPORT_FORMATS),
+            default='ndjson'
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write, "-" for stdout; defaults to '
+                 'member-<id>-export.<format>.'
+        )
+
+    def handle(self, *args, **options):
+        lookup = options['member']
+        field = 'id' if lookup.isdigit() else 'email'
+        member_id = Member.objects.filter(**{field: lookup}).values_list(
+            'id', flat=True
+        ).first()
+        if member_id is None:
+            raise CommandError(f'Member {lookup!r} not found')
+
+        output = options['output'] or export_filename(member_id, options['format'])
+        size = 0
+        target = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for chunk in stream_export(member_id, options['format']):
+                target.write(chunk)
+                size += len(chunk)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+        if output != '-':
+            self.stderr.write(f'Wrote {size} bytes to {output}.')
@@ -0,0 +1,85 @@
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import MemberImporter, state_path
+
+
+class Command(BaseCommand):
+    """
+    Import members from a CSV or NDJSON file.
+
+    Columns: email, first_name, last_name and either password or
+    password_hash; bio and city are optional. Rerunning the command on the
+    same file resumes after the last committed batch.
+    """
+    help = 'Bulk import members, validating and hashing in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header) or NDJSON file.')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help='Input format; guessed from the extension by default.'
+        )
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Password hashing processes; defaults to the CPU count.'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore saved progress and start from the first row.'
+        )
+        parser.add_argument(
+            '--rejects',
+            help='CSV file to write rejected rows and reasons to.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+
+        rejects_file = None
+        reject = None
+        if options['rejects']:
+            rejects_file = open(options['rejects'], 'a', newline='')
+            writer = csv.writer(rejects_file)
+
+            def reject(line, row, reason):
+                email = row.get('email', '') if isinstance(row, dict) else ''
+                writer.writerow([line, email, reason])
+
+        def progress(stats):
+            self.stdout.write(
+                f'{stats.rows} rows: {stats.imported} imported, '
+                f'{stats.duplicates} duplicates, {stats.invalid} invalid '
+                f'({stats.rows_per_second:.0f} rows/s)'
+            )
+
+        importer = MemberImporter(
+            path,
+            input_format=options['format'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            resume=not options['restart'],
+            reject=reject,
+            progress=progress
+        )
+        if importer.resume and os.path.exists(state_path(path)):
+            self.stdout.write(f'Resuming from {state_path(path)}')
+        try:
+            stats = importer.run()
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {stats.rows} rows, {stats.imported} imported, '
+            f'{stats.duplicates} duplicates, {stats.invalid} invalid '
+            f'({stats.rows_per_second:.0f} rows/s).'
+        ))
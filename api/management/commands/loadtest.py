@@ -0,0 +1,251 @@
+import http.client
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api.benchmarks import insert_rows, seed_members
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    """
+    Load-test gunicorn with each worker model against a seeded database.
+    """
+    help = (
+        'Start gunicorn once per worker class against a seeded throwaway '
+        'database, drive the feed and like endpoints with concurrent '
+        'keep-alive clients, and report throughput and latency percentiles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker-classes',
+            default='sync,gthread',
+            help='Comma-separated GUNICORN_WORKER_CLASS values to compare.'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=15.0,
+            help='Measured seconds per worker class.'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=float,
+            default=2.0,
+            help='Seconds of load before measuring starts.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=16,
+            help='Concurrent client connections.'
+        )
+        parser.add_argument(
+            '--like-ratio',
+            type=float,
+            default=0.2,
+            help='Fraction of requests that toggle a like; the rest read the feed.'
+        )
+        parser.add_argument('--members', type=int, default=1000)
+        parser.add_argument('--friends', type=int, default=50)
+        parser.add_argument('--posts-per-member', type=int, default=5)
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Random seed for the data set and the request mix.'
+        )
+
+    def handle(self, *args, **options):
+        tmpdir = tempfile.mkdtemp(prefix='loadtest-')
+        db_path = os.path.join(tmpdir, 'loadtest.sqlite3')
+        connection.settings_dict['TEST']['NAME'] = db_path
+        old_name = connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            serialize=False
+        )
+        try:
+            self.seed(options)
+            connection.close()
+            for worker_class in options['worker_classes'].split(','):
+                self.stdout.write(f'== {worker_class}')
+                results = self.run_worker_class(worker_class, db_path, options)
+                for key, value in results.items():
+                    self.stdout.write(f'{key}: {value}')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def seed(self, options):
+        """Members with a ring of friendships, each with a few posts."""
+        rng = random.Random(options['seed'])
+        members = options['members']
+        friends = min(options['friends'], members - 1)
+        now = timezone.now()
+        seed_members(members)
+        insert_rows(
+            'friendships',
+            ['member_id', 'friend_id', 'created_at'],
+            (
+                (member, (member + offset - 1) % members + 1, now)
+                for member in range(1, members + 1)
+                for offset in range(1, friends + 1)
+            )
+        )
+        insert_rows(
+            'posts',
+            ['author_id', 'content', 'created_at', 'updated_at'],
+            (
+                (member, f'Load test post {i}', now, now)
+                for member in range(1, members + 1)
+                for i in range(options['posts_per_member'])
+            )
+        )
+        self.post_count = members * options['posts_per_member']
+        self.cookies = [
+            signing.dumps(member, key=settings.SECRET_KEY)
+            for member in range(1, members + 1)
+        ]
+        rng.shuffle(self.cookies)
+
+    def run_worker_class(self, worker_class, db_path, options):
+        port = free_port()
+        env = dict(
+            os.environ,
+            DJANGO_DB_PATH=db_path,
+            GUNICORN_BIND=f'127.0.0.1:{port}',
+            GUNICORN_WORKER_CLASS=worker_class
+        )
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn',
+                '--config', 'gunicorn.conf.py',
+                '--access-logfile', '/dev/null',
+                'config.wsgi:application',
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            self.wait_until_ready(port, server)
+            return self.drive(port, options)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    def wait_until_ready(self, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('gunicorn exited during startup')
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', '/api/posts')
+                conn.getresponse().read()
+                conn.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError('gunicorn did not start in time')
+
+    def drive(self, port, options):
+        """Run the clients and summarise what was measured."""
+        start = time.monotonic()
+        measure_from = start + options['warmup']
+        stop_at = measure_from + options['duration']
+        samples = {'feed': [], 'like': []}
+        errors = {'feed': 0, 'like': 0}
+        lock = threading.Lock()
+
+        def client(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            latencies = {'feed': [], 'like': []}
+            failed = {'feed': 0, 'like': 0}
+            while True:
+                now = time.monotonic()
+                if now >= stop_at:
+                    break
+                cookie = rng.choice(self.cookies)
+                if rng.random() < options['like_ratio']:
+                    kind = 'like'
+                    method = 'POST'
+                    path = f'/api/posts/{rng.randint(1, self.post_count)}/like'
+                else:
+                    kind, method, path = 'feed', 'GET', '/api/posts'
+                began = time.perf_counter()
+                try:
+                    conn.request(method, path, headers={
+                        'Cookie': f'session_id={cookie}',
+                        'Content-Length': '0',
+                    })
+                    response = conn.getresponse()
+                    response.read()
+                    ok = response.status < 400
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                    ok = False
+                elapsed = time.perf_counter() - began
+                if now >= measure_from:
+                    latencies[kind].append(elapsed)
+                    failed[kind] += not ok
+            conn.close()
+            with lock:
+                for kind in samples:
+                    samples[kind].extend(latencies[kind])
+                    errors[kind] += failed[kind]
+
+        threads = [
+            threading.Thread(target=client, args=(index,))
+            for index in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        results = {}
+        total = 0
+        for kind, latencies in samples.items():
+            latencies.sort()
+            total += len(latencies)
+            results[f'{kind}_requests'] = len(latencies)
+            results[f'{kind}_errors'] = errors[kind]
+            results[f'{kind}_p50_ms'] = round(percentile(latencies, 0.50) * 1000, 1)
+            results[f'{kind}_p99_ms'] = round(percentile(latencies, 0.99) * 1000, 1)
+            results[f'{kind}_mean_ms'] = round(
+                statistics.fmean(latencies) * 1000 if latencies else 0.0, 1
+            )
+        results['throughput_rps'] = round(total / options['duration'], 1)
+        return results
@@ -0,0 +1,52 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.compression import compress_file
+
+
+class Command(BaseCommand):
+    """
+    Write compressed copies of built static assets next to them, for
+    nginx's gzip_static. Run after the React build and collectstatic.
+    """
+    help = 'Precompress built static assets (.gz, and .br with brotli).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'directories',
+            nargs='*',
+            help='Directories to walk (default: STATIC_PRECOMPRESS_DIRS).'
+        )
+
+    def handle(self, *args, **options):
+        directories = options['directories'] or settings.STATIC_PRECOMPRESS_DIRS
+        extensions = tuple(settings.STATIC_PRECOMPRESS_EXTENSIONS)
+        totals = {'files': 0, 'original': 0, '.gz': 0, '.br': 0}
+        for directory in directories:
+            if not os.path.isdir(directory):
+                self.stderr.write(f'Skipping {directory}: not a directory.')
+                continue
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    if not name.endswith(extensions):
+                        continue
+                    size = os.path.getsize(path)
+                    if size < settings.STATIC_PRECOMPRESS_MIN_SIZE:
+                        continue
+                    written = compress_file(path)
+                    if not written:
+                        continue
+                    totals['files'] += 1
+                    totals['original'] += size
+                    for suffix, compressed in written.items():
+                        totals[suffix] += compressed
+
+        self.stdout.write(
+            f'Precompressed {totals["files"]} files: {totals["original"]} bytes, '
+            f'{totals[".gz"]} gzipped'
+            + (f', {totals[".br"]} brotli' if totals['.br'] else '')
+            + '.'
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.deletion import run_pending_jobs
+from api.models import DeletionJob
+
+
+class Command(BaseCommand):
+    """
+    Purge soft-deleted posts and members whose jobs are still pending, were
+    left running by a worker that was killed (see DELETION_JOB_LEASE), or
+    failed and are due for a retry (see DELETION_JOB_RETRY_DELAY).
+    """
+    help = 'Run pending deletion jobs and report progress of all jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Requeue failed jobs, including those out of attempts, before running.'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            DeletionJob.objects.filter(status=DeletionJob.STATUS_FAILED).update(
+                status=DeletionJob.STATUS_PENDING,
+                attempts=0,
+                error=''
+            )
+        count = run_pending_jobs()
+        self.stdout.write(f'Ran {count} deletion jobs.')
+        for job in DeletionJob.objects.exclude(status=DeletionJob.STATUS_DONE):
+            self.stdout.write(f'{job}: {job.rows_deleted} rows deleted')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.sharding import get_shards, rebalance
+
+
+class Command(BaseCommand):
+    """
+    Move posts, with their likes, comments and references, to their
+    author's shard after DATABASE_SHARDS changed. Migrate new shards first.
+    """
+    help = 'Move posts stored on another shard than their author\'s.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Posts moved per transaction.'
+        )
+
+    def handle(self, *args, **options):
+        if not get_shards():
+            raise CommandError('Sharding is off: DATABASE_SHARDS is empty.')
+        total = rebalance(
+            batch_size=options['batch_size'],
+            progress=lambda posts: self.stdout.write(f'{posts} posts moved')
+        )
+        self.stdout.write(f'Moved {total} posts.')
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from api.models import Comment, Like, Post
+from api.routers import get_replicas, read_counts
+
+
+class Command(BaseCommand):
+    """
+    Report how far each read replica lags behind the primary, and how many
+    handlers every worker has routed to the primary and to each replica.
+    """
+    help = 'Show replication lag and usage of the configured read replicas.'
+
+    def latest(self, alias):
+        """Newest id of each activity table and newest post time on alias."""
+        return {
+            'posts': Post.objects.using(alias).order_by('-id').values_list(
+                'id', 'created_at'
+            ).first() or (0, None),
+            'likes': Like.objects.using(alias).order_by('-id').values_list(
+                'id', flat=True
+            ).first() or 0,
+            'comments': Comment.objects.using(alias).order_by('-id').values_list(
+                'id', flat=True
+            ).first() or 0,
+        }
+
+    def handle(self, *args, **options):
+        replicas = get_replicas()
+        if not replicas:
+            self.stdout.write('No read replicas configured.')
+            return
+
+        reads = read_counts()
+        self.stdout.write(f'{DEFAULT_DB_ALIAS}: reads={reads[DEFAULT_DB_ALIAS]}')
+        primary = self.latest(DEFAULT_DB_ALIAS)
+        primary_post_id, primary_post_time = primary['posts']
+        for alias in replicas:
+            replica = self.latest(alias)
+            replica_post_id, replica_post_time = replica['posts']
+            if primary_post_time and replica_post_time:
+                lag = (primary_post_time - replica_post_time).total_seconds()
+            else:
+                lag = 0.0
+            self.stdout.write(
+                f'{alias}: lag={lag:.1f}s '
+                f'posts_behind={primary_post_id - replica_post_id} '
+                f'likes_behind={primary["likes"] - replica["likes"]} '
+                f'comments_behind={primary["comments"] - replica["comments"]} '
+                f'reads={reads[alias]}'
+            )
@@ -0,0 +1,46 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from api.backup import BackupError, list_backups, restore_backup
+
+
+class Command(BaseCommand):
+    """
+    Restore the database, and every shard, from a snapshot taken by
+    backup_database.
+    """
+    help = 'Restore the database from a snapshot (the newest by default).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            help='Snapshot to restore; defaults to the newest in BACKUP_DIR.'
+        )
+        parser.add_argument(
+            '--yes',
+            action='store_true',
+            help='Do not ask for confirmation.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path'] or next(iter(list_backups()), None)
+        if path is None:
+            raise CommandError('No snapshot found')
+
+        if not options['yes']:
+            answer = input(f'Replace the database with {path}? [y/N] ')
+            if answer.lower() != 'y':
+                raise CommandError('Restore cancelled')
+
+        try:
+            restore_backup(path)
+        except BackupError as exc:
+            raise CommandError(str(exc))
+        # Derived data cached from the old contents is stale now.
+        for cache in caches.all():
+            cache.clear()
+        self.stdout.write(
+            f'Restored {path}. Restart the workers so their local caches '
+            'are dropped too.'
+        )
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.throttling import rejection_counts
+
+
+class Command(BaseCommand):
+    """
+    Report the configured rate of each throttle scope and how many requests
+    it has rejected, counted in the THROTTLE_CACHE_ALIAS cache.
+    """
+    help = 'Show rate limits and rejected requests per throttle scope.'
+
+    def handle(self, *args, **options):
+        for scope, rejected in rejection_counts().items():
+            self.stdout.write(
+                f'{scope}: rate={settings.THROTTLE_RATES[scope]} rejected={rejected}'
+            )
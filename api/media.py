@@ -0,0 +1,174 @@
+"""
+Avatar storage.
+
+Uploads are streamed from the request body to a temporary file in
+``AVATAR_STAGING_DIR``, which nginx does not serve, while being hashed,
+then moved to ``avatars/<xx>/<sha256>.<ext>`` under ``MEDIA_ROOT``.
+Names depend only on content, so nginx can serve them as immutable and
+identical uploads share one file. Square thumbnails for ``AVATAR_SIZES`` are
+rendered on a thread pool next to the original as ``<sha256>_<size>.<ext>``.
+
+Pillow (in requirements.txt) renders them; without it no thumbnails are
+written. Until a thumbnail exists nginx redirects its URL to the original
+without caching the redirect, so clients pick up the thumbnail once it is
+rendered.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+
+_executor = None
+
+
+class AvatarError(Exception):
+    """Raised when an upload is not an acceptable avatar."""
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.AVATAR_THUMBNAIL_WORKERS,
+            thread_name_prefix='avatar-thumbnail'
+        )
+    return _executor
+
+
+def detect_extension(head):
+    """Return the file extension for an image header, or None."""
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def avatar_path(key, size=None):
+    """Path of an avatar relative to MEDIA_ROOT, optionally of a thumbnail."""
+    digest, extension = key.rsplit('.', 1)
+    name = digest if size is None else f'{digest}_{size}'
+    return f'avatars/{digest[:2]}/{name}.{extension}'
+
+
+def avatar_url(key, size=None):
+    return settings.MEDIA_URL + avatar_path(key, size)
+
+
+def thumbnail_urls(key):
+    """Map each configured thumbnail size to its URL."""
+    if not key:
+        return {}
+    return {str(size): avatar_url(key, size) for size in settings.AVATAR_SIZES}
+
+
+def staging_dir():
+    """Directory for files still being written, created on first use."""
+    path = str(settings.AVATAR_STAGING_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def save_avatar(stream):
+    """
+    Store an avatar read from a file-like stream and return its key.
+
+    The body is consumed in CHUNK_SIZE pieces so memory use does not depend
+    on the upload size.
+    """
+    media_root = str(settings.MEDIA_ROOT)
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    fd, tmp_path = tempfile.mkstemp(dir=staging_dir())
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.AVATAR_MAX_BYTES:
+                    raise AvatarError('Avatar is too large')
+                if len(head) < 12:
+                    head += chunk[:12]
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        if size == 0:
+            raise AvatarError('Avatar is empty')
+        extension = detect_extension(head)
+        if extension is None:
+            raise AvatarError('Avatar must be a PNG, JPEG, GIF or WebP image')
+
+        key = f'{digest.hexdigest()}.{extension}'
+        final_path = os.path.join(media_root, avatar_path(key))
+        if os.path.exists(final_path):
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    schedule_thumbnails(key)
+    return key
+
+
+def schedule_thumbnails(key):
+    """Render the missing thumbnails of an avatar on the thread pool."""
+    if Image is None:
+        return []
+    return [
+        get_executor().submit(render_thumbnail, key, size)
+        for size in settings.AVATAR_SIZES
+    ]
+
+
+def render_thumbnail(key, size):
+    """Write a size x size center-cropped thumbnail unless it exists."""
+    media_root = str(settings.MEDIA_ROOT)
+    target = os.path.join(media_root, avatar_path(key, size))
+    if os.path.exists(target):
+        return target
+    source = os.path.join(media_root, avatar_path(key))
+    try:
+        with Image.open(source) as image:
+            image_format = image.format
+            image = ImageOps.exif_transpose(image)
+            thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=staging_dir(),
+                suffix=os.path.splitext(target)[1]
+            )
+            with os.fdopen(fd, 'wb') as tmp:
+                thumbnail.save(tmp, format=image_format)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, target)
+    except Exception:
+        logger.exception('Could not render %spx thumbnail of %s', size, key)
+        return None
+    return target
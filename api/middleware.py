@@ -0,0 +1,75 @@
+"""
+Per-route middleware.
+
+``BrowserMiddleware`` runs the middleware listed in ``BROWSER_MIDDLEWARE``
+(sessions, CSRF, auth, messages, clickjacking) around every request except
+those under ``API_PATH_PREFIX``. The JSON API authenticates with its own
+signed ``session_id`` cookie (``SameSite=Lax``, so browsers do not send it
+on cross-site POSTs) and its unsafe views are all ``csrf_exempt`` DRF
+views, so that middleware only costs time there. Middleware that protects
+every response (``SecurityMiddleware``, ``CommonMiddleware``) stays in
+``MIDDLEWARE``.
+"""
+from django.conf import settings
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+
+class BrowserMiddleware:
+    """
+    Run BROWSER_MIDDLEWARE for requests outside the API only.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.view_hooks = []
+        self.exception_hooks = []
+        self.template_response_hooks = []
+
+        # Build the inner chain the way django.core.handlers.base does.
+        handler = get_response
+        for path in reversed(settings.BROWSER_MIDDLEWARE):
+            middleware = import_string(path)(handler)
+            if hasattr(middleware, 'process_view'):
+                self.view_hooks.insert(0, middleware.process_view)
+            if hasattr(middleware, 'process_template_response'):
+                self.template_response_hooks.append(
+                    middleware.process_template_response
+                )
+            if hasattr(middleware, 'process_exception'):
+                self.exception_hooks.append(middleware.process_exception)
+            handler = convert_exception_to_response(middleware)
+        self.browser_handler = handler
+
+    @staticmethod
+    def is_api(request):
+        return request.path_info.startswith(settings.API_PATH_PREFIX)
+
+    def __call__(self, request):
+        if self.is_api(request):
+            return self.get_response(request)
+        return self.browser_handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_api(request):
+            return None
+        for hook in self.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        if not self.is_api(request):
+            for hook in self.template_response_hooks:
+                response = hook(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if self.is_api(request):
+            return None
+        for hook in self.exception_hooks:
+            response = hook(request, exception)
+            if response is not None:
+                return response
+        return None
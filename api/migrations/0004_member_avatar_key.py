@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='avatar_key',
+            field=models.CharField(blank=True, max_length=80),
+        ),
+    ]
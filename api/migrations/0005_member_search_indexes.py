@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:07
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_member_avatar_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(django.db.models.functions.comparison.Collate('first_name', 'NOCASE'), name='members_first_name_ci'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(django.db.models.functions.comparison.Collate('last_name', 'NOCASE'), name='members_last_name_ci'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(django.db.models.functions.comparison.Collate('email', 'NOCASE'), name='members_email_ci'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='session_generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    FTS5 index over posts.content (see api.search). It is an external
+    content table: it stores only the inverted index, and triggers keep it
+    in step with every insert, delete and content update of posts.
+    """
+
+    dependencies = [
+        ('api', '0007_member_session_generation'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE posts_fts USING fts5("
+                "content, content='posts', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')",
+                "CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN "
+                "INSERT INTO posts_fts (rowid, content) VALUES (new.id, new.content); "
+                "END",
+                "CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN "
+                "INSERT INTO posts_fts (posts_fts, rowid, content) "
+                "VALUES ('delete', old.id, old.content); "
+                "END",
+                "CREATE TRIGGER posts_fts_update AFTER UPDATE OF content ON posts BEGIN "
+                "INSERT INTO posts_fts (posts_fts, rowid, content) "
+                "VALUES ('delete', old.id, old.content); "
+                "INSERT INTO posts_fts (rowid, content) VALUES (new.id, new.content); "
+                "END",
+                "INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS posts_fts_update",
+                "DROP TRIGGER IF EXISTS posts_fts_delete",
+                "DROP TRIGGER IF EXISTS posts_fts_insert",
+                "DROP TABLE IF EXISTS posts_fts",
+            ],
+        ),
+    ]
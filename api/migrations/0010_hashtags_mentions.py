@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hashtag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'hashtags',
+            },
+        ),
+        migrations.CreateModel(
+            name='HashtagUse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hashtag_uses', to='api.member')),
+                ('comment', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.comment')),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uses', to='api.hashtag')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hashtag_uses', to='api.post')),
+            ],
+            options={
+                'db_table': 'hashtag_uses',
+                'indexes': [models.Index(fields=['hashtag', '-created_at', '-id'], name='hashtag_uses_timeline')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('comment__isnull', True)), fields=('hashtag', 'post'), name='hashtag_uses_post_unique'), models.UniqueConstraint(condition=models.Q(('comment__isnull', False)), fields=('hashtag', 'comment'), name='hashtag_uses_comment_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Mention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions_written', to='api.member')),
+                ('comment', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.comment')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='api.member')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='api.post')),
+            ],
+            options={
+                'db_table': 'mentions',
+                'indexes': [models.Index(fields=['member', '-created_at', '-id'], name='mentions_inbox')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('comment__isnull', True)), fields=('member', 'post'), name='mentions_post_unique'), models.UniqueConstraint(condition=models.Q(('comment__isnull', False)), fields=('member', 'comment'), name='mentions_comment_unique')],
+            },
+        ),
+    ]
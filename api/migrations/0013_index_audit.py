@@ -0,0 +1,156 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Index audit: drop the default orderings (queries order explicitly) and
+    index the feed, likes by post and reverse friendships.
+    """
+
+    dependencies = [
+        ('api', '0012_archive'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='archivedcomment',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='archivedpost',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='comment',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='deletionjob',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='friendship',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='like',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='member',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='post',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='archivedlike',
+            index=models.Index(fields=['post', 'member'], name='likes_archive_post'),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['friend', 'member'], name='friendships_reverse'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'member'], name='likes_post'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='posts_author'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='posts_created'),
+        ),
+        # The single-column foreign key indexes are prefixes of the indexes
+        # above, comments_thread and the unique (member, ...) pairs. They
+        # are dropped directly: AlterField would rebuild each table on
+        # SQLite, and drop the full-text triggers of posts with it.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=[
+                        'DROP INDEX "comments_archive_post_id_ea501f72"',
+                        'DROP INDEX "likes_archive_member_id_7bc6b494"',
+                        'DROP INDEX "likes_archive_post_id_f69f3b5a"',
+                        'DROP INDEX "posts_archive_author_id_f0b2f835"',
+                        'DROP INDEX "comments_post_id_67cfce36"',
+                        'DROP INDEX "friendships_friend_id_8224159c"',
+                        'DROP INDEX "friendships_member_id_7f332eb1"',
+                        'DROP INDEX "likes_member_id_41381471"',
+                        'DROP INDEX "likes_post_id_84cc5834"',
+                        'DROP INDEX "posts_author_id_099b8aca"',
+                    ],
+                    reverse_sql=[
+                        'CREATE INDEX "comments_archive_post_id_ea501f72" ON "comments_archive" ("post_id")',
+                        'CREATE INDEX "likes_archive_member_id_7bc6b494" ON "likes_archive" ("member_id")',
+                        'CREATE INDEX "likes_archive_post_id_f69f3b5a" ON "likes_archive" ("post_id")',
+                        'CREATE INDEX "posts_archive_author_id_f0b2f835" ON "posts_archive" ("author_id")',
+                        'CREATE INDEX "comments_post_id_67cfce36" ON "comments" ("post_id")',
+                        'CREATE INDEX "friendships_friend_id_8224159c" ON "friendships" ("friend_id")',
+                        'CREATE INDEX "friendships_member_id_7f332eb1" ON "friendships" ("member_id")',
+                        'CREATE INDEX "likes_member_id_41381471" ON "likes" ("member_id")',
+                        'CREATE INDEX "likes_post_id_84cc5834" ON "likes" ("post_id")',
+                        'CREATE INDEX "posts_author_id_099b8aca" ON "posts" ("author_id")',
+                    ],
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='archivedcomment',
+                    name='post',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='api.archivedpost'),
+                ),
+                migrations.AlterField(
+                    model_name='archivedlike',
+                    name='member',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_likes', to='api.member'),
+                ),
+                migrations.AlterField(
+                    model_name='archivedlike',
+                    name='post',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='api.archivedpost'),
+                ),
+                migrations.AlterField(
+                    model_name='archivedpost',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to='api.member'),
+                ),
+                migrations.AlterField(
+                    model_name='comment',
+                    name='post',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='api.post'),
+                ),
+                migrations.AlterField(
+                    model_name='friendship',
+                    name='friend',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='friend_of', to='api.member'),
+                ),
+                migrations.AlterField(
+                    model_name='friendship',
+                    name='member',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='friendships', to='api.member'),
+                ),
+                migrations.AlterField(
+                    model_name='like',
+                    name='member',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='api.member'),
+                ),
+                migrations.AlterField(
+                    model_name='like',
+                    name='post',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='api.post'),
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to='api.member'),
+                ),
+            ],
+        ),
+    ]
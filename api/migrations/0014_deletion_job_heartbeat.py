@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Heartbeat on deletion jobs, so jobs left running by a killed worker are
+    claimed again.
+    """
+
+    dependencies = [
+        ('api', '0013_index_audit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletionjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Members coalesced into each notification, so a member acting again is
+    not counted as another one.
+    """
+
+    dependencies = [
+        ('api', '0014_deletion_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationActor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_actors', to='api.member')),
+                ('notification', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='actors', to='api.notification')),
+            ],
+            options={
+                'db_table': 'notification_actors',
+                'unique_together': {('notification', 'actor')},
+            },
+        ),
+        # Unread groups only know their latest actor; their counts stay.
+        migrations.RunSQL(
+            sql=(
+                'INSERT INTO notification_actors (notification_id, actor_id) '
+                'SELECT id, actor_id FROM notifications '
+                'WHERE is_read = 0 AND actor_id IS NOT NULL'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Trigram FTS5 index over members' names and emails (see api.search),
+    serving substring search. It replaces the case-insensitive indexes
+    that served prefix search.
+    """
+
+    dependencies = [
+        ('api', '0015_notification_actors'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='member',
+            name='members_first_name_ci',
+        ),
+        migrations.RemoveIndex(
+            model_name='member',
+            name='members_last_name_ci',
+        ),
+        migrations.RemoveIndex(
+            model_name='member',
+            name='members_email_ci',
+        ),
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE members_fts USING fts5("
+                "first_name, last_name, email, content='members', "
+                "content_rowid='id', tokenize='trigram')",
+                "CREATE TRIGGER members_fts_insert AFTER INSERT ON members BEGIN "
+                "INSERT INTO members_fts (rowid, first_name, last_name, email) "
+                "VALUES (new.id, new.first_name, new.last_name, new.email); "
+                "END",
+                "CREATE TRIGGER members_fts_delete AFTER DELETE ON members BEGIN "
+                "INSERT INTO members_fts (members_fts, rowid, first_name, last_name, email) "
+                "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+                "END",
+                "CREATE TRIGGER members_fts_update "
+                "AFTER UPDATE OF first_name, last_name, email ON members BEGIN "
+                "INSERT INTO members_fts (members_fts, rowid, first_name, last_name, email) "
+                "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+                "INSERT INTO members_fts (rowid, first_name, last_name, email) "
+                "VALUES (new.id, new.first_name, new.last_name, new.email); "
+                "END",
+                "INSERT INTO members_fts (members_fts) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS members_fts_update",
+                "DROP TRIGGER IF EXISTS members_fts_delete",
+                "DROP TRIGGER IF EXISTS members_fts_insert",
+                "DROP TABLE IF EXISTS members_fts",
+            ],
+        ),
+    ]
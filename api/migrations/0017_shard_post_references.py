@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    The primary keeps enforcing foreign keys while sharding is on, except
+    for its references to posts, which may live on another shard.
+    """
+
+    dependencies = [
+        ('api', '0016_member_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='post',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='api.post'),
+        ),
+        migrations.AlterField(
+            model_name='postscore',
+            name='post',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending_score', serialize=False, to='api.post'),
+        ),
+    ]
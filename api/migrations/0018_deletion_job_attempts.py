@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Attempt counts on deletion jobs, so failed jobs are retried with a
+    growing delay. Jobs that already failed count one attempt and are
+    retried.
+    """
+
+    dependencies = [
+        ('api', '0017_shard_post_references'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletionjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            "UPDATE deletion_jobs SET attempts = 1, "
+            "heartbeat_at = COALESCE(heartbeat_at, created_at) "
+            "WHERE status IN ('running', 'failed')",
+            migrations.RunSQL.noop
+        ),
+    ]
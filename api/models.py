@@ -2,6 +2,15 @@ from django.db import models
 from django.contrib.auth.hashers import make_password, check_password
 
 
+class LiveManager(models.Manager):
+    """
+    Default manager hiding soft-deleted rows (see ``api.deletion``).
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Member(models.Model):
     """
     Custom user model for social network members.
@@ -13,8 +22,20 @@ class Member(models.Model):
     last_name = models.CharField(max_length=150)
     bio = models.TextField(blank=True)
     avatar = models.CharField(max_length=500, blank=True)
+    # Content-addressed name of an uploaded avatar (see api.media)
+    avatar_key = models.CharField(max_length=80, blank=True)
     city = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # Unread notification rows, kept in step by api.notifications so the
+    # badge is read from the authenticated member without a COUNT.
+    unread_notifications = models.PositiveIntegerField(default=0)
+    # Incremented on logout to revoke issued session cookies (see
+    # api.authentication.CookieAuthentication).
+    session_generation = models.PositiveIntegerField(default=0)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     # Required properties for DRF authentication compatibility
     @property
@@ -43,7 +64,6 @@ class Member(models.Model):
 
     class Meta:
         db_table = 'members'
-        ordering = ['-created_at']
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
@@ -53,14 +73,18 @@ class Friendship(models.Model):
     """
     Model representing friendship between members.
     """
+    # Indexed by the unique (member, friend) index
     member = models.ForeignKey(
         Member,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='friendships'
     )
+    # Indexed by friendships_reverse
     friend = models.ForeignKey(
         Member,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='friend_of'
     )
     created_at = models.DateTimeField(auto_now_add=True)
@@ -68,7 +92,11 @@ class Friendship(models.Model):
     class Meta:
         db_table = 'friendships'
         unique_together = ['member', 'friend']
-        ordering = ['-created_at']
+        indexes = [
+            # Who has a member as a friend (the audience of their posts),
+            # answered from the index alone
+            models.Index(fields=['friend', 'member'], name='friendships_reverse'),
+        ]
 
     def __str__(self):
         return f"{self.member.email} -> {self.friend.email}"
@@ -79,18 +107,33 @@ class Post(models.Model):
     Model representing user posts.
     """
     id = models.AutoField(primary_key=True)
+    # Indexed by posts_author
     author = models.ForeignKey(
         Member,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='posts'
     )
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     class Meta:
         db_table = 'posts'
-        ordering = ['-created_at']
+        indexes = [
+            # A member's posts, newest first
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                name='posts_author'
+            ),
+            # The feed walks this newest first until a page is full;
+            # archival takes the oldest posts from its other end
+            models.Index(fields=['-created_at', '-id'], name='posts_created'),
+        ]
 
     def __str__(self):
         return f"Post by {self.author.email} at {self.created_at}"
@@ -100,14 +143,18 @@ class Like(models.Model):
     """
     Model representing likes on posts.
     """
+    # Indexed by the unique (member, post) index
     member = models.ForeignKey(
         Member,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='likes'
     )
+    # Indexed by likes_post
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='likes'
     )
     created_at = models.DateTimeField(auto_now_add=True)
@@ -115,7 +162,10 @@ class Like(models.Model):
     class Meta:
         db_table = 'likes'
         unique_together = ['member', 'post']
-        ordering = ['-created_at']
+        indexes = [
+            # Like counts and likers of a post, from the index alone
+            models.Index(fields=['post', 'member'], name='likes_post'),
+        ]
 
     def __str__(self):
         return f"{self.member.email} likes post {self.post.id}"
@@ -124,24 +174,468 @@ class Like(models.Model):
 class Comment(models.Model):
     """
     Model representing comments on posts.
+
+    Replies form threads. ``path`` is the materialized path of the comment:
+    the ids of its ancestors and itself as fixed-width hex segments, so
+    ordering a post's comments by path lists every thread depth-first in
+    display order, and a subtree is the path range starting with its root.
     """
+    SEGMENT_LENGTH = 8
+
     id = models.AutoField(primary_key=True)
     author = models.ForeignKey(
         Member,
         on_delete=models.CASCADE,
         related_name='comments'
     )
+    # Indexed by comments_thread
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='comments'
     )
+    # No database constraint, and not followed by the deletion purge: a
+    # post's comments are purged in chunks, and deleting a comment deletes
+    # its subtree by path.
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='replies'
+    )
+    path = models.CharField(max_length=255, default='')
+    # Direct replies, kept up to date when replies are added or deleted
+    reply_count = models.PositiveIntegerField(default=0)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'comments'
-        ordering = ['created_at']
+        indexes = [
+            # A post's comments in display order, and their counts
+            models.Index(fields=['post', 'path'], name='comments_thread'),
+        ]
+
+    @property
+    def depth(self):
+        """0 for a comment on the post, 1 for a reply to it, and so on."""
+        return max(len(self.path) // self.SEGMENT_LENGTH - 1, 0)
+
+    @classmethod
+    def segment(cls, comment_id):
+        return f'{comment_id:0{cls.SEGMENT_LENGTH}x}'
 
     def __str__(self):
         return f"Comment by {self.author.email} on post {self.post.id}"
+
+
+class Notification(models.Model):
+    """
+    Notification for a member, coalescing repeated events: while unread,
+    likes of the same post by further members add to actor_count instead
+    of creating rows ("12 people liked your post").
+    """
+    KIND_LIKE = 'like'
+    KIND_COMMENT = 'comment'
+    KIND_FRIEND = 'friend'
+    KIND_CHOICES = [
+        (KIND_LIKE, 'Like'),
+        (KIND_COMMENT, 'Comment'),
+        (KIND_FRIEND, 'Friend'),
+    ]
+
+    recipient = models.ForeignKey(
+        Member,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # The post may live on another shard (api.sharding), where the primary's
+    # foreign keys cannot reach; the deletion purge still cascades.
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='notifications'
+    )
+    # Most recent actor of the coalesced events. Kept (as NULL) when the
+    # actor is purged so the recipient's unread counter stays exact; not
+    # hidden with '+', as the purge only follows listed relations.
+    actor = models.ForeignKey(
+        Member,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='acted_notifications'
+    )
+    actor_count = models.PositiveIntegerField(default=1)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'notifications'
+        indexes = [
+            # Inbox pages, newest activity first
+            models.Index(
+                fields=['recipient', '-updated_at', '-id'],
+                name='notifications_inbox'
+            ),
+        ]
+        constraints = [
+            # One unread group per recipient, kind and post to coalesce into
+            models.UniqueConstraint(
+                fields=['recipient', 'kind', 'post'],
+                condition=models.Q(is_read=False),
+                name='notifications_unread_group'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.recipient_id} ({self.actor_count})"
+
+
+class NotificationActor(models.Model):
+    """
+    A member whose events a notification coalesces, so each one is counted
+    once in its actor_count however often they act.
+    """
+    # Indexed by the unique (notification, actor) index
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='actors'
+    )
+    actor = models.ForeignKey(
+        Member,
+        on_delete=models.CASCADE,
+        related_name='notification_actors'
+    )
+
+    class Meta:
+        db_table = 'notification_actors'
+        unique_together = ['notification', 'actor']
+
+    def __str__(self):
+        return f"{self.actor_id} in notification {self.notification_id}"
+
+
+class Hashtag(models.Model):
+    """
+    Normalized (lower-case) hashtag used in posts or comments.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'hashtags'
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class ContentReference(models.Model):
+    """
+    A reference found in a post, or in a comment on it, when it was written
+    (see ``api.tags``). Subclasses add ``post`` and ``author`` foreign keys;
+    ``created_at`` is the post's or comment's.
+
+    ``comment`` has no database constraint and is not followed by the
+    deletion purge: rows go with their post or author in chunks, and
+    deleting a single comment removes its rows explicitly.
+    """
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+
+
+class HashtagUse(ContentReference):
+    """
+    Hashtag written in a post or comment; a tag's timeline is a range of
+    its index.
+    """
+    hashtag = models.ForeignKey(
+        Hashtag,
+        on_delete=models.CASCADE,
+        related_name='uses'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='hashtag_uses'
+    )
+    author = models.ForeignKey(
+        Member,
+        on_delete=models.CASCADE,
+        related_name='hashtag_uses'
+    )
+
+    class Meta:
+        db_table = 'hashtag_uses'
+        indexes = [
+            models.Index(
+                fields=['hashtag', '-created_at', '-id'],
+                name='hashtag_uses_timeline'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hashtag', 'post'],
+                condition=models.Q(comment__isnull=True),
+                name='hashtag_uses_post_unique'
+            ),
+            models.UniqueConstraint(
+                fields=['hashtag', 'comment'],
+                condition=models.Q(comment__isnull=False),
+                name='hashtag_uses_comment_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.hashtag_id} in post {self.post_id}"
+
+
+class Mention(ContentReference):
+    """
+    Member mentioned (@email) in a post or comment.
+    """
+    member = models.ForeignKey(
+        Member,
+        on_delete=models.CASCADE,
+        related_name='mentions'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions'
+    )
+    author = models.ForeignKey(
+        Member,
+        on_delete=models.CASCADE,
+        related_name='mentions_written'
+    )
+
+    class Meta:
+        db_table = 'mentions'
+        indexes = [
+            models.Index(
+                fields=['member', '-created_at', '-id'],
+                name='mentions_inbox'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['member', 'post'],
+                condition=models.Q(comment__isnull=True),
+                name='mentions_post_unique'
+            ),
+            models.UniqueConstraint(
+                fields=['member', 'comment'],
+                condition=models.Q(comment__isnull=False),
+                name='mentions_comment_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"@{self.member_id} in post {self.post_id}"
+
+
+class PostScore(models.Model):
+    """
+    Persisted trending score of a post.
+
+    ``score`` is the base-2 logarithm of the post's activity weights, each
+    scaled by 2 ** (event time / half-life); see ``api.trending``.
+    """
+    # Kept on the primary for every shard's posts (api.sharding).
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        primary_key=True,
+        related_name='trending_score'
+    )
+    score = models.FloatField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'post_scores'
+
+    def __str__(self):
+        return f"Score {self.score:.2f} for post {self.post_id}"
+
+
+class DeletionJob(models.Model):
+    """
+    Background purge of a soft-deleted post or member and its related rows.
+    """
+    KIND_POST = 'post'
+    KIND_MEMBER = 'member'
+    KIND_CHOICES = [
+        (KIND_POST, 'Post'),
+        (KIND_MEMBER, 'Member'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True
+    )
+    rows_deleted = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when a worker claims the job and after each purged chunk; a
+    # running job silent for DELETION_JOB_LEASE is claimed again.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Runs started so far; failed jobs are retried with a growing delay
+    # (DELETION_JOB_RETRY_DELAY) until DELETION_JOB_MAX_ATTEMPTS.
+    attempts = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'deletion_jobs'
+
+    def __str__(self):
+        return f"Purge {self.kind} {self.object_id} ({self.status})"
+
+
+class ArchivedPost(models.Model):
+    """
+    Post moved out of ``posts`` by ``api.archive``, with the same columns
+    and id. Its likes and comments are archived with it.
+    """
+    id = models.IntegerField(primary_key=True)
+    # Indexed by posts_archive_author
+    author = models.ForeignKey(
+        Member,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='archived_posts'
+    )
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        db_table = 'posts_archive'
+        indexes = [
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                name='posts_archive_author'
+            ),
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='posts_archive_created'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Archived post by {self.author.email} at {self.created_at}"
+
+
+class ArchivedLike(models.Model):
+    """
+    Like of an archived post.
+    """
+    id = models.IntegerField(primary_key=True)
+    # Indexed by the unique (member, post) index
+    member = models.ForeignKey(
+        Member,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='archived_likes'
+    )
+    # Indexed by likes_archive_post
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='likes'
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'likes_archive'
+        unique_together = ['member', 'post']
+        indexes = [
+            models.Index(fields=['post', 'member'], name='likes_archive_post'),
+        ]
+
+    def __str__(self):
+        return f"{self.member.email} likes archived post {self.post_id}"
+
+
+class ArchivedComment(models.Model):
+    """
+    Comment on an archived post, with its thread columns (see ``Comment``).
+    """
+    SEGMENT_LENGTH = Comment.SEGMENT_LENGTH
+
+    id = models.IntegerField(primary_key=True)
+    author = models.ForeignKey(
+        Member,
+        on_delete=models.CASCADE,
+        related_name='archived_comments'
+    )
+    # Indexed by comments_archive_thread
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='comments'
+    )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='replies'
+    )
+    path = models.CharField(max_length=255, default='')
+    reply_count = models.PositiveIntegerField(default=0)
+    content = models.TextField()
+    created_at = models.DateTimeField()
+
+    depth = Comment.depth
+
+    class Meta:
+        db_table = 'comments_archive'
+        indexes = [
+            models.Index(fields=['post', 'path'], name='comments_archive_thread'),
+        ]
+
+    def __str__(self):
+        return f"Comment by {self.author.email} on archived post {self.post_id}"
@@ -0,0 +1,189 @@
+"""
+Member notifications.
+
+The write paths call ``notify()`` when a post is liked or commented on, or
+when a member is added as a friend. Repeated events coalesce: while a
+recipient's notification for the same kind and post is unread, a new event
+updates that row (latest actor) instead of adding one, so a popular post
+yields "12 people liked your post" rather than twelve rows. The members
+in a group are kept as ``NotificationActor`` rows, unique per group, and
+``actor_count`` grows only when one joins: a member liking again after an
+unlike, even after someone else did, is not another person.
+
+``Member.unread_notifications`` counts unread rows. It is changed with
+``F()`` expressions in the same transaction as the rows, so concurrent
+events never lose an increment, and the inbox reads the badge from the
+authenticated member instead of counting rows.
+"""
+from datetime import datetime
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Member, Notification, NotificationActor
+from .pagination import decode_cursor, encode_cursor
+
+VERBS = {
+    Notification.KIND_LIKE: 'liked your post',
+    Notification.KIND_COMMENT: 'commented on your post',
+    Notification.KIND_FRIEND: 'added you as a friend',
+}
+
+
+def _add_actor(recipient_id, actor_id, kind, post_id):
+    """
+    Add actor to the unread group of (recipient, kind, post); return 1 if
+    there is one and they were new to it, else 0.
+    """
+    connection = connections[router.db_for_write(NotificationActor)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO notification_actors (notification_id, actor_id) '
+            'SELECT id, %s FROM notifications WHERE recipient_id = %s '
+            'AND kind = %s AND post_id IS %s AND NOT is_read '
+            'ON CONFLICT DO NOTHING',
+            [actor_id, recipient_id, kind, post_id]
+        )
+        return cursor.rowcount
+
+
+def _coalesce(recipient_id, actor, kind, post_id):
+    """Fold the event into an unread group; return whether one existed."""
+    added = _add_actor(recipient_id, actor.id, kind, post_id)
+    # Read in between, the group keeps the actor and the event starts a
+    # new one.
+    return Notification.objects.filter(
+        recipient_id=recipient_id,
+        kind=kind,
+        post_id=post_id,
+        is_read=False
+    ).update(
+        actor_count=F('actor_count') + added,
+        actor=actor,
+        updated_at=timezone.now()
+    ) > 0
+
+
+def notify(recipient_id, actor, kind, post=None):
+    """Record that actor did kind (to post) for recipient."""
+    if recipient_id == actor.id:
+        return
+    post_id = post.id if post is not None else None
+    if _coalesce(recipient_id, actor, kind, post_id):
+        return
+    try:
+        with transaction.atomic():
+            notification = Notification.objects.create(
+                recipient_id=recipient_id,
+                kind=kind,
+                post_id=post_id,
+                actor=actor
+            )
+            NotificationActor.objects.create(notification=notification, actor=actor)
+            Member.all_objects.filter(id=recipient_id).update(
+                unread_notifications=F('unread_notifications') + 1
+            )
+    except IntegrityError:
+        # A concurrent event created the group first.
+        _coalesce(recipient_id, actor, kind, post_id)
+
+
+def mark_read(member, ids=None):
+    """
+    Mark member's notifications with the given ids, or all of them, read
+    and return how many changed.
+    """
+    unread = Notification.objects.filter(recipient=member, is_read=False)
+    if ids is not None:
+        unread = unread.filter(id__in=ids)
+    with transaction.atomic():
+        marked = unread.update(is_read=True)
+        if ids is None:
+            counter = 0
+        elif marked:
+            counter = Greatest(F('unread_notifications') - marked, 0)
+        else:
+            return 0
+        Member.all_objects.filter(id=member.id).update(
+            unread_notifications=counter
+        )
+    if ids is None:
+        member.unread_notifications = 0
+    else:
+        member.unread_notifications = max(member.unread_notifications - marked, 0)
+    return marked
+
+
+def clear_post_notifications(post):
+    """
+    Mark the notifications about a deleted post read, before the purge
+    removes them, so its author's unread counter stays exact.
+    """
+    marked = Notification.objects.filter(
+        recipient_id=post.author_id,
+        post=post,
+        is_read=False
+    ).update(is_read=True)
+    if marked:
+        Member.all_objects.filter(id=post.author_id).update(
+            unread_notifications=Greatest(F('unread_notifications') - marked, 0)
+        )
+    return marked
+
+
+def forget_posts(post_ids):
+    """
+    Delete the notifications about posts leaving the posts table (see
+    api.archive), first taking their unread rows off the counters.
+    """
+    unread = Notification.objects.filter(
+        post_id__in=post_ids,
+        is_read=False
+    ).order_by().values('recipient_id').annotate(total=Count('id')).values_list(
+        'recipient_id', 'total'
+    )
+    for recipient_id, total in unread:
+        Member.all_objects.filter(id=recipient_id).update(
+            unread_notifications=Greatest(F('unread_notifications') - total, 0)
+        )
+    Notification.objects.filter(post_id__in=post_ids).delete()
+
+
+def message(notification):
+    """Human-readable summary, e.g. "Ann Lee and 11 others liked your post"."""
+    actor = notification.actor
+    if actor is None:
+        name = 'Someone'
+    else:
+        name = f'{actor.first_name} {actor.last_name}'.strip()
+    others = notification.actor_count - 1
+    if others == 1:
+        name = f'{name} and 1 other'
+    elif others > 1:
+        name = f'{name} and {others} others'
+    return f'{name} {VERBS[notification.kind]}'
+
+
+def inbox_page(member, limit, cursor=None):
+    """
+    Return (notifications, next_cursor) for member, newest activity first.
+    Pages are keyset-paginated on (updated_at, id), so deep pages cost the
+    same as the first.
+    """
+    notifications = Notification.objects.filter(
+        recipient=member
+    ).select_related('actor').order_by('-updated_at', '-id')
+    if cursor:
+        updated_at, notification_id = decode_cursor(cursor, datetime, int)
+        notifications = notifications.filter(
+            Q(updated_at__lt=updated_at) |
+            Q(updated_at=updated_at, id__lt=notification_id)
+        )
+    page = list(notifications[:limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        last = page[limit - 1]
+        next_cursor = encode_cursor(last.updated_at, last.id)
+    return page[:limit], next_cursor
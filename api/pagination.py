@@ -0,0 +1,56 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor encodes the sort key of the last row of a page; the next page
+starts strictly after it, so deep pages cost the same as the first and
+rows inserted meanwhile do not shift the pages.
+"""
+import base64
+import binascii
+import math
+from datetime import datetime
+
+# Ids and other integers must fit a database integer (SQLite: 64 bits).
+INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value
+    return repr(value)
+
+
+def _decode(kind, value):
+    if kind is datetime:
+        return datetime.fromisoformat(value)
+    value = kind(value)
+    if kind is int and value not in INT_RANGE:
+        raise ValueError(value)
+    if kind is float and not math.isfinite(value):
+        raise ValueError(value)
+    return value
+
+
+def encode_cursor(*values):
+    """Cursor for a sort key of datetimes, floats, ints and strings."""
+    raw = '|'.join(_encode(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, *types):
+    """
+    Sort key of a cursor, each value parsed with the matching type
+    (datetime, float, int or str); raise ValueError if the cursor is
+    invalid, including ints out of the 64-bit range and floats that are
+    not finite. Strings must not contain "|".
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        values = raw.split('|')
+        if len(values) != len(types):
+            raise ValueError(cursor)
+        return tuple(_decode(kind, value) for kind, value in zip(types, values))
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise ValueError('Invalid cursor') from exc
@@ -0,0 +1,275 @@
+"""
+Opt-in request profiling and an always-on statistical sampler.
+
+Per-request profiling is requested with the ``X-Profile`` header (or the
+``profile`` query parameter) by a caller that sends ``PROFILING_TOKEN`` in
+``X-Profiling-Token`` or is logged in to the Django admin as staff (the
+admin session is only loaded outside ``API_PATH_PREFIX``):
+
+* ``sample`` (default) samples the request's thread every
+  ``PROFILING_REQUEST_INTERVAL`` seconds into collapsed stacks, the text
+  format read by flamegraph.pl, speedscope and inferno;
+* ``cprofile`` runs cProfile and stores a pstats dump.
+
+The result is written to ``PROFILING_DIR`` and its id returned in the
+``X-Profile-Id`` response header.
+
+With ``PROFILING_SAMPLER`` enabled every worker also samples all request
+threads every ``PROFILING_SAMPLE_INTERVAL`` seconds, rooting each stack at
+the view class serving the request, and periodically flushes the totals to
+``PROFILING_DIR`` so the download endpoint can merge all workers.
+"""
+import glob
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+PROFILE_MODES = ('sample', 'cprofile')
+
+
+def frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}.{getattr(code, "co_qualname", code.co_name)}'
+
+
+def collapse(frame, root=None):
+    """Render a frame's stack as 'root;outer;...;inner'."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    if root:
+        labels.append(root)
+    return ';'.join(reversed(labels))
+
+
+def format_collapsed(counts):
+    return ''.join(f'{stack} {count}\n' for stack, count in counts.most_common())
+
+
+def parse_collapsed(text, counts=None):
+    counts = Counter() if counts is None else counts
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack and count.isdigit():
+            counts[stack] += int(count)
+    return counts
+
+
+class StackSampler:
+    """
+    Background thread sampling the stacks of registered threads.
+    """
+
+    def __init__(self, interval, flush_interval=None, path=None):
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.path = path
+        self.pid = os.getpid()
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def register(self, thread_id, label):
+        """Sample thread_id, rooting its stacks at label."""
+        self._threads[thread_id] = label
+
+    def unregister(self, thread_id):
+        self._threads.pop(thread_id, None)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run,
+            name='stack-sampler',
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self._stopped.wait(self.interval):
+            self.sample_once()
+            if (
+                self.flush_interval
+                and time.monotonic() - last_flush >= self.flush_interval
+            ):
+                self.flush()
+                last_flush = time.monotonic()
+
+    def sample_once(self):
+        """Record the current stack of every registered thread."""
+        threads = dict(self._threads)
+        if not threads:
+            return
+        frames = sys._current_frames()
+        with self._lock:
+            for thread_id, label in threads.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.counts[collapse(frame, label)] += 1
+
+    def collapsed(self):
+        with self._lock:
+            return format_collapsed(self.counts)
+
+    def flush(self):
+        """Write this worker's totals to its file in PROFILING_DIR."""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as tmp:
+            tmp.write(self.collapsed())
+        os.replace(tmp_path, self.path)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """
+    Return this worker's always-on sampler, starting it on first use.
+
+    Started lazily so that with preload_app each forked worker gets its
+    own thread (threads do not survive fork).
+    """
+    global _sampler
+    if not settings.PROFILING_SAMPLER:
+        return None
+    if _sampler is None or _sampler.pid != os.getpid():
+        with _sampler_lock:
+            if _sampler is None or _sampler.pid != os.getpid():
+                _sampler = StackSampler(
+                    settings.PROFILING_SAMPLE_INTERVAL,
+                    settings.PROFILING_FLUSH_INTERVAL,
+                    os.path.join(
+                        str(settings.PROFILING_DIR),
+                        f'samples-{os.getpid()}.collapsed'
+                    )
+                ).start()
+    return _sampler
+
+
+def aggregated_samples(view=None):
+    """Merge the flushed samples of every worker, optionally for one view."""
+    counts = Counter()
+    pattern = os.path.join(str(settings.PROFILING_DIR), 'samples-*.collapsed')
+    for path in glob.glob(pattern):
+        with open(path) as samples:
+            parse_collapsed(samples.read(), counts)
+    if view:
+        counts = Counter({
+            stack: count for stack, count in counts.items()
+            if stack.split(';', 1)[0] == view
+        })
+    return counts
+
+
+def is_profiling_allowed(request):
+    """Token holders and Django admin staff may profile."""
+    token = settings.PROFILING_TOKEN
+    supplied = request.headers.get('X-Profiling-Token', '')
+    if token and supplied and hmac.compare_digest(token, supplied):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(getattr(user, 'is_staff', False))
+
+
+def requested_mode(request):
+    mode = request.headers.get('X-Profile') or request.GET.get('profile')
+    if not mode:
+        return None
+    if mode not in PROFILE_MODES:
+        mode = PROFILE_MODES[0]
+    return mode if is_profiling_allowed(request) else None
+
+
+def profile_path(profile_id):
+    """Path of a stored request profile, or None for a malformed id."""
+    name, _, extension = profile_id.partition('.')
+    if extension not in ('collapsed', 'prof'):
+        return None
+    try:
+        uuid.UUID(name)
+    except ValueError:
+        return None
+    return os.path.join(str(settings.PROFILING_DIR), 'requests', profile_id)
+
+
+class ProfilingMiddleware:
+    """
+    Attribute threads to views for the sampler and profile single requests
+    on demand.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func).__name__
+        for sampler in (get_sampler(), getattr(request, '_profile_sampler', None)):
+            if sampler is not None:
+                sampler.register(threading.get_ident(), view)
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        try:
+            if mode is None:
+                return self.get_response(request)
+            return self.profile(request, mode)
+        finally:
+            sampler = get_sampler()
+            if sampler is not None:
+                sampler.unregister(threading.get_ident())
+
+    def profile(self, request, mode):
+        profile_id = f'{uuid.uuid4()}.{"prof" if mode == "cprofile" else "collapsed"}'
+        path = profile_path(profile_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if mode == 'cprofile':
+            import cProfile
+
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            profiler.dump_stats(path)
+        else:
+            sampler = StackSampler(settings.PROFILING_REQUEST_INTERVAL)
+            sampler.register(threading.get_ident(), request.path)
+            request._profile_sampler = sampler
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            with open(path, 'w') as output:
+                output.write(sampler.collapsed())
+
+        response['X-Profile-Id'] = profile_id
+        return response
+
+
+class IsProfilingAllowed(BasePermission):
+    """
+    Permission class for the profile download endpoints.
+    """
+
+    def has_permission(self, request, view):
+        return is_profiling_allowed(request._request)
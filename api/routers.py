@@ -0,0 +1,210 @@
+"""
+Read-replica and shard routing.
+
+Views that only read in their GET handlers mix in ``ReplicaReadMixin``; while
+such a handler runs, ``ReplicaRouter`` sends reads to one of the aliases in
+``DATABASE_REPLICAS``. After a member writes, ``PrimaryPinningMiddleware``
+pins them to the primary for ``REPLICA_PIN_SECONDS`` so they always read
+their own writes. Each worker counts the handlers it routes to each alias
+and adds the counts to shared totals every ``REPLICA_USAGE_FLUSH_SECONDS``
+(``read_counts``, shown by ``manage.py replica_status``).
+
+``ShardRouter``, listed first, places sharded rows (see api.sharding).
+"""
+import contextvars
+import itertools
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Member
+from .sharding import get_shards, is_sharded, shard_for
+
+DEFAULT_DB_ALIAS = 'default'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = contextvars.ContextVar('replica_read_alias', default=None)
+
+# Handlers routed to each alias by this worker since its last flush.
+usage = Counter()
+_usage_lock = threading.Lock()
+_next_flush = 0.0
+
+_cycle = None
+_cycle_lock = threading.Lock()
+
+
+def get_replicas():
+    """Return the configured replica aliases."""
+    return settings.DATABASE_REPLICAS
+
+
+def next_replica():
+    """Pick the next replica alias round-robin."""
+    global _cycle
+    with _cycle_lock:
+        if _cycle is None:
+            _cycle = itertools.cycle(get_replicas())
+        return next(_cycle)
+
+
+def _pin_key(member_id):
+    return f'replica:pin:{member_id}'
+
+
+def pin_to_primary(member_id):
+    """Route the member's reads to the primary for a short window."""
+    caches[settings.REPLICA_PIN_CACHE_ALIAS].set(
+        _pin_key(member_id),
+        True,
+        timeout=settings.REPLICA_PIN_SECONDS
+    )
+
+
+def is_pinned(member_id):
+    """Whether the member wrote recently enough to need the primary."""
+    return caches[settings.REPLICA_PIN_CACHE_ALIAS].get(
+        _pin_key(member_id),
+        False
+    )
+
+
+def _usage_key(alias):
+    return f'replica:usage:{alias}'
+
+
+def record_read(alias):
+    """Count a handler reading from alias, flushing the counts when due."""
+    global _next_flush
+    now = time.monotonic()
+    with _usage_lock:
+        usage[alias] += 1
+        if now < _next_flush:
+            return
+        _next_flush = now + settings.REPLICA_USAGE_FLUSH_SECONDS
+        counts = dict(usage)
+        usage.clear()
+    cache = caches[settings.REPLICA_PIN_CACHE_ALIAS]
+    for alias, count in counts.items():
+        cache.add(_usage_key(alias), 0, timeout=None)
+        cache.incr(_usage_key(alias), count)
+
+
+def read_counts():
+    """Handlers routed to the primary and to each replica by every worker."""
+    aliases = [DEFAULT_DB_ALIAS, *get_replicas()]
+    totals = caches[settings.REPLICA_PIN_CACHE_ALIAS].get_many(
+        [_usage_key(alias) for alias in aliases]
+    )
+    return {alias: totals.get(_usage_key(alias), 0) for alias in aliases}
+
+
+class ReplicaRouter:
+    """
+    Database router sending reads to a replica inside replica-safe handlers.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are read-only copies kept in sync outside Django.
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ShardRouter:
+    """
+    Database router keeping sharded rows on their shard.
+
+    Saves, deletes and related-object lookups follow the instance they
+    start from; the primary's rows reached from a sharded row (a post's
+    author) are read where ReplicaRouter would read them.
+    """
+
+    def _route(self, model, hints):
+        if not get_shards():
+            return None
+        instance = hints.get('instance')
+        if is_sharded(model):
+            return shard_for(model, instance)
+        if instance is not None and is_sharded(type(instance)):
+            return _read_alias.get() or DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        # Other models are written to the primary by ReplicaRouter.
+        return self._route(model, hints) if is_sharded(model) else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Rows reference each other across shards by id.
+        return True if get_shards() else None
+
+
+class ReplicaReadMixin:
+    """
+    APIView mixin routing reads of safe-method handlers to a replica.
+
+    Routing starts after authentication so the session lookup and the
+    pinning check use the primary. ``pinned`` tells handlers that the member
+    must read their own writes, which shared caches filled from a lagging
+    replica may not show.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS or not get_replicas():
+            return
+        user = request.user
+        if getattr(user, 'is_authenticated', False) and is_pinned(user.id):
+            self.pinned = True
+            record_read(DEFAULT_DB_ALIAS)
+            return
+        alias = next_replica()
+        record_read(alias)
+        self._replica_token = _read_alias.set(alias)
+
+    def dispatch(self, request, *args, **kwargs):
+        self._replica_token = None
+        self.pinned = False
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                _read_alias.reset(self._replica_token)
+
+
+class PrimaryPinningMiddleware:
+    """
+    Pin members to the primary after a successful write request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and get_replicas()
+        ):
+            user = getattr(request, 'user', None)
+            if isinstance(user, Member):
+                pin_to_primary(user.id)
+        return response
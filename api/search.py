@@ -0,0 +1,196 @@
+"""
+Full-text post search and member search.
+
+``posts_fts`` is an SQLite FTS5 index over ``posts.content`` created by
+migration 0008. It is an external-content table: only the inverted index is
+stored, and triggers on ``posts`` update it on every insert, delete and
+content change, whichever code path writes (views, purges, bulk loads).
+
+Django rebuilds a SQLite table to apply some schema changes, which drops
+its triggers; ``ensure_triggers`` recreates them after every ``migrate``.
+
+Results are ranked with BM25 (FTS5's ``rank``), limited to live posts by
+the viewer and their (cached) friends, and keyset-paginated on (rank, id).
+Each shard (see api.sharding) indexes its own posts; their results are
+merged on (rank, id), BM25 ranks being computed per shard.
+
+Member search finds members whose first name, last name or email contains
+the search text, ignoring case. ``members_fts`` (migration 0016) is a
+trigram FTS5 index over those columns, kept in step by triggers the same
+way, so the substring is looked up in the index rather than matched with
+LIKE against every member. Texts shorter than a trigram fall back to LIKE.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .friends import friend_ids
+from .models import Post
+from .pagination import decode_cursor, encode_cursor
+from .sharding import aliases, get_shards, merge
+
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts (rowid, content) VALUES (new.id, new.content); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts (posts_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF content ON posts BEGIN "
+    "INSERT INTO posts_fts (posts_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "INSERT INTO posts_fts (rowid, content) VALUES (new.id, new.content); "
+    "END",
+]
+
+MEMBER_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS members_fts_insert AFTER INSERT ON members BEGIN "
+    "INSERT INTO members_fts (rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS members_fts_delete AFTER DELETE ON members BEGIN "
+    "INSERT INTO members_fts (members_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS members_fts_update "
+    "AFTER UPDATE OF first_name, last_name, email ON members BEGIN "
+    "INSERT INTO members_fts (members_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+    "INSERT INTO members_fts (rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); "
+    "END",
+]
+
+# Index tables and the triggers keeping them up to date.
+INDEXES = {
+    'posts_fts': TRIGGERS,
+    'members_fts': MEMBER_TRIGGERS,
+}
+
+MEMBER_MATCH_SQL = 'SELECT rowid FROM members_fts WHERE members_fts MATCH %s'
+
+# The trigram tokenizer cannot look up shorter texts.
+TRIGRAM = 3
+
+SEARCH_SQL = '''
+    SELECT posts_fts.rowid, posts_fts.rank
+    FROM posts_fts
+    JOIN posts ON posts.id = posts_fts.rowid
+    WHERE posts_fts MATCH %s
+      AND posts.deleted_at IS NULL
+      AND ({authors})
+      {after}
+    ORDER BY posts_fts.rank, posts_fts.rowid
+    LIMIT %s
+'''
+
+# For members with more friends than are inlined (see api.friends).
+FRIENDS_SUBQUERY_SQL = (
+    'posts.author_id = %s OR posts.author_id IN '
+    '(SELECT friend_id FROM friendships WHERE member_id = %s)'
+)
+
+AFTER_SQL = '''
+      AND (
+          posts_fts.rank > %s
+          OR (posts_fts.rank = %s AND posts_fts.rowid > %s)
+      )
+'''
+
+TERM = re.compile(r'(\w+)(\*?)')
+
+
+def ensure_triggers(using='default', **kwargs):
+    """Recreate the index triggers if a table rebuild dropped them."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for table, triggers in INDEXES.items():
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [table]
+            )
+            if cursor.fetchone() is None:
+                continue
+            for statement in triggers:
+                cursor.execute(statement)
+
+
+def match_query(text):
+    """
+    FTS5 query matching posts containing every word of text, or words
+    starting with it when it ends in "*"; None when text has no words.
+    Words are quoted, so other FTS5 operators typed by members are
+    searched for literally.
+    """
+    terms = TERM.findall(text)[:settings.SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{word}"{prefix}' for word, prefix in terms)
+
+
+def _search(alias, sql, params):
+    alias = alias or router.db_for_read(Post) or 'default'
+    with connections[alias].cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        return db_cursor.fetchall()
+
+
+def search_posts(member, text, limit, cursor=None):
+    """
+    Return ({post_id: rank}, next_cursor) for the best matches of text that
+    member may see, best first.
+    """
+    query = match_query(text)
+    if query is None:
+        return {}, None
+    friends = friend_ids(member.id)
+    if len(friends) > settings.FRIEND_CACHE_MAX_INLINE and not get_shards():
+        authors = FRIENDS_SUBQUERY_SQL
+        params = [query, member.id, member.id]
+    else:
+        placeholders = ', '.join(['%s'] * (len(friends) + 1))
+        authors = f'posts.author_id IN ({placeholders})'
+        params = [query, member.id, *friends]
+    after = ''
+    if cursor:
+        rank, post_id = decode_cursor(cursor, float, int)
+        after = AFTER_SQL
+        params += [rank, rank, post_id]
+    params.append(limit + 1)
+
+    sql = SEARCH_SQL.format(authors=authors, after=after)
+    rows = merge(
+        [_search(alias, sql, params) for alias in aliases()],
+        lambda row: (row[1], row[0]),
+        limit + 1,
+        reverse=False
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        post_id, rank = rows[limit - 1]
+        next_cursor = encode_cursor(rank, post_id)
+    return dict(rows[:limit]), next_cursor
+
+
+def filter_members(members, text):
+    """
+    Members of the queryset members whose first name, last name or email
+    contains text, ignoring case; all of them when text is empty.
+    """
+    if not text:
+        return members
+    if len(text) < TRIGRAM:
+        return members.filter(
+            Q(first_name__icontains=text) |
+            Q(last_name__icontains=text) |
+            Q(email__icontains=text)
+        )
+    # A quoted trigram phrase matches text as a substring of one column.
+    phrase = '"{}"'.format(text.replace('"', '""'))
+    return members.filter(id__in=RawSQL(MEMBER_MATCH_SQL, [phrase]))
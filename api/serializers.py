@@ -1,5 +1,76 @@
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
-from api.models import Member, Post, Comment, Friendship, Like
+from api.models import (
+    ArchivedComment,
+    ArchivedLike,
+    Comment,
+    Friendship,
+    Like,
+    Member,
+    Notification,
+    Post
+)
+from api.events import publish_post_event
+from api.friends import friend_ids
+from api.notifications import message as notification_message, notify
+from api.tags import index_comment, index_post
+from api.threads import can_reply_to, create_comment
+from api.media import thumbnail_urls
+from api.sharding import live_members, shard_for_member, shard_of, using, with_authors
+from api.trending import current_score, record_comment
+
+
+def count_related(queryset, field):
+    """Correlated COUNT of queryset rows whose field points at the outer row."""
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def annotate_post_stats(queryset, viewer, archived=False):
+    """
+    Annotate posts (archived posts with archived) with what PostSerializer
+    needs so a list of posts is serialized without per-post queries. Without
+    a viewer, is_liked is left out. Likes and comments of soft-deleted
+    members are not counted.
+    """
+    like_model, comment_model = (
+        (ArchivedLike, ArchivedComment) if archived else (Like, Comment)
+    )
+    live_likers, live_authors = live_members('member', 'author')
+    queryset = with_authors(queryset).annotate(
+        likes_total=count_related(like_model.objects.filter(live_likers), 'post'),
+        comments_total=count_related(comment_model.objects.filter(live_authors), 'post')
+    )
+    if viewer is None:
+        return queryset
+    return queryset.annotate(
+        liked_by_viewer=Exists(
+            like_model.objects.filter(post=OuterRef('pk'), member=viewer)
+        )
+    )
+
+
+def member_stats_context(request, members):
+    """
+    Build serializer context letting MemberSerializer answer friends_count
+    and is_friend for the given members from one query and the viewer's
+    cached friend ids.
+    """
+    member_ids = {member.id for member in members}
+    friends_counts = Friendship.objects.filter(
+        member_id__in=member_ids,
+        friend__deleted_at__isnull=True
+    ).values('member_id').annotate(total=Count('id')).values_list(
+        'member_id', 'total'
+    )
+    return {
+        'request': request,
+        'friends_counts': dict(friends_counts),
+        'friend_ids': friend_ids(request.user.id)
+    }
 
 
 class RegisterSerializer(serializers.Serializer):
@@ -13,7 +84,8 @@ class RegisterSerializer(serializers.Serializer):
 
     def validate_email(self, value):
         """Check if email is already in use."""
-        if Member.objects.filter(email=value).exists():
+        # Soft-deleted members keep their email until they are purged.
+        if Member.all_objects.filter(email=value).exists():
             raise serializers.ValidationError("A member with this email already exists.")
         return value
 
@@ -43,6 +115,7 @@ class MemberSerializer(serializers.ModelSerializer):
     """
     friends_count = serializers.SerializerMethodField()
     is_friend = serializers.SerializerMethodField()
+    avatar_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = Member
@@ -53,6 +126,7 @@ class MemberSerializer(serializers.ModelSerializer):
             'last_name',
             'bio',
             'avatar',
+            'avatar_thumbnails',
             'city',
             'created_at',
             'friends_count',
@@ -62,7 +136,17 @@ class MemberSerializer(serializers.ModelSerializer):
 
     def get_friends_count(self, obj):
         """Get the count of friends for this member."""
-        return Friendship.objects.filter(member=obj).count()
+        friends_counts = self.context.get('friends_counts')
+        if friends_counts is not None:
+            return friends_counts.get(obj.id, 0)
+        return Friendship.objects.filter(
+            member=obj,
+            friend__deleted_at__isnull=True
+        ).count()
+
+    def get_avatar_thumbnails(self, obj):
+        """Get URLs of the pre-sized avatar images, keyed by size."""
+        return thumbnail_urls(obj.avatar_key)
 
     def get_is_friend(self, obj):
         """Check if current user is friends with this member."""
@@ -74,10 +158,10 @@ class MemberSerializer(serializers.ModelSerializer):
         if current_user.id == obj.id:
             return False
         
-        return Friendship.objects.filter(
-            member=current_user,
-            friend=obj
-        ).exists()
+        ids = self.context.get('friend_ids')
+        if ids is None:
+            ids = friend_ids(current_user.id)
+        return obj.id in ids
 
 
 class MemberUpdateSerializer(serializers.ModelSerializer):
@@ -91,10 +175,16 @@ class MemberUpdateSerializer(serializers.ModelSerializer):
     def validate_email(self, value):
         """Check if email is already in use by another member."""
         instance = self.instance
-        if instance and Member.objects.filter(email=value).exclude(id=instance.id).exists():
+        if instance and Member.all_objects.filter(email=value).exclude(id=instance.id).exists():
             raise serializers.ValidationError("A member with this email already exists.")
         return value
 
+    def update(self, instance, validated_data):
+        """Forget the uploaded avatar when the avatar URL is replaced."""
+        if validated_data.get('avatar', instance.avatar) != instance.avatar:
+            validated_data['avatar_key'] = ''
+        return super().update(instance, validated_data)
+
 
 class PostSerializer(serializers.ModelSerializer):
     """
@@ -120,11 +210,21 @@ class PostSerializer(serializers.ModelSerializer):
 
     def get_likes_count(self, obj):
         """Get the count of likes for this post."""
-        return Like.objects.filter(post=obj).count()
+        if hasattr(obj, 'likes_total'):
+            return obj.likes_total
+        return using(Like.objects, shard_of(obj)).filter(
+            *live_members('member'),
+            post=obj
+        ).count()
 
     def get_comments_count(self, obj):
         """Get the count of comments for this post."""
-        return Comment.objects.filter(post=obj).count()
+        if hasattr(obj, 'comments_total'):
+            return obj.comments_total
+        return using(Comment.objects, shard_of(obj)).filter(
+            *live_members('author'),
+            post=obj
+        ).count()
 
     def get_is_liked(self, obj):
         """Check if current user liked this post."""
@@ -132,12 +232,29 @@ class PostSerializer(serializers.ModelSerializer):
         if not request or not hasattr(request, 'user') or not request.user.is_authenticated:
             return False
         
-        return Like.objects.filter(
+        if hasattr(obj, 'liked_by_viewer'):
+            return obj.liked_by_viewer
+        
+        return using(Like.objects, shard_of(obj)).filter(
             member=request.user,
             post=obj
         ).exists()
 
 
+class TrendingPostSerializer(PostSerializer):
+    """
+    Serializer for posts on the trending leaderboard.
+    """
+    trending_score = serializers.SerializerMethodField()
+
+    class Meta(PostSerializer.Meta):
+        fields = PostSerializer.Meta.fields + ['trending_score']
+
+    def get_trending_score(self, obj):
+        """Get the post's current decayed trending score."""
+        return round(current_score(self.context['scores'][obj.id]), 4)
+
+
 class PostCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating a new post.
@@ -147,10 +264,16 @@ class PostCreateSerializer(serializers.ModelSerializer):
         fields = ['content']
 
     def create(self, validated_data):
-        """Create a new post with the current user as author."""
+        """Create a new post with the current user as author, on their shard."""
         request = self.context.get('request')
         validated_data['author'] = request.user
-        return super().create(validated_data)
+        post = using(
+            Post.objects,
+            shard_for_member(request.user.id)
+        ).create(**validated_data)
+        index_post(post)
+        publish_post_event('post_created', post, request.user)
+        return post
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -158,20 +281,49 @@ class CommentSerializer(serializers.ModelSerializer):
     Serializer for comments with full information.
     """
     author = MemberSerializer(read_only=True)
+    parent = serializers.PrimaryKeyRelatedField(read_only=True)
+    depth = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Comment
-        fields = ['id', 'author', 'content', 'created_at']
-        read_only_fields = ['id', 'author', 'created_at']
+        fields = [
+            'id', 'author', 'parent', 'depth', 'reply_count', 'content',
+            'created_at'
+        ]
+        read_only_fields = ['id', 'author', 'reply_count', 'created_at']
 
 
 class CommentCreateSerializer(serializers.ModelSerializer):
     """
-    Serializer for creating a new comment.
+    Serializer for creating a new comment, or a reply to one.
     """
+    parent = serializers.PrimaryKeyRelatedField(
+        queryset=Comment.objects.all(),
+        required=False,
+        allow_null=True
+    )
+
     class Meta:
         model = Comment
-        fields = ['content']
+        fields = ['content', 'parent']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        post = self.context.get('post')
+        if post is not None:
+            # The replied-to comment is looked up on the post's shard.
+            fields['parent'].queryset = using(Comment.objects, shard_of(post))
+        return fields
+
+    def validate_parent(self, value):
+        """Check the replied-to comment is on the same post and not too deep."""
+        if value is None:
+            return value
+        if value.post_id != self.context.get('post_id'):
+            raise serializers.ValidationError("Comment is on another post.")
+        if not can_reply_to(value):
+            raise serializers.ValidationError("Thread is too deep to reply to.")
+        return value
 
     def create(self, validated_data):
         """Create a new comment with the current user as author."""
@@ -181,4 +333,51 @@ class CommentCreateSerializer(serializers.ModelSerializer):
         validated_data['author'] = request.user
         validated_data['post_id'] = post_id
         
-        return super().create(validated_data)
+        post = self.context.get('post')
+        comment = create_comment(
+            alias=shard_of(post) if post is not None else None,
+            **validated_data
+        )
+        index_comment(comment)
+        record_comment(post_id)
+        notify(
+            comment.post.author_id,
+            request.user,
+            Notification.KIND_COMMENT,
+            post=comment.post
+        )
+        publish_post_event(
+            'comment_created',
+            comment.post,
+            request.user,
+            comment_id=comment.id
+        )
+        return comment
+
+
+class NotificationActorSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the member who last acted on a notification.
+    """
+    class Meta:
+        model = Member
+        fields = ['id', 'first_name', 'last_name']
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    """
+    Serializer for inbox notifications.
+    """
+    actor = NotificationActorSerializer(read_only=True)
+    message = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Notification
+        fields = [
+            'id', 'kind', 'post', 'actor', 'actor_count', 'message',
+            'is_read', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+    def get_message(self, obj):
+        return notification_message(obj)
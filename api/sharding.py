@@ -0,0 +1,367 @@
+"""
+Horizontal sharding of posts and their activity by author.
+
+``DATABASE_SHARDS`` lists database aliases, the primary first (see
+``DATABASE_SHARD_PATHS``). While it is set, each post, its likes and
+comments, and the hashtags and mentions found in them (``SHARDED_MODELS``,
+hot and archived) are stored on the author's shard,
+``shard_for_member(author_id)``. Members, friendships, notifications and
+everything else stay on the primary. Writers on different shards then
+take different SQLite write locks.
+
+* A post and everything about it share a shard, so its counts, its liked
+  check and its comment threads are single-shard queries.
+* Each shard allocates ids for these tables from its own range of
+  ``DATABASE_SHARD_ID_SPAN`` (``reserve_id_ranges``, after ``migrate``),
+  so ids stay unique across shards and ``home_shard(id)`` is the shard a
+  row was created on. After a change to ``DATABASE_SHARDS``,
+  ``manage.py rebalance_shards`` moves posts to their author's new shard
+  with the same ids; lookups by id try the home shard first and then the
+  others (``get_by_id``).
+* Lists that span authors (the feed, timelines, search, exports) query
+  every shard and k-way merge the sorted pages (``merge``).
+* ``ShardRouter`` (api.routers) sends saves, deletes and related lookups
+  of a sharded row to its shard. Other queries name their shard with
+  ``using``; ``Model.objects.create`` and ``bulk_create`` must too.
+
+SQLite cannot check foreign keys between files, so they are not enforced
+on the shards after the primary, and the primary's references to posts
+(notifications, trending scores) have no database constraint. Writes
+spanning a shard and the primary are not one transaction. Replicas and ``backup_database`` cover the primary only.
+Without ``DATABASE_SHARDS`` every helper here is the single-database query
+it replaces.
+"""
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Mod
+
+from .models import (
+    ArchivedComment,
+    ArchivedLike,
+    ArchivedPost,
+    Comment,
+    HashtagUse,
+    Like,
+    Member,
+    Mention,
+    Post
+)
+from .singleflight import invalidate
+
+SHARDED_MODELS = frozenset({
+    'api.post',
+    'api.like',
+    'api.comment',
+    'api.hashtaguse',
+    'api.mention',
+    'api.archivedpost',
+    'api.archivedlike',
+    'api.archivedcomment',
+})
+
+# Sharded models placed by their author; the others follow their post.
+POST_MODELS = frozenset({'api.post', 'api.archivedpost'})
+
+# Tables whose ids each shard allocates from its own range. Archived rows
+# keep the ids they had when hot.
+ID_RANGE_TABLES = ('posts', 'likes', 'comments', 'hashtag_uses', 'mentions')
+
+# Posts and the rows moving with them between shards: (model, column
+# holding the post id), parents first.
+MOVED_TABLES = [
+    [
+        (Post, 'id'),
+        (Like, 'post_id'),
+        (Comment, 'post_id'),
+        (HashtagUse, 'post_id'),
+        (Mention, 'post_id'),
+    ],
+    [
+        (ArchivedPost, 'id'),
+        (ArchivedLike, 'post_id'),
+        (ArchivedComment, 'post_id'),
+    ],
+]
+
+# Comment ids are path segments of 8 hex digits (see api.threads).
+MAX_ID = 16 ** 8
+
+
+def get_shards():
+    """Return the configured shard aliases (empty when sharding is off)."""
+    return settings.DATABASE_SHARDS
+
+
+def is_sharded(model):
+    return bool(get_shards()) and model._meta.label_lower in SHARDED_MODELS
+
+
+def aliases():
+    """
+    Aliases to query for rows of a sharded model: every shard, or [None]
+    (left to the routers) when sharding is off.
+    """
+    return list(get_shards()) or [None]
+
+
+def databases(model):
+    """Aliases holding rows of model."""
+    return list(get_shards()) if is_sharded(model) else [DEFAULT_DB_ALIAS]
+
+
+def using(queryset, alias):
+    """queryset on alias; left to the routers when alias is None."""
+    return queryset if alias is None else queryset.using(alias)
+
+
+def shard_for_member(member_id):
+    """The shard of member_id's posts, or None when sharding is off."""
+    shards = get_shards()
+    return shards[member_id % len(shards)] if shards else None
+
+
+def home_shard(row_id):
+    """The shard whose id range holds row_id, or None."""
+    shards = get_shards()
+    index = row_id // settings.DATABASE_SHARD_ID_SPAN
+    return shards[index] if index < len(shards) else None
+
+
+def shard_of(instance):
+    """The shard instance was loaded from, or None when sharding is off."""
+    return instance._state.db if get_shards() else None
+
+
+def shard_for(model, instance):
+    """
+    Shard of the model rows instance is about: instance itself when it is
+    a sharded row (a new one goes to its author's or post's shard), a
+    member's posts, or None when that cannot be told.
+    """
+    if instance is None or not is_sharded(model):
+        return None
+    label = instance._meta.label_lower
+    if label in SHARDED_MODELS:
+        if instance._state.db is not None:
+            return instance._state.db
+        if label in POST_MODELS:
+            return shard_for_member(instance.author_id)
+        post_field = instance._meta.get_field('post')
+        if post_field.is_cached(instance) and instance.post._state.db is not None:
+            return instance.post._state.db
+        return home_shard(instance.post_id)
+    if label == 'api.member' and model._meta.label_lower in POST_MODELS:
+        return shard_for_member(instance.pk)
+    return None
+
+
+def probe_order(row_id):
+    """Aliases to look for row_id on, its home shard first."""
+    home = home_shard(row_id) if get_shards() else None
+    if home is None:
+        return aliases()
+    return [home] + [alias for alias in get_shards() if alias != home]
+
+
+def get_by_id(queryset, row_id):
+    """The row of queryset with row_id, from whichever shard has it, or None."""
+    for alias in probe_order(row_id):
+        row = using(queryset, alias).filter(pk=row_id).first()
+        if row is not None:
+            return row
+    return None
+
+
+def in_bulk(queryset, ids):
+    """{id: row} of queryset for ids, gathered from every shard."""
+    found = {}
+    missing = list(ids)
+    for alias in aliases():
+        if not missing:
+            break
+        found.update(using(queryset, alias).in_bulk(missing))
+        missing = [row_id for row_id in missing if row_id not in found]
+    return found
+
+
+def merge(pages, key, limit=None, reverse=True):
+    """
+    k-way merge of lists each sorted on key (descending with reverse),
+    cut to limit items.
+    """
+    if len(pages) == 1:
+        return pages[0][:limit]
+    return list(islice(heapq.merge(*pages, key=key, reverse=reverse), limit))
+
+
+def with_authors(queryset):
+    """
+    queryset loading each row's author: joined, or with sharding on fetched
+    from the primary with one more query (shards have no members).
+    """
+    if get_shards():
+        return queryset.prefetch_related('author')
+    return queryset.select_related('author')
+
+
+def live_members(*fields):
+    """
+    One Q per field (a foreign key to Member) matching rows whose member is
+    not soft-deleted: a join, or with sharding (shards have no members) an
+    exclusion of the deleted members' ids, loaded from the primary with one
+    query. Deleted members are few until their rows are purged.
+    """
+    if not get_shards():
+        return tuple(Q(**{f'{field}__deleted_at__isnull': True}) for field in fields)
+    deleted = list(
+        Member.all_objects.filter(deleted_at__isnull=False).values_list('id', flat=True)
+    )
+    return tuple(~Q(**{f'{field}_id__in': deleted}) for field in fields)
+
+
+def add_shard_database(alias, name):
+    """
+    Configure an SQLite shard database at runtime, for benchmarks and tests
+    (deployments set DATABASE_SHARD_PATHS). List it in DATABASE_SHARDS and
+    migrate it before use.
+    """
+    config = {
+        'ENGINE': settings.SHARD_ENGINE,
+        'NAME': name,
+        'OPTIONS': dict(settings.DATABASES[DEFAULT_DB_ALIAS].get('OPTIONS', {})),
+    }
+    settings.DATABASES[alias] = config
+    connections.settings[alias] = connections.configure_settings({
+        DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+        alias: config,
+    })[alias]
+
+
+def remove_shard_database(alias):
+    """Drop a database configured by add_shard_database."""
+    connections[alias].close()
+    del connections[alias]
+    # connections.settings is usually settings.DATABASES itself.
+    connections.settings.pop(alias, None)
+    settings.DATABASES.pop(alias, None)
+
+
+def reserve_id_ranges(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Start a shard's id sequences at its range (post_migrate handler)."""
+    shards = get_shards()
+    if using not in shards:
+        return
+    span = settings.DATABASE_SHARD_ID_SPAN
+    if len(shards) * span > MAX_ID:
+        raise ImproperlyConfigured(
+            'DATABASE_SHARDS times DATABASE_SHARD_ID_SPAN must not exceed 16**8.'
+        )
+    floor = shards.index(using) * span
+    if not floor:
+        return
+    with connections[using].cursor() as cursor:
+        for table in ID_RANGE_TABLES:
+            cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                    [table, floor]
+                )
+            elif row[0] < floor:
+                cursor.execute(
+                    'UPDATE sqlite_sequence SET seq = %s WHERE name = %s',
+                    [floor, table]
+                )
+
+
+def _copy(source, target, model, column, post_ids):
+    """Copy model's rows of post_ids from shard source to target."""
+    quote = connections[source].ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = model._meta.concrete_fields
+    columns = ', '.join(quote(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connections[source].cursor() as cursor:
+        cursor.execute(
+            f'SELECT {columns} FROM {table} WHERE {quote(column)} IN ({placeholders})',
+            post_ids
+        )
+        rows = cursor.fetchall()
+    if rows:
+        values = ', '.join(['%s'] * len(fields))
+        with connections[target].cursor() as cursor:
+            # Rows copied by an interrupted run are already there.
+            cursor.executemany(
+                f'INSERT OR IGNORE INTO {table} ({columns}) VALUES ({values})',
+                rows
+            )
+
+
+def _delete(alias, model, column, post_ids):
+    quote = connections[alias].ops.quote_name
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(column)} IN ({placeholders})',
+            post_ids
+        )
+
+
+def move_posts(post_ids, source, target, tables):
+    """
+    Move posts with their rows in tables (see MOVED_TABLES) from shard
+    source to target, ids unchanged. They are copied before they are
+    deleted, so an interrupted move is completed by running it again.
+    """
+    with transaction.atomic(using=target):
+        for model, column in tables:
+            _copy(source, target, model, column, post_ids)
+    with transaction.atomic(using=source):
+        for model, column in reversed(tables):
+            _delete(source, model, column, post_ids)
+    for post_id in post_ids:
+        invalidate(f'post:{post_id}')
+
+
+def rebalance(batch_size=None, progress=None):
+    """
+    Move the posts (hot and archived) stored on another shard than their
+    author's, with their likes, comments and references, batch_size posts
+    at a time. progress(posts) is called after each batch; return the
+    number of posts moved.
+    """
+    shards = get_shards()
+    batch_size = batch_size or settings.DATABASE_SHARD_REBALANCE_BATCH_SIZE
+    total = 0
+    for index, source in enumerate(shards):
+        for tables in MOVED_TABLES:
+            misplaced = tables[0][0]._base_manager.using(source).annotate(
+                author_shard=Mod('author_id', len(shards))
+            ).exclude(author_shard=index).order_by('id')
+            last_id = 0
+            while True:
+                batch = list(
+                    misplaced.filter(id__gt=last_id).values_list(
+                        'id', 'author_id'
+                    )[:batch_size]
+                )
+                if not batch:
+                    break
+                by_target = defaultdict(list)
+                for post_id, author_id in batch:
+                    by_target[shard_for_member(author_id)].append(post_id)
+                for target, post_ids in by_target.items():
+                    move_posts(post_ids, source, target, tables)
+                last_id = batch[-1][0]
+                total += len(batch)
+                if progress:
+                    progress(total)
+    return total
@@ -0,0 +1,174 @@
+"""
+Request coalescing for expensive, cacheable reads.
+
+``cached_compute(key, compute)`` returns a cached value when fresh enough;
+otherwise exactly one caller recomputes it:
+
+* within a worker, concurrent callers for the same key wait on the call
+  already in flight (``SingleFlight``);
+* across workers, a short lock in the shared cache elects one computing
+  worker while the others serve the stale value or wait for the new one.
+
+``SINGLEFLIGHT_CACHE_ALIAS`` must name a cache shared by every worker
+(checked by api.E001): the lock and ``invalidate`` only reach the workers
+that see the same entries.
+
+Entries are refreshed early with probability rising as they approach expiry
+(XFetch: ``now - delta * beta * log(random()) >= expiry``), so a hot key is
+recomputed by one caller before it expires instead of by all of them after.
+
+``invalidate`` bumps the key's generation. Each entry records the
+generation read before its value was computed and is ignored once that
+is no longer current, so a computation that started before a write
+cannot store a value that outlives the write.
+"""
+import math
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+_MISSING = object()
+
+# Generations outlive any computation still running when they are bumped;
+# one that expires restarts at 0, which invalidates its key once more.
+GENERATION_TTL = 24 * 60 * 60
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one execution.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Run func once for all concurrent callers of key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+flight = SingleFlight()
+
+
+def get_cache():
+    return caches[settings.SINGLEFLIGHT_CACHE_ALIAS]
+
+
+def _cache_key(key):
+    return f'sf:value:{key}'
+
+
+def _lock_key(key):
+    return f'sf:lock:{key}'
+
+
+def _generation_key(key):
+    return f'sf:gen:{key}'
+
+
+def _read(cache, key):
+    """key's entry, or None when it is missing or was invalidated since."""
+    found = cache.get_many([_cache_key(key), _generation_key(key)])
+    entry = found.get(_cache_key(key))
+    if entry is None or entry[3] != found.get(_generation_key(key), 0):
+        return None
+    return entry
+
+
+def should_refresh(entry, now=None):
+    """XFetch test: whether this caller should refresh the entry early."""
+    now = time.time() if now is None else now
+    value, delta, expiry, generation = entry
+    beta = settings.SINGLEFLIGHT_BETA
+    return now - delta * beta * math.log(random.random() or 1e-12) >= expiry
+
+
+def cached_compute(key, compute, ttl=None):
+    """Return compute() through the cache, coalescing concurrent misses."""
+    entry = _read(get_cache(), key)
+    if entry is not None and not should_refresh(entry):
+        return entry[0]
+    return flight.do(key, lambda: _refresh(key, compute, ttl, entry))
+
+
+def _refresh(key, compute, ttl, stale):
+    cache = get_cache()
+    ttl = settings.SINGLEFLIGHT_TTL if ttl is None else ttl
+    lock_timeout = settings.SINGLEFLIGHT_LOCK_TIMEOUT
+
+    token = uuid.uuid4().hex
+    owned = cache.add(_lock_key(key), token, timeout=lock_timeout)
+    if not owned:
+        # Another worker is computing it.
+        if stale is not None:
+            return stale[0]
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            entry = _read(cache, key)
+            if entry is not None:
+                return entry[0]
+        # The other worker died or is too slow; compute it ourselves,
+        # leaving its lock alone.
+
+    try:
+        generation = cache.get(_generation_key(key), 0)
+        start = time.time()
+        value = compute()
+        delta = time.time() - start
+        cache.set(
+            _cache_key(key),
+            (value, delta, time.time() + ttl, generation),
+            timeout=ttl
+        )
+    finally:
+        # Once it expired, the lock may be another worker's.
+        if owned and cache.get(_lock_key(key)) == token:
+            cache.delete(_lock_key(key))
+    return value
+
+
+def invalidate(*keys):
+    """Drop cached values after a write changes them."""
+    cache = get_cache()
+    for key in keys:
+        cache.add(_generation_key(key), 0, timeout=GENERATION_TTL)
+        try:
+            cache.incr(_generation_key(key))
+        except ValueError:
+            # Expired in between: a missing generation is a new one too.
+            pass
+    cache.delete_many([_cache_key(key) for key in keys])
@@ -0,0 +1,77 @@
+"""
+Server-sent events stream of feed activity.
+
+The view is a plain async Django view rather than a DRF ``APIView`` so an
+idle connection costs a coroutine instead of a worker thread when served
+through ``config.asgi``.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CookieAuthentication
+from .events import get_broker
+
+
+def format_event(event):
+    """Encode an event dict as an SSE message."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def event_stream(member_id):
+    """Yield SSE messages for a member until the client disconnects."""
+    broker = get_broker()
+    # Subscribe from inside the stream so events are queued on the loop
+    # that consumes them.
+    subscription = broker.subscribe(member_id)
+    try:
+        # Tell EventSource how long to wait before reconnecting.
+        yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'
+        while True:
+            event = await subscription.get(settings.EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                # Comment line keeps proxies from closing an idle stream.
+                yield ': keep-alive\n\n'
+            else:
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@require_GET
+async def feed_events(request):
+    """Stream new posts, likes and comments visible in the member's feed."""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI an endless stream would pin a worker forever.
+        return JsonResponse(
+            {'error': 'Event stream is only served by the ASGI application'},
+            status=501
+        )
+
+    try:
+        result = await sync_to_async(CookieAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        return JsonResponse({'detail': str(exc.detail)}, status=401)
+    if result is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=401
+        )
+
+    member, _ = result
+    response = StreamingHttpResponse(
+        event_stream(member.id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Disable nginx response buffering for this stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+feed_events.query_budget = {'get': 0}
@@ -0,0 +1,229 @@
+"""
+Hashtags and mentions.
+
+``#tag`` and ``@email`` references are parsed once, when a post or comment
+is written, and stored in ``hashtag_uses`` and ``mentions``. A tag's
+timeline and a member's mentions are then range scans of those tables'
+(key, created_at, id) indexes instead of scans of the post text.
+
+Hashtags are normalized to lower case. Mentions name a member by email,
+the only unique handle members have, and only existing members are kept.
+Indexing is idempotent (unique constraints plus ``ignore_conflicts``), so
+``manage.py backfill_tags`` can be rerun over rows already indexed.
+
+References are stored with their post, on its shard (see api.sharding);
+hashtag names stay on the primary.
+"""
+import re
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .friends import visible_to
+from .models import Comment, Hashtag, HashtagUse, Member, Mention, Post
+from .pagination import decode_cursor, encode_cursor
+from .sharding import aliases, get_shards, merge, shard_of, using
+
+HASHTAG = re.compile(r'(?<![\w#&])#(\w{1,100})')
+MENTION = re.compile(r'(?<![\w@])@([\w.+-]+@[\w-]+(?:\.[\w-]+)+)')
+
+
+def extract_hashtags(text):
+    """Distinct normalized hashtags in text, in order of appearance."""
+    return list(dict.fromkeys(tag.lower() for tag in HASHTAG.findall(text)))
+
+
+def extract_mentions(text):
+    """Distinct emails mentioned in text, in order of appearance."""
+    return list(dict.fromkeys(MENTION.findall(text)))
+
+
+def hashtag_ids(names):
+    """Map names to hashtag ids, creating the hashtags not seen before."""
+    tag_ids = dict(Hashtag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in names if name not in tag_ids]
+    if missing:
+        # Another writer may create the same tags meanwhile.
+        Hashtag.objects.bulk_create(
+            [Hashtag(name=name) for name in missing],
+            ignore_conflicts=True
+        )
+        tag_ids.update(
+            Hashtag.objects.filter(name__in=missing).values_list('name', 'id')
+        )
+    return tag_ids
+
+
+def index_references(sources, alias=None):
+    """
+    Store the hashtags and mentions of sources, an iterable of
+    (post_id, comment_id, author_id, created_at, text) of posts on shard
+    alias; comment_id is None for a post's own text. Queries run only for
+    the kinds found.
+    """
+    tags_by_source = []
+    emails_by_source = []
+    for post_id, comment_id, author_id, created_at, text in sources:
+        key = (post_id, comment_id, author_id, created_at)
+        tags = extract_hashtags(text)
+        if tags:
+            tags_by_source.append((key, tags))
+        emails = extract_mentions(text)
+        if emails:
+            emails_by_source.append((key, emails))
+
+    if tags_by_source:
+        tag_ids = hashtag_ids({tag for _, tags in tags_by_source for tag in tags})
+        using(HashtagUse.objects, alias).bulk_create(
+            [
+                HashtagUse(
+                    hashtag_id=tag_ids[tag],
+                    post_id=post_id,
+                    comment_id=comment_id,
+                    author_id=author_id,
+                    created_at=created_at
+                )
+                for (post_id, comment_id, author_id, created_at), tags in tags_by_source
+                for tag in tags
+            ],
+            ignore_conflicts=True
+        )
+
+    if emails_by_source:
+        member_ids = dict(
+            Member.objects.filter(
+                email__in={email for _, emails in emails_by_source for email in emails}
+            ).values_list('email', 'id')
+        )
+        mentions = [
+            Mention(
+                member_id=member_ids[email],
+                post_id=post_id,
+                comment_id=comment_id,
+                author_id=author_id,
+                created_at=created_at
+            )
+            for (post_id, comment_id, author_id, created_at), emails in emails_by_source
+            for email in emails
+            if email in member_ids
+        ]
+        if mentions:
+            using(Mention.objects, alias).bulk_create(mentions, ignore_conflicts=True)
+
+
+def index_post(post):
+    index_references([
+        (post.id, None, post.author_id, post.created_at, post.content)
+    ], shard_of(post))
+
+
+def index_comment(comment):
+    index_references([
+        (comment.post_id, comment.id, comment.author_id, comment.created_at,
+         comment.content)
+    ], shard_of(comment))
+
+
+def forget_comments(comment_ids, alias=None):
+    """Drop the references of deleted comments on shard alias."""
+    using(HashtagUse.objects, alias).filter(comment_id__in=comment_ids).delete()
+    using(Mention.objects, alias).filter(comment_id__in=comment_ids).delete()
+
+
+def backfill(source, batch_size=None, after=0, progress=None):
+    """
+    Index the references of existing 'posts' or 'comments' with id > after,
+    reading batch_size rows at a time in id order (shard by shard), one
+    transaction per batch. progress(last_id, rows) is called after each
+    batch; return the number of rows read.
+    """
+    batch_size = batch_size or settings.TAG_BACKFILL_BATCH_SIZE
+    if source == 'posts':
+        rows = Post.objects.values_list(
+            'id', 'author_id', 'created_at', 'content'
+        )
+
+        def sources(batch):
+            return [
+                (post_id, None, author_id, created_at, content)
+                for post_id, author_id, created_at, content in batch
+            ]
+    else:
+        rows = Comment.objects.values_list(
+            'id', 'post_id', 'author_id', 'created_at', 'content'
+        )
+
+        def sources(batch):
+            return [
+                (post_id, comment_id, author_id, created_at, content)
+                for comment_id, post_id, author_id, created_at, content in batch
+            ]
+
+    total = 0
+    for alias in aliases():
+        last_id = after
+        while True:
+            batch = list(
+                using(rows, alias).filter(id__gt=last_id).order_by('id')[:batch_size]
+            )
+            if not batch:
+                break
+            with transaction.atomic(using=alias):
+                index_references(sources(batch), alias)
+            last_id = batch[-1][0]
+            total += len(batch)
+            if progress:
+                progress(last_id, total)
+    return total
+
+
+def _key(reference):
+    return (reference['created_at'], reference['id'])
+
+
+def _page(references, limit, cursor):
+    references = references.filter(
+        post__deleted_at__isnull=True
+    ).order_by('-created_at', '-id')
+    if cursor:
+        created_at, reference_id = decode_cursor(cursor, datetime, int)
+        references = references.filter(
+            Q(created_at__lt=created_at) |
+            Q(created_at=created_at, id__lt=reference_id)
+        )
+    references = references.values('id', 'post_id', 'comment_id', 'created_at')
+    page = merge(
+        [list(using(references, alias)[:limit + 1]) for alias in aliases()],
+        _key,
+        limit + 1
+    )
+    next_cursor = None
+    if len(page) > limit:
+        last = page[limit - 1]
+        next_cursor = encode_cursor(last['created_at'], last['id'])
+    return page[:limit], next_cursor
+
+
+def tag_timeline(member, name, limit, cursor=None):
+    """
+    Return (references, next_cursor) of the posts and comments tagged
+    name in the posts member may see (own and friends'), newest first.
+    """
+    if get_shards():
+        # Hashtags are on the primary only.
+        tag = Q(hashtag_id__in=list(
+            Hashtag.objects.filter(name=name.lower()).values_list('id', flat=True)
+        ))
+    else:
+        tag = Q(hashtag__name=name.lower())
+    references = HashtagUse.objects.filter(tag).filter(
+        visible_to(member, 'post__author_id')
+    )
+    return _page(references, limit, cursor)
+
+
+def mentions_of(member, limit, cursor=None):
+    """Return (references, next_cursor) of member's mentions, newest first."""
+    return _page(Mention.objects.filter(member=member), limit, cursor)
@@ -0,0 +1,8 @@
+"""
+Tests of the api app, one module per subsystem.
+
+``base`` holds the shared fixtures: ``APITestCase`` for tests that create
+the few rows they need, and ``SocialGraphTestCase``, a seeded graph of
+friends, posts, likes and comments, for tests about lists, counts and
+query patterns that need realistic data.
+"""
@@ -0,0 +1,111 @@
+"""
+Fixtures shared by the api tests.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from api.authentication import session_token
+from api.friends import clear_local
+from api.models import Friendship, Like, Member, Notification, Post
+from api.notifications import notify
+from api.threads import create_comment
+
+# A 1x1 white PNG.
+PNG = (
+    b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02'
+    b'\x00\x00\x00\x90wS\xde\x00\x00\x00\x0cIDATx\xdac\xf8\xff\xff?\x00\x05\xfe'
+    b'\x02\xfe3\x12\x95\x14\x00\x00\x00\x00IEND\xaeB`\x82'
+)
+
+PROFILING_TOKEN = 'profiling-token'
+
+
+@override_settings(
+    DELETION_PURGE_IN_BACKGROUND=False,
+    THROTTLE_RATES={scope: '1000/min' for scope in settings.THROTTLE_RATES}
+)
+class APITestCase(TestCase):
+    """
+    Keeps media, profiles and the shared cache in a temporary directory and
+    starts every test with empty caches.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Entered before the test data is set up, which may use the caches:
+        # clearing them must never reach a deployment's shared cache file.
+        tmpdir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(tmpdir.cleanup)
+        cls.enterClassContext(override_settings(
+            AVATAR_STAGING_DIR=os.path.join(tmpdir.name, 'uploads'),
+            CACHES={
+                **settings.CACHES,
+                'shared': {
+                    **settings.CACHES['shared'],
+                    'LOCATION': os.path.join(tmpdir.name, 'cache.sqlite3'),
+                },
+            },
+            MEDIA_ROOT=os.path.join(tmpdir.name, 'media'),
+            PROFILING_DIR=os.path.join(tmpdir.name, 'profiles'),
+            PROFILING_TOKEN=PROFILING_TOKEN
+        ))
+        super().setUpClass()
+
+    @classmethod
+    def create_member(cls, name, **fields):
+        member = Member(**{
+            'email': f'{name}@example.com',
+            'first_name': name.title(),
+            'last_name': 'Tester',
+            **fields
+        })
+        member.set_password('password123')
+        member.save()
+        return member
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        clear_local()
+
+    def login(self, member):
+        self.client.cookies['session_id'] = session_token(member)
+
+
+class SocialGraphTestCase(APITestCase):
+    """
+    Seeds a small social graph: the viewer has friends who post, and every
+    post is liked and commented on by several members.
+    """
+    friends = 6
+    posts_per_member = 3
+    likers = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+        cls.others = [cls.create_member(f'friend{i}') for i in range(cls.friends)]
+        for other in cls.others:
+            Friendship.objects.create(member=cls.viewer, friend=other)
+            Friendship.objects.create(member=other, friend=cls.viewer)
+
+        cls.posts = []
+        for author in [cls.viewer, *cls.others]:
+            for i in range(cls.posts_per_member):
+                post = Post.objects.create(author=author, content=f'Post {i}')
+                cls.posts.append(post)
+                for liker in cls.others[:cls.likers]:
+                    Like.objects.create(member=liker, post=post)
+                    notify(author.id, liker, Notification.KIND_LIKE, post=post)
+                    create_comment(author=liker, post=post, content='Hi')
+
+        cls.own_post = cls.posts[0]
+        cls.own_comment = create_comment(
+            author=cls.viewer,
+            post=cls.own_post,
+            content='Mine'
+        )
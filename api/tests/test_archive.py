@@ -0,0 +1,110 @@
+"""
+Archiving old posts into cold tables.
+"""
+import io
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+
+from api.deletion import purge_object
+from api.models import (
+    ArchivedComment, ArchivedLike, ArchivedPost, Comment, HashtagUse, Like, Member,
+    Notification, Post
+)
+
+from .base import SocialGraphTestCase
+
+
+class ArchiveTests(SocialGraphTestCase):
+    """
+    Old posts move to the archive with their likes and comments; the feed
+    pages into it and writes bring posts back.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.viewer)
+        self.feed = [post['id'] for post in self.client.get('/api/posts').json()]
+        # The oldest third of the feed, a year old, one day apart.
+        self.old_ids = self.feed[-len(self.feed) // 3:]
+        old = timezone.now() - timedelta(days=400)
+        for age, post_id in enumerate(self.old_ids):
+            Post.objects.filter(id=post_id).update(created_at=old - timedelta(days=age))
+
+    def archive(self):
+        call_command('archive_posts', batch_size=2, stdout=io.StringIO())
+
+    def test_feed_pages_into_archive(self):
+        self.archive()
+        self.assertEqual(
+            set(ArchivedPost.objects.values_list('id', flat=True)),
+            set(self.old_ids)
+        )
+        self.assertFalse(Like.objects.filter(post_id__in=self.old_ids).exists())
+
+        # Clients that do not page still get every post.
+        response = self.client.get('/api/posts')
+        self.assertNotIn('Link', response)
+        feed = response.json()
+        self.assertEqual([post['id'] for post in feed], self.feed)
+        archived = feed[-len(self.old_ids)]
+        self.assertEqual(archived['likes_count'], self.likers)
+        self.assertEqual(archived['comments_count'], self.likers)
+
+        response = self.client.get('/api/posts', {'limit': settings.FEED_PAGE_SIZE})
+        seen = response.json()
+        link = response.get('Link')
+        while link:
+            response = self.client.get(link[1:link.index('>')])
+            page = response.json()
+            self.assertLessEqual(len(page), settings.FEED_PAGE_SIZE)
+            seen += page
+            link = response.get('Link')
+        self.assertEqual([post['id'] for post in seen], self.feed)
+
+        ids = []
+        url, query = '/api/posts', {'limit': 4}
+        while url:
+            response = self.client.get(url, query)
+            ids += [post['id'] for post in response.json()]
+            link = response.get('Link')
+            url, query = link and link[1:link.index('>')], None
+        self.assertEqual(ids, self.feed)
+
+    def test_reads_from_archive(self):
+        post_id = self.old_ids[0]
+        Comment.objects.filter(post_id=post_id).update(content='Old #times')
+        self.archive()
+        response = self.client.get(f'/api/posts/{post_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['likes_count'], self.likers)
+        comments = self.client.get(f'/api/posts/{post_id}/comments').json()
+        self.assertEqual(len(comments), self.likers)
+        self.assertTrue(ArchivedPost.objects.filter(id=post_id).exists())
+
+        # Writing brings the post back, tags and all.
+        response = self.client.post(f'/api/posts/{post_id}/like')
+        self.assertEqual(response.json()['likes_count'], self.likers + 1)
+        self.assertFalse(ArchivedPost.objects.filter(id=post_id).exists())
+        self.assertEqual(Comment.objects.filter(post_id=post_id).count(), self.likers)
+        self.assertEqual(
+            HashtagUse.objects.filter(post_id=post_id).count(),
+            self.likers
+        )
+
+    def test_counters_and_purge(self):
+        unread = Notification.objects.filter(
+            recipient=self.viewer,
+            is_read=False
+        ).exclude(post_id__in=self.old_ids).count()
+        self.archive()
+        self.viewer.refresh_from_db()
+        self.assertEqual(self.viewer.unread_notifications, unread)
+
+        author = ArchivedPost.objects.exclude(author=self.viewer).first().author
+        purge_object(Member, author.id)
+        self.assertFalse(ArchivedPost.objects.filter(author=author).exists())
+        self.assertFalse(ArchivedLike.objects.filter(member=author).exists())
+        self.assertFalse(ArchivedComment.objects.filter(author=author).exists())
@@ -0,0 +1,83 @@
+"""
+Session revocation and request throttling.
+"""
+import io
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.authentication import session_token
+from api.throttling import CacheWindowStore, rejection_counts
+
+from .base import APITestCase
+
+
+class SessionRevocationTests(APITestCase):
+    """
+    Logging out revokes the member's cookies without extra queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+
+    def test_logout_revokes_cookie(self):
+        token = session_token(self.viewer)
+        self.client.cookies['session_id'] = token
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/notifications/unread').status_code, 200)
+        self.assertEqual(len(queries), 1)
+
+        self.assertEqual(self.client.post('/api/auth/logout').status_code, 200)
+        self.client.cookies['session_id'] = token
+        response = self.client.get('/api/notifications/unread')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['detail'], 'Session revoked')
+
+        self.viewer.refresh_from_db()
+        self.login(self.viewer)
+        self.assertEqual(self.client.get('/api/notifications/unread').status_code, 200)
+
+
+class ThrottleTests(APITestCase):
+    """
+    Anonymous clients are throttled on the address the proxy saw, and the
+    budget is shared by every worker.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+
+    def attempt_login(self, forwarded_for):
+        return self.client.post(
+            '/api/auth/login',
+            {'email': self.viewer.email, 'password': 'wrong'},
+            content_type='application/json',
+            HTTP_X_FORWARDED_FOR=forwarded_for
+        )
+
+    @override_settings(THROTTLE_RATES={**settings.THROTTLE_RATES, 'login': '2/min'})
+    def test_spoofed_forwarded_for(self):
+        # nginx appends the address it saw to what the client sent.
+        for spoofed in ('1.1.1.1', '2.2.2.2'):
+            self.assertEqual(self.attempt_login(f'{spoofed}, 10.0.0.1').status_code, 401)
+        response = self.attempt_login('3.3.3.3, 10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.attempt_login('10.0.0.2').status_code, 401)
+
+        self.assertEqual(rejection_counts()['login'], 1)
+        output = io.StringIO()
+        call_command('throttle_status', stdout=output)
+        self.assertIn('login: rate=2/min rejected=1', output.getvalue())
+
+    def test_workers_share_budget(self):
+        workers = [CacheWindowStore(), CacheWindowStore()]
+        self.assertEqual(workers[0].consume('throttle:test', 2, 60), 0)
+        self.assertEqual(workers[1].consume('throttle:test', 2, 60), 0)
+        self.assertGreater(workers[0].consume('throttle:test', 2, 60), 0)
+        self.assertGreater(workers[1].consume('throttle:test', 2, 60), 0)
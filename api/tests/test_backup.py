@@ -0,0 +1,132 @@
+"""
+Online database snapshots and their rotation.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+
+from django.db import connections
+from django.test import SimpleTestCase, override_settings
+
+from api.backup import (
+    BackupError,
+    copy_database,
+    create_backup,
+    list_backups,
+    restore_backup,
+    rotate_backups,
+)
+from api.sharding import add_shard_database, remove_shard_database
+
+
+class BackupTests(SimpleTestCase):
+    """
+    Online snapshots are consistent copies, and rotation keeps the newest.
+    """
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dir = tmpdir.name
+
+    def test_snapshot_of_wal_database_ignores_concurrent_writes(self):
+        source = os.path.join(self.dir, 'source.sqlite3')
+        conn = sqlite3.connect(source, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=wal')
+        conn.execute('CREATE TABLE t (x)')
+        conn.executemany('INSERT INTO t VALUES (?)', [('x' * 500,)] * 2000)
+        conn.close()
+
+        stop = threading.Event()
+
+        def write():
+            writer = sqlite3.connect(source, isolation_level=None, timeout=10)
+            while not stop.is_set():
+                writer.execute("INSERT INTO t VALUES ('new')")
+            writer.close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        try:
+            target = os.path.join(self.dir, 'target.sqlite3')
+            progress = copy_database(source, target, pages=1, pause=0.001)
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertGreater(progress.steps, 1)
+        self.assertEqual(progress.restarts, 0)
+        snapshot = sqlite3.connect(target)
+        self.addCleanup(snapshot.close)
+        self.assertEqual(
+            snapshot.execute("SELECT COUNT(*) FROM t WHERE x != 'new'").fetchone()[0],
+            2000
+        )
+        self.assertEqual(snapshot.execute('PRAGMA quick_check').fetchone()[0], 'ok')
+
+    def create_database(self, name, value):
+        path = os.path.join(self.dir, name)
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute('CREATE TABLE t (x)')
+        conn.execute('INSERT INTO t VALUES (?)', (value,))
+        conn.close()
+        return path
+
+    def set_value(self, path, value):
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute('UPDATE t SET x = ?', (value,))
+        conn.close()
+
+    def value(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute('SELECT x FROM t').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_snapshot_covers_shards(self):
+        primary = self.create_database('primary.sqlite3', 'primary')
+        shard = self.create_database('shard.sqlite3', 'shard')
+        add_shard_database('backup_shard', shard)
+        self.addCleanup(remove_shard_database, 'backup_shard')
+        self.enterContext(mock.patch.dict(
+            connections['default'].settings_dict, NAME=primary
+        ))
+        backups = os.path.join(self.dir, 'backups')
+
+        with override_settings(DATABASE_SHARDS=['default', 'backup_shard']):
+            written = create_backup(directory=backups)
+            self.assertEqual(
+                [alias for alias, _, _ in written],
+                ['default', 'backup_shard']
+            )
+            [path] = list_backups(backups)
+            self.assertEqual(path, written[0][1])
+
+            self.set_value(primary, 'changed')
+            self.set_value(shard, 'changed')
+            restore_backup(path)
+            self.assertEqual(self.value(primary), 'primary')
+            self.assertEqual(self.value(shard), 'shard')
+
+        # A snapshot with shards is not restored over an unsharded setup.
+        self.set_value(primary, 'changed')
+        with self.assertRaises(BackupError):
+            restore_backup(path)
+        self.assertEqual(self.value(primary), 'changed')
+
+        # Rotation deletes every file of a snapshot.
+        rotate_backups(keep=0, directory=backups)
+        self.assertEqual(os.listdir(backups), [])
+
+    def test_rotation_keeps_newest(self):
+        names = [f'db-2026010{day}T000000000000Z.sqlite3.gz' for day in range(1, 6)]
+        for name in names:
+            open(os.path.join(self.dir, name), 'wb').close()
+        rotate_backups(keep=2, directory=self.dir)
+        self.assertEqual(
+            [os.path.basename(path) for path in list_backups(self.dir)],
+            [names[4], names[3]]
+        )
@@ -0,0 +1,63 @@
+"""
+The SQLite cache shared by every worker process.
+"""
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from api.cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    """
+    Two backends on one file behave like one cache: add and incr are
+    atomic between them and expired entries are gone for both.
+    """
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, 'cache', 'cache.sqlite3')
+        self.workers = [SQLiteCache(path, {}), SQLiteCache(path, {})]
+
+    def test_add_once(self):
+        first, second = self.workers
+        self.assertTrue(first.add('lock', 'first'))
+        self.assertFalse(second.add('lock', 'second'))
+        self.assertEqual(second.get('lock'), 'first')
+        second.delete('lock')
+        self.assertTrue(second.add('lock', 'second'))
+
+    def test_incr(self):
+        first, second = self.workers
+        first.set('counter', 1)
+        self.assertEqual(second.incr('counter'), 2)
+        self.assertEqual(first.incr('counter', 3), 5)
+        with self.assertRaises(ValueError):
+            first.incr('missing')
+        # Only integers are updated in place.
+        first.set('text', 'one')
+        with self.assertRaises(ValueError):
+            second.incr('text')
+
+    def test_values(self):
+        first, second = self.workers
+        values = {'int': 7, 'big': 2 ** 70, 'dict': {'ids': [1, 2]}, 'none': None}
+        for key, value in values.items():
+            first.set(key, value)
+        self.assertEqual(second.get_many([*values, 'missing']), values)
+        self.assertTrue(second.has_key('none'))
+
+    def test_expiry(self):
+        first, second = self.workers
+        first.set('short', 1, timeout=0.05)
+        first.set('forever', 1, timeout=None)
+        self.assertEqual(second.get('short'), 1)
+        time.sleep(0.1)
+        self.assertIsNone(second.get('short'))
+        self.assertTrue(second.add('short', 2))
+        self.assertEqual(second.incr('forever'), 2)
+        second.clear()
+        self.assertIsNone(first.get('forever'))
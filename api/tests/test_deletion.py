@@ -0,0 +1,124 @@
+"""
+Background purging of soft-deleted rows.
+"""
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from api.deletion import purge_object, soft_delete_member, soft_delete_post
+from api.friends import clear_local, is_friend
+from api.models import DeletionJob, Friendship, Like, Member, Post
+from api.threads import create_comment
+
+from .base import APITestCase
+
+
+class SoftDeletionTests(APITestCase):
+    """
+    A deleted member's likes, comments and friendships stop counting before
+    they are purged.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_member('author')
+        cls.liker = cls.create_member('liker')
+        Friendship.objects.create(member=cls.author, friend=cls.liker)
+        Friendship.objects.create(member=cls.liker, friend=cls.author)
+        cls.post = Post.objects.create(author=cls.author, content='Liked')
+        Like.objects.create(member=cls.liker, post=cls.post)
+        create_comment(author=cls.liker, post=cls.post, content='Hi')
+
+    @override_settings(DELETION_PURGE_IN_BACKGROUND=True)
+    def test_counts_skip_deleted_member(self):
+        self.login(self.author)
+        self.assertEqual(self.counts(), (1, 1, 1))
+        soft_delete_member(self.liker)
+        self.assertTrue(Like.objects.filter(member=self.liker).exists())
+
+        feed = self.client.get('/api/posts').json()
+        self.assertEqual(feed[0]['likes_count'], 0)
+        self.assertEqual(feed[0]['comments_count'], 0)
+        self.assertEqual(feed[0]['author']['friends_count'], 0)
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_purge_updates_caches(self):
+        self.login(self.author)
+        self.assertEqual(self.counts(), (1, 1, 1))
+        self.assertTrue(is_friend(self.author.id, self.liker.id))
+        purge_object(Member, self.liker.id)
+
+        self.assertEqual(self.counts(), (0, 0, 0))
+        self.assertFalse(is_friend(self.author.id, self.liker.id))
+        clear_local()
+        self.assertFalse(is_friend(self.author.id, self.liker.id))
+
+    def counts(self):
+        """likes_count, comments_count and the author's friends_count."""
+        post = self.client.get(f'/api/posts/{self.post.id}').json()
+        member = self.client.get(f'/api/members/{self.author.id}').json()
+        return post['likes_count'], post['comments_count'], member['friends_count']
+
+
+class DeletionJobTests(APITestCase):
+    """
+    A job left running by a killed worker is claimed again once its lease
+    runs out.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_member('author')
+        cls.liker = cls.create_member('liker')
+        cls.post = Post.objects.create(author=cls.author, content='Doomed')
+        Like.objects.create(member=cls.liker, post=cls.post)
+
+    def test_reclaims_abandoned_job(self):
+        post = self.post
+        job = soft_delete_post(post)
+        DeletionJob.objects.filter(id=job.id).update(
+            status=DeletionJob.STATUS_RUNNING,
+            heartbeat_at=timezone.now()
+        )
+        call_command('purge_deleted', stdout=io.StringIO())
+        # Still within the lease: its worker may be busy with it.
+        self.assertTrue(Post.all_objects.filter(id=post.id).exists())
+
+        DeletionJob.objects.filter(id=job.id).update(
+            heartbeat_at=timezone.now() - timedelta(
+                seconds=settings.DELETION_JOB_LEASE + 1
+            )
+        )
+        call_command('purge_deleted', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.STATUS_DONE)
+        self.assertFalse(Post.all_objects.filter(id=post.id).exists())
+        self.assertFalse(Like.objects.filter(post_id=post.id).exists())
+
+    def test_retries_failed_job(self):
+        job = soft_delete_post(self.post)
+        with (
+            mock.patch('api.deletion.purge_object', side_effect=OSError('disk full')),
+            self.assertLogs('api.deletion', 'ERROR')
+        ):
+            call_command('purge_deleted', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (DeletionJob.STATUS_FAILED, 1))
+
+        # Not before the retry delay has passed.
+        call_command('purge_deleted', stdout=io.StringIO())
+        self.assertEqual(DeletionJob.objects.get(id=job.id).attempts, 1)
+        DeletionJob.objects.filter(id=job.id).update(
+            heartbeat_at=timezone.now() - timedelta(
+                seconds=settings.DELETION_JOB_RETRY_DELAY + 1
+            )
+        )
+        call_command('purge_deleted', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (DeletionJob.STATUS_DONE, 2))
+        self.assertFalse(Post.all_objects.filter(id=self.post.id).exists())
@@ -0,0 +1,72 @@
+"""
+Delivering feed events between worker processes.
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings
+
+from api.events import CacheBroker
+
+from .base import APITestCase
+
+
+@override_settings(EVENTS_POLL_INTERVAL=3600)
+class EventTests(APITestCase):
+    """
+    CacheBroker relays events published by one process to the subscribers
+    of another, in order, waiting briefly for events still being written.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.viewer)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        # The streaming process; the test client publishes through another.
+        self.broker = CacheBroker()
+        self.subscription = self.broker.subscribe(self.viewer.id, self.loop)
+        self.cache = caches[settings.EVENTS_CACHE_ALIAS]
+
+    def received(self):
+        self.broker.poll_once()
+        events = []
+        while event := self.loop.run_until_complete(self.subscription.get(0.01)):
+            events.append(event['type'])
+        return events
+
+    def take_sequence(self):
+        """A sequence number taken by a publisher that has not written yet."""
+        self.cache.add(CacheBroker.sequence_key, 0, timeout=None)
+        return self.cache.incr(CacheBroker.sequence_key)
+
+    def test_publish_delivers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                '/api/posts',
+                {'content': 'Hello'},
+                content_type='application/json'
+            )
+        self.assertEqual(self.received(), ['post_created'])
+        self.assertEqual(self.received(), [])
+
+    def test_waits_for_gap(self):
+        sequence = self.take_sequence()
+        self.broker.publish([self.viewer.id], {'type': 'second'})
+        self.assertEqual(self.received(), [])
+        self.cache.set(
+            f'events:{sequence}',
+            {'member_ids': [self.viewer.id], 'event': {'type': 'first'}}
+        )
+        self.assertEqual(self.received(), ['first', 'second'])
+
+    @override_settings(EVENTS_GAP_SECONDS=0)
+    def test_skips_expired_gap(self):
+        self.take_sequence()
+        self.broker.publish([self.viewer.id], {'type': 'next'})
+        self.assertEqual(self.received(), ['next'])
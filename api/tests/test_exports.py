@@ -0,0 +1,57 @@
+"""
+Exporting a member's own data.
+"""
+import io
+import json
+import zipfile
+
+from api.models import Comment, Friendship, Like, Post
+
+from .base import SocialGraphTestCase
+
+
+class ExportTests(SocialGraphTestCase):
+    """
+    The export streams every section of the member's own data.
+    """
+
+    def export(self, member_id, export_format):
+        self.login(self.viewer)
+        return self.client.get(
+            f'/api/members/{member_id}/export',
+            {'output': export_format}
+        )
+
+    def expected_counts(self):
+        return {
+            'profile': 1,
+            'post': Post.objects.filter(author=self.viewer).count(),
+            'comment': Comment.objects.filter(author=self.viewer).count(),
+            'like': Like.objects.filter(member=self.viewer).count(),
+            'friendship': Friendship.objects.filter(member=self.viewer).count(),
+        }
+
+    def test_ndjson(self):
+        response = self.export(self.viewer.id, 'ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        body = b''.join(response.streaming_content).decode()
+        records = [json.loads(line) for line in body.splitlines()]
+        counts = {kind: 0 for kind in self.expected_counts()}
+        for record in records:
+            counts[record['type']] += 1
+        self.assertEqual(counts, self.expected_counts())
+        self.assertNotIn('password', records[0])
+
+    def test_zip(self):
+        response = self.export(self.viewer.id, 'zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        profile = json.loads(archive.read('profile.json'))
+        self.assertEqual(profile['email'], self.viewer.email)
+        expected = self.expected_counts()
+        for section in ('posts', 'comments', 'likes', 'friendships'):
+            lines = archive.read(f'{section}.ndjson').decode().splitlines()
+            self.assertEqual(len(lines), expected[section[:-1]], section)
+
+    def test_other_member(self):
+        self.assertEqual(self.export(self.others[0].id, 'ndjson').status_code, 403)
@@ -0,0 +1,66 @@
+"""
+Cached friend-id sets.
+"""
+from django.test import override_settings
+
+from api.checks import check_shared_caches
+from api.friends import FriendIds, clear_local, friend_ids, is_friend
+
+from .base import SocialGraphTestCase
+
+
+class FriendCacheTests(SocialGraphTestCase):
+    """
+    Friend ids come from the cache, which friend toggles update in place.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.viewer)
+
+    def feed_authors(self):
+        return {post['author']['id'] for post in self.client.get('/api/posts').json()}
+
+    def test_toggle_updates_cache(self):
+        friend = self.others[0]
+        self.assertIn(friend.id, self.feed_authors())
+        self.client.post(f'/api/members/{friend.id}/friend')
+        with self.assertNumQueries(0):
+            self.assertFalse(is_friend(self.viewer.id, friend.id))
+        self.assertNotIn(friend.id, self.feed_authors())
+
+        # Another worker's copy: only the shared cache was updated.
+        clear_local()
+        self.client.post(f'/api/members/{friend.id}/friend')
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                list(friend_ids(self.viewer.id)),
+                sorted(other.id for other in self.others)
+            )
+        self.assertTrue(self.client.get(f'/api/members/{friend.id}').json()['is_friend'])
+
+    def test_large_sets_use_subquery(self):
+        expected = self.feed_authors()
+        with override_settings(FRIEND_CACHE_MAX_INLINE=1):
+            self.assertEqual(self.feed_authors(), expected)
+            response = self.client.get('/api/posts/search', {'q': 'post', 'limit': 100})
+        self.assertEqual(
+            {result['author']['id'] for result in response.json()['results']},
+            expected
+        )
+
+    def test_requires_shared_cache(self):
+        self.assertEqual(check_shared_caches(None), [])
+        with override_settings(FRIEND_CACHE_ALIAS='default'):
+            self.assertEqual(
+                [error.id for error in check_shared_caches(None)],
+                ['api.E001']
+            )
+
+    def test_friend_ids(self):
+        ids = FriendIds([5, 1, 3])
+        self.assertEqual(list(ids.with_id(4)), [1, 3, 4, 5])
+        self.assertEqual(list(ids.without_id(3)), [1, 5])
+        self.assertEqual(list(ids), [1, 3, 5])
+        self.assertNotIn(2, ids)
+        self.assertEqual(list(FriendIds.frombytes(ids.tobytes())), [1, 3, 5])
@@ -0,0 +1,119 @@
+"""
+Bulk member import.
+"""
+import json
+import os
+import tempfile
+
+from api.imports import ImportStats, MemberImporter, state_path
+from api.models import Member
+
+from .base import APITestCase
+
+
+class ImportTests(APITestCase):
+    """
+    Bulk import validates rows, skips known emails and resumes.
+    """
+
+    def write_input(self, rows):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, 'members.ndjson')
+        with open(path, 'w') as output:
+            for row in rows:
+                output.write(json.dumps(row) + '\n')
+        return path
+
+    def write_lines(self, lines):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, 'members.ndjson')
+        with open(path, 'w') as output:
+            output.write(''.join(line + '\n' for line in lines))
+        return path
+
+    def test_import(self):
+        Member.objects.create(email='taken@example.com', first_name='T', last_name='T')
+        hashed = 'pbkdf2_sha256$1000000$salt$' + 'A' * 43
+        rows = [
+            {'email': f'm{i}@example.com', 'first_name': 'M', 'last_name': str(i),
+             'password_hash': hashed}
+            for i in range(5)
+        ] + [
+            {'email': 'p@example.com', 'first_name': 'P', 'last_name': 'P',
+             'password': 'password123'},
+            {'email': 'taken@example.com', 'first_name': 'D', 'last_name': 'D',
+             'password_hash': hashed},
+            {'email': 'm0@example.com', 'first_name': 'D', 'last_name': 'D',
+             'password_hash': hashed},
+            {'email': 'invalid', 'first_name': 'X', 'last_name': 'X',
+             'password': 'password123'},
+        ]
+        path = self.write_input(rows)
+        rejects = []
+        stats = MemberImporter(
+            path,
+            batch_size=3,
+            workers=1,
+            reject=lambda line, row, reason: rejects.append(line)
+        ).run()
+
+        self.assertEqual(
+            stats.as_dict(),
+            {'rows': 9, 'imported': 6, 'duplicates': 2, 'invalid': 1}
+        )
+        self.assertEqual(sorted(rejects), [7, 8, 9])
+        self.assertTrue(
+            Member.objects.get(email='p@example.com').check_password('password123')
+        )
+        self.assertEqual(Member.objects.get(email='m1@example.com').password, hashed)
+
+        # A second run resumes after the last committed row.
+        self.assertTrue(os.path.exists(state_path(path)))
+        again = MemberImporter(path, workers=1).run()
+        self.assertEqual(again.imported, 6)
+        self.assertEqual(Member.objects.count(), 7)
+
+    def test_malformed_lines(self):
+        hashed = 'pbkdf2_sha256$1000000$salt$' + 'A' * 43
+        row = {'email': 'm@example.com', 'first_name': 'M', 'last_name': 'M',
+               'password_hash': hashed}
+        path = self.write_lines(['{"email": ', '[1, 2]', '"text"', json.dumps(row)])
+        rejects = []
+        stats = MemberImporter(
+            path,
+            workers=1,
+            reject=lambda line, row, reason: rejects.append((line, reason))
+        ).run()
+
+        self.assertEqual(
+            stats.as_dict(),
+            {'rows': 4, 'imported': 1, 'duplicates': 0, 'invalid': 3}
+        )
+        self.assertEqual([line for line, _ in rejects], [1, 2, 3])
+        self.assertTrue(Member.objects.filter(email='m@example.com').exists())
+
+    def test_email_taken_during_import(self):
+        hashed = 'pbkdf2_sha256$1000000$salt$' + 'A' * 43
+        rows = [
+            {'email': f'm{i}@example.com', 'first_name': 'M', 'last_name': str(i),
+             'password_hash': hashed}
+            for i in range(3)
+        ]
+        path = self.write_input(rows)
+        rejects = []
+        importer = MemberImporter(
+            path,
+            workers=1,
+            reject=lambda line, row, reason: rejects.append((line, reason))
+        )
+        # No password to hash, so the batch needs no executor.
+        prepared = importer.prepare(list(enumerate(rows, 1)), executor=None)
+        # Registered between the email check and the insert.
+        Member.objects.create(email='m1@example.com', first_name='R', last_name='R')
+        stats = ImportStats()
+        importer.insert(prepared, stats)
+
+        self.assertEqual((stats.imported, stats.duplicates), (2, 1))
+        self.assertEqual(rejects, [(2, 'duplicate email')])
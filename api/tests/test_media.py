@@ -0,0 +1,46 @@
+"""
+Avatar uploads and thumbnails.
+"""
+import io
+import os
+from unittest import skipUnless
+
+from django.conf import settings
+
+from api.media import Image, avatar_path, schedule_thumbnails
+from api.models import Member
+
+from .base import APITestCase
+
+
+@skipUnless(Image, 'Pillow is not installed')
+class AvatarTests(APITestCase):
+    """
+    Uploaded avatars get a square thumbnail for each of AVATAR_SIZES.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+
+    def test_thumbnails_rendered(self):
+        image = io.BytesIO()
+        Image.new('RGB', (300, 200), 'red').save(image, format='PNG')
+        self.login(self.viewer)
+        response = self.client.put(
+            f'/api/members/{self.viewer.id}/avatar',
+            image.getvalue(),
+            content_type='image/png'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        key = Member.objects.get(id=self.viewer.id).avatar_key
+        for future in schedule_thumbnails(key):
+            future.result()
+        for size in settings.AVATAR_SIZES:
+            path = os.path.join(settings.MEDIA_ROOT, avatar_path(key, size))
+            with Image.open(path) as thumbnail:
+                self.assertEqual(thumbnail.size, (size, size))
+        # Nothing but validated avatars is written where nginx serves it.
+        self.assertEqual(os.listdir(settings.MEDIA_ROOT), ['avatars'])
+        self.assertEqual(os.listdir(settings.AVATAR_STAGING_DIR), [])
@@ -0,0 +1,94 @@
+"""
+Middleware around the API: browser-only middleware and compression.
+"""
+import gzip
+import io
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+
+from api import urls
+from api.models import Post
+
+from .base import APITestCase
+from .test_queries import handler_methods
+
+
+class BrowserMiddlewareTests(APITestCase):
+    """
+    API requests skip the browser-only middleware; the admin keeps it.
+    """
+
+    def test_api_skips_browser_middleware(self):
+        response = self.client.get('/api/posts/trending')
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_admin_keeps_browser_middleware(self):
+        response = self.client.get('/admin/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Frame-Options'], 'SAMEORIGIN')
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    def test_unsafe_api_views_do_not_need_csrf(self):
+        for pattern in urls.urlpatterns:
+            unsafe = set(handler_methods(pattern.callback)) - {'get'}
+            if unsafe:
+                self.assertTrue(
+                    getattr(pattern.callback, 'csrf_exempt', False),
+                    f'{pattern.name} accepts {unsafe} and relies on CSRF'
+                )
+
+
+
+class CompressionTests(APITestCase):
+    """
+    Large API responses are compressed for clients that accept it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+        for i in range(settings.FEED_PAGE_SIZE):
+            Post.objects.create(author=cls.viewer, content=f'Post {i}')
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.viewer)
+
+    def test_large_responses(self):
+        plain = self.client.get('/api/posts')
+        self.assertGreater(len(plain.content), settings.RESPONSE_COMPRESSION_MIN_SIZE)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/posts', HTTP_ACCEPT_ENCODING='gzip;q=1, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_small_responses(self):
+        response = self.client.get(
+            '/api/notifications/unread',
+            HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=1):
+            response = self.client.get('/api/posts', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_precompress_static(self):
+        with tempfile.TemporaryDirectory() as directory:
+            bundle = os.path.join(directory, 'main.0123abcd.js')
+            content = b'console.log("bundle");\n' * 200
+            with open(bundle, 'wb') as f:
+                f.write(content)
+            with open(os.path.join(directory, 'tiny.css'), 'w') as f:
+                f.write('a{}')
+            call_command('precompress_static', directory, stdout=io.StringIO())
+            with gzip.open(bundle + '.gz') as f:
+                self.assertEqual(f.read(), content)
+            self.assertFalse(os.path.exists(os.path.join(directory, 'tiny.css.gz')))
@@ -0,0 +1,94 @@
+"""
+The coalescing notifications inbox.
+"""
+from api.deletion import purge_object
+from api.models import Member, Notification
+from api.notifications import mark_read, message, notify
+
+from .base import SocialGraphTestCase
+
+
+
+
+class NotificationTests(SocialGraphTestCase):
+    """
+    Events coalesce per post while unread and keep the badge counter exact.
+    """
+
+    def get_inbox(self, **query):
+        self.login(self.viewer)
+        return self.client.get('/api/notifications', query).json()
+
+    def test_likes_coalesce(self):
+        inbox = self.get_inbox()
+        self.assertEqual(inbox['unread_count'], self.posts_per_member)
+        self.assertEqual(len(inbox['results']), self.posts_per_member)
+        first = inbox['results'][0]
+        self.assertEqual(first['actor_count'], self.likers)
+        self.assertEqual(
+            first['message'],
+            f'Friend4 Tester and {self.likers - 1} others liked your post'
+        )
+
+    def test_counter_follows_reads(self):
+        post = self.own_post
+        notify(self.viewer.id, self.others[-1], Notification.KIND_COMMENT, post=post)
+        notify(self.viewer.id, self.viewer, Notification.KIND_COMMENT, post=post)
+        self.viewer.refresh_from_db()
+        self.assertEqual(self.viewer.unread_notifications, self.posts_per_member + 1)
+
+        newest = Notification.objects.filter(recipient=self.viewer).latest('id')
+        self.assertEqual(mark_read(self.viewer, [newest.id, newest.id]), 1)
+        self.assertEqual(mark_read(self.viewer, [newest.id]), 0)
+        # A read group is not reused by later events.
+        notify(self.viewer.id, self.others[0], Notification.KIND_COMMENT, post=post)
+        self.viewer.refresh_from_db()
+        self.assertEqual(self.viewer.unread_notifications, self.posts_per_member + 1)
+
+        mark_read(self.viewer)
+        self.viewer.refresh_from_db()
+        self.assertEqual(self.viewer.unread_notifications, 0)
+        self.assertFalse(
+            Notification.objects.filter(recipient=self.viewer, is_read=False).exists()
+        )
+
+    def test_returning_actor_counts_once(self):
+        first, second = self.others[:2]
+        for actor in (first, second, first):
+            notify(self.viewer.id, actor, Notification.KIND_COMMENT, post=self.own_post)
+        group = Notification.objects.get(
+            recipient=self.viewer,
+            kind=Notification.KIND_COMMENT,
+            is_read=False
+        )
+        self.assertEqual(group.actor_count, 2)
+        self.assertEqual(group.actor, first)
+        self.assertEqual(
+            message(group),
+            'Friend0 Tester and 1 other commented on your post'
+        )
+        self.viewer.refresh_from_db()
+        self.assertEqual(self.viewer.unread_notifications, self.posts_per_member + 1)
+
+    def test_deletions_keep_counter(self):
+        latest_liker = self.others[self.likers - 1]
+        purge_object(Member, latest_liker.id)
+        inbox = self.get_inbox()
+        self.assertEqual(inbox['unread_count'], self.posts_per_member)
+        self.assertTrue(inbox['results'][0]['message'].startswith('Someone and'))
+
+        self.client.delete(f'/api/posts/{self.own_post.id}')
+        self.assertEqual(self.get_inbox()['unread_count'], self.posts_per_member - 1)
+
+    def test_pages(self):
+        seen = []
+        inbox = self.get_inbox(limit=2)
+        while True:
+            seen += [notification['id'] for notification in inbox['results']]
+            if not inbox['next_cursor']:
+                break
+            inbox = self.get_inbox(limit=2, cursor=inbox['next_cursor'])
+        expected = Notification.objects.filter(
+            recipient=self.viewer
+        ).order_by('-updated_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
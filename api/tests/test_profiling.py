@@ -0,0 +1,57 @@
+"""
+On-demand request profiling.
+"""
+from api.models import Post
+
+from .base import PROFILING_TOKEN, APITestCase
+
+
+class ProfilingTests(APITestCase):
+    """
+    Single requests are profiled on demand, only for token holders.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+        Post.objects.create(author=cls.viewer, content='Profiled')
+
+    def profile(self, mode, token=PROFILING_TOKEN):
+        self.login(self.viewer)
+        return self.client.get(
+            '/api/posts',
+            headers={'X-Profile': mode, 'X-Profiling-Token': token}
+        )
+
+    def download(self, profile_id, token=PROFILING_TOKEN):
+        return self.client.get(
+            f'/api/profiling/requests/{profile_id}',
+            headers={'X-Profiling-Token': token}
+        )
+
+    def test_sampled_request_is_downloadable(self):
+        response = self.profile('sample')
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        self.assertTrue(profile_id.endswith('.collapsed'))
+
+        download = self.download(profile_id)
+        self.assertEqual(download.status_code, 200)
+        for line in b''.join(download.streaming_content).decode().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith('PostListCreateView;'), stack)
+            self.assertGreater(int(count), 0)
+
+    def test_cprofile_request(self):
+        response = self.profile('cprofile')
+        self.assertTrue(response['X-Profile-Id'].endswith('.prof'))
+        self.assertEqual(self.download(response['X-Profile-Id']).status_code, 200)
+
+    def test_requires_token(self):
+        response = self.profile('sample', token='wrong')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.download('x.collapsed', token='wrong').status_code, 403)
+
+    def test_rejects_paths_outside_profile_dir(self):
+        self.assertEqual(self.download('..%2Fsecret.collapsed').status_code, 404)
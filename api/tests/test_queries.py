@@ -0,0 +1,305 @@
+"""
+Query-budget and query-plan regression tests.
+
+Every view routed in ``api/urls.py`` declares ``query_budget``, a mapping of
+HTTP method to the most queries one request may run. The tests call each
+endpoint against a seeded data set large enough that a per-row query
+pattern blows the budget, and check that the hot read queries are served by
+indexes rather than full table scans.
+"""
+import re
+import uuid
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern
+from django.utils import timezone
+
+from api import urls
+from api.models import Comment, Friendship, Like, Post
+
+from .base import PNG, PROFILING_TOKEN, SocialGraphTestCase
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)')
+
+
+def is_full_scan(step, limited):
+    """
+    Whether an EXPLAIN QUERY PLAN step reads a whole table. Walking an
+    index in order is fine when a LIMIT stops the walk early, and full-text
+    MATCH scans read only the matching index entries.
+    """
+    if not FULL_SCAN.match(step) or 'CONSTANT ROW' in step:
+        return False
+    if 'VIRTUAL TABLE INDEX' in step:
+        return False
+    return not (limited and 'USING' in step and 'INDEX' in step)
+
+
+def handler_methods(callback):
+    """HTTP methods implemented by a routed view."""
+    view_class = getattr(callback, 'view_class', None)
+    if view_class is None:
+        return list(callback.query_budget)
+    return [
+        method for method in view_class.http_method_names
+        if method not in ('head', 'options') and hasattr(view_class, method)
+    ]
+
+
+def query_budget(callback):
+    view_class = getattr(callback, 'view_class', None)
+    return getattr(view_class or callback, 'query_budget', None)
+
+
+class EndpointTestCase(SocialGraphTestCase):
+    """
+    Calls routed endpoints against the seeded graph, capturing queries.
+    """
+
+    def endpoint_requests(self):
+        """
+        Request to issue per (url name, method): path kwargs, body and
+        expected status.
+        """
+        post_id = self.own_post.id
+        friend_id = self.others[0].id
+        return {
+            ('register', 'post'): {
+                'data': {
+                    'email': 'new@example.com',
+                    'password': 'password123',
+                    'first_name': 'New',
+                    'last_name': 'Member'
+                },
+                'status': 201
+            },
+            ('login', 'post'): {
+                'data': {'email': 'viewer@example.com', 'password': 'password123'}
+            },
+            ('logout', 'post'): {},
+            ('me', 'get'): {},
+            ('member-list', 'get'): {'query': {'search': 'fri'}},
+            ('member-detail', 'get'): {'kwargs': {'id': friend_id}},
+            ('member-detail', 'put'): {
+                'kwargs': {'id': self.viewer.id},
+                'data': {'bio': 'Updated'}
+            },
+            ('member-detail', 'delete'): {
+                'kwargs': {'id': self.viewer.id},
+                'status': 204
+            },
+            ('member-avatar', 'put'): {
+                'kwargs': {'id': self.viewer.id},
+                'body': PNG,
+                'content_type': 'image/png'
+            },
+            ('member-export', 'get'): {
+                'kwargs': {'id': self.viewer.id},
+                'query': {'output': 'zip'}
+            },
+            ('friend-toggle', 'post'): {'kwargs': {'id': friend_id}},
+            ('post-list-create', 'get'): {},
+            ('post-list-create', 'post'): {
+                'data': {'content': 'Hello #world @friend0@example.com'},
+                'status': 201
+            },
+            ('post-trending', 'get'): {},
+            ('post-search', 'get'): {'query': {'q': 'post'}},
+            ('post-detail', 'get'): {'kwargs': {'id': post_id}},
+            ('post-detail', 'delete'): {
+                'kwargs': {'id': post_id},
+                'status': 204
+            },
+            ('post-like', 'post'): {'kwargs': {'id': self.posts[-1].id}},
+            ('comment-list-create', 'get'): {'kwargs': {'id': post_id}},
+            ('comment-list-create', 'post'): {
+                'kwargs': {'id': post_id},
+                'data': {'content': 'Nice #world @friend1@example.com'},
+                'status': 201
+            },
+            ('comment-delete', 'delete'): {
+                'kwargs': {'id': self.own_comment.id},
+                'status': 204
+            },
+            ('hashtag-posts', 'get'): {'kwargs': {'name': 'Tagged'}},
+            ('mention-list', 'get'): {},
+            ('notification-list', 'get'): {},
+            ('notification-unread', 'get'): {},
+            ('notification-read', 'post'): {},
+            # The stream is only served over ASGI.
+            ('feed-events', 'get'): {'status': 501},
+            ('profiling-samples', 'get'): {
+                'headers': {'X-Profiling-Token': PROFILING_TOKEN}
+            },
+            ('profiling-request', 'get'): {
+                'kwargs': {'profile_id': f'{uuid.uuid4()}.collapsed'},
+                'headers': {'X-Profiling-Token': PROFILING_TOKEN},
+                'status': 404
+            },
+        }
+
+    def call(self, pattern, method, spec):
+        """Issue the request described by spec, returning the response."""
+        # Logout and account deletion clear the cookie; log in again.
+        self.login(self.viewer)
+        path = '/api/' + str(pattern.pattern)
+        for name, value in spec.get('kwargs', {}).items():
+            path = re.sub(rf'<\w+:{name}>', str(value), path)
+        request = getattr(self.client, method)
+        headers = spec.get('headers')
+        if 'body' in spec:
+            return request(
+                path,
+                data=spec['body'],
+                content_type=spec['content_type'],
+                headers=headers
+            )
+        if method == 'get':
+            return request(path, spec.get('query', {}), headers=headers)
+        return request(
+            path,
+            spec.get('data', {}),
+            content_type='application/json',
+            headers=headers
+        )
+
+    def run_endpoint(self, pattern, method, spec):
+        """
+        Run one endpoint, rolled back afterwards, and return the response
+        and the captured queries.
+        """
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.call(pattern, method, spec)
+                # Streamed bodies query while they are consumed.
+                if response.streaming:
+                    response.content_bytes = b''.join(response.streaming_content)
+            transaction.set_rollback(True)
+        return response, queries
+
+
+class QueryBudgetTests(EndpointTestCase):
+
+    def test_every_endpoint_declares_a_budget(self):
+        requests = self.endpoint_requests()
+        for pattern in urls.urlpatterns:
+            self.assertIsInstance(pattern, URLPattern)
+            budget = query_budget(pattern.callback)
+            self.assertIsNotNone(budget, f'{pattern.name} has no query_budget')
+            for method in handler_methods(pattern.callback):
+                self.assertIn(method, budget, f'{pattern.name} {method}')
+                self.assertIn((pattern.name, method), requests)
+
+    def test_endpoints_stay_within_budget(self):
+        requests = self.endpoint_requests()
+        for pattern in urls.urlpatterns:
+            budget = query_budget(pattern.callback)
+            for method in handler_methods(pattern.callback):
+                spec = requests[(pattern.name, method)]
+                with self.subTest(endpoint=pattern.name, method=method):
+                    response, queries = self.run_endpoint(pattern, method, spec)
+                    self.assertEqual(
+                        response.status_code,
+                        spec.get('status', 200),
+                        getattr(response, 'content', b'')[:200]
+                    )
+                    self.assertLessEqual(
+                        len(queries),
+                        budget[method],
+                        '\n'.join(query['sql'] for query in queries)
+                    )
+
+
+class QueryPlanTests(EndpointTestCase):
+    """
+    The feed, comments, likes and member search must not scan whole tables.
+    """
+
+    def assert_no_full_scans(self, name, method, spec):
+        pattern = next(p for p in urls.urlpatterns if p.name == name)
+        response, queries = self.run_endpoint(pattern, method, spec)
+        self.assertLess(response.status_code, 400)
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+                scans = [
+                    step for step in plan
+                    if is_full_scan(step, limited=' LIMIT ' in sql)
+                ]
+                self.assertEqual(scans, [], f'{sql}\n{plan}')
+
+    def test_feed(self):
+        self.assert_no_full_scans('post-list-create', 'get', {})
+
+    def test_comments(self):
+        self.assert_no_full_scans(
+            'comment-list-create',
+            'get',
+            {'kwargs': {'id': self.own_post.id}}
+        )
+
+    def test_likes(self):
+        self.assert_no_full_scans(
+            'post-like',
+            'post',
+            {'kwargs': {'id': self.posts[-1].id}}
+        )
+
+    def test_member_search(self):
+        self.assert_no_full_scans(
+            'member-list',
+            'get',
+            {'query': {'search': 'riend'}}
+        )
+
+    def test_notifications(self):
+        self.assert_no_full_scans('notification-list', 'get', {})
+
+    def test_search(self):
+        self.assert_no_full_scans('post-search', 'get', {'query': {'q': 'post'}})
+
+    def test_hashtag_timeline(self):
+        self.assert_no_full_scans('hashtag-posts', 'get', {'kwargs': {'name': 'news'}})
+
+    def test_mentions(self):
+        self.assert_no_full_scans('mention-list', 'get', {})
+
+    def test_comment_subtree(self):
+        self.assert_no_full_scans(
+            'comment-list-create',
+            'get',
+            {
+                'kwargs': {'id': self.own_post.id},
+                'query': {'parent': self.own_comment.id, 'limit': 2}
+            }
+        )
+
+    def test_lookups_read_index_order(self):
+        """
+        Lookups asking for no order, or for their index's order, get no
+        sort step (the models declare no default ordering).
+        """
+        querysets = [
+            Like.objects.filter(post=self.own_post).values_list('member_id', flat=True),
+            Friendship.objects.filter(friend=self.viewer).values_list(
+                'member_id', flat=True
+            ),
+            Comment.objects.filter(post=self.own_post).values('id'),
+            Post.objects.filter(created_at__lt=timezone.now()).order_by(
+                'created_at', 'id'
+            ).values_list('id', flat=True)[:10],
+            Post.objects.filter(author=self.viewer).order_by('created_at', 'id'),
+        ]
+        with connection.cursor() as cursor:
+            for queryset in querysets:
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+                self.assertTrue(all('INDEX' in step for step in plan), f'{sql}\n{plan}')
+                self.assertFalse(any('TEMP B-TREE' in step for step in plan), f'{sql}\n{plan}')
+
@@ -0,0 +1,93 @@
+"""
+Routing reads to replicas.
+"""
+from django.core.cache import caches
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api import routers, singleflight
+from api.authentication import CookieAuthentication, IsAuthenticatedMember, session_token
+from api.models import Post
+from api.routers import (
+    PrimaryPinningMiddleware,
+    ReplicaReadMixin,
+    is_pinned,
+    pin_to_primary,
+    read_counts
+)
+from api.serializers import MemberSerializer
+
+from .base import APITestCase
+
+
+class ProbeView(ReplicaReadMixin, APIView):
+    """Reports where its reads are routed."""
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+
+    def get(self, request):
+        return Response({'alias': router.db_for_read(Post)})
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(APITestCase):
+    """
+    Reads of replica-safe handlers go to a replica unless the member wrote
+    recently, as seen by every worker.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+        cls.other = cls.create_member('other')
+
+    def setUp(self):
+        super().setUp()
+        routers._cycle = None
+        self.addCleanup(setattr, routers, '_cycle', None)
+        routers.usage.clear()
+        routers._next_flush = 0.0
+
+    def read_alias(self, member):
+        request = RequestFactory().get('/probe')
+        request.COOKIES['session_id'] = session_token(member)
+        return ProbeView.as_view()(request).data['alias']
+
+    def test_pins_after_write(self):
+        self.assertEqual(self.read_alias(self.viewer), 'replica1')
+
+        request = RequestFactory().post('/api/posts')
+        request.user = self.viewer
+        PrimaryPinningMiddleware(lambda request: HttpResponse(status=201))(request)
+        self.assertEqual(self.read_alias(self.viewer), 'default')
+        self.assertEqual(self.read_alias(self.other), 'replica1')
+        # The pin lives in the shared cache, not in this worker.
+        self.assertTrue(
+            caches['shared'].get(f'replica:pin:{self.viewer.id}')
+        )
+
+    def test_rejected_write_does_not_pin(self):
+        request = RequestFactory().post('/api/posts')
+        request.user = self.viewer
+        PrimaryPinningMiddleware(lambda request: HttpResponse(status=400))(request)
+        self.assertFalse(is_pinned(self.viewer.id))
+
+    @override_settings(REPLICA_USAGE_FLUSH_SECONDS=0)
+    def test_read_counts(self):
+        self.read_alias(self.viewer)
+        self.read_alias(self.other)
+        pin_to_primary(self.viewer.id)
+        self.read_alias(self.viewer)
+        self.assertEqual(read_counts(), {'default': 1, 'replica1': 2})
+
+    def test_pinned_member_skips_cache(self):
+        # A replica still behind the member's write refilled the entry.
+        stale = {**MemberSerializer(self.viewer).data, 'bio': 'Before'}
+        singleflight.cached_compute(f'member:{self.viewer.id}', lambda: stale)
+        pin_to_primary(self.viewer.id)
+        self.login(self.viewer)
+        response = self.client.get(f'/api/members/{self.viewer.id}')
+        self.assertEqual(response.json()['bio'], '')
@@ -0,0 +1,111 @@
+"""
+Full-text post search and member search.
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from api.deletion import soft_delete_post
+from api.models import Post
+from api.pagination import encode_cursor
+
+from .base import APITestCase, SocialGraphTestCase
+
+
+class SearchTests(SocialGraphTestCase):
+    """
+    Search finds own and friends' live posts through the FTS5 index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        stranger = cls.create_member('stranger')
+        cls.stranger_post = Post.objects.create(author=stranger, content='Zebra crossing')
+        cls.friend_post = Post.objects.create(author=cls.others[0], content='A zebra!')
+        cls.own_zebra = Post.objects.create(author=cls.viewer, content='Zebras, zebras')
+
+    def search(self, **query):
+        self.login(self.viewer)
+        response = self.client.get('/api/posts/search', query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def found(self, text):
+        return {post['id'] for post in self.search(q=text)['results']}
+
+    def test_visibility(self):
+        self.assertEqual(self.found('zebra'), {self.friend_post.id})
+        self.assertEqual(self.found('zeb*'), {self.friend_post.id, self.own_zebra.id})
+        soft_delete_post(self.friend_post)
+        self.assertEqual(self.found('zeb*'), {self.own_zebra.id})
+
+    def test_index_follows_edits(self):
+        Post.objects.filter(id=self.friend_post.id).update(content='Giraffe')
+        self.assertEqual(self.found('giraffe'), {self.friend_post.id})
+        self.assertEqual(self.found('zebra crossing'), set())
+        Post.all_objects.filter(id=self.own_zebra.id).delete()
+        self.assertEqual(self.found('zeb*'), set())
+
+    def test_pages_and_syntax(self):
+        seen = []
+        page = self.search(q='post', limit=4)
+        while True:
+            seen += [post['id'] for post in page['results']]
+            if not page['next_cursor']:
+                break
+            page = self.search(q='post', limit=4, cursor=page['next_cursor'])
+        visible = Post.objects.filter(
+            Q(author=self.viewer) | Q(author__in=self.others)
+        ).exclude(content__icontains='zebra')
+        self.assertCountEqual(seen, visible.values_list('id', flat=True))
+        self.assertEqual(self.found('zebra" OR NEAR( *'), set())
+
+    def test_crafted_cursor(self):
+        self.login(self.viewer)
+        for rank, post_id in [(1.0, 2 ** 64), (float('nan'), 1), (float('inf'), 1)]:
+            response = self.client.get(
+                '/api/posts/search',
+                {'q': 'post', 'cursor': encode_cursor(rank, post_id)}
+            )
+            self.assertEqual(response.status_code, 400)
+        for cursor in ('nope', encode_cursor(timezone.now(), 2 ** 63)):
+            response = self.client.get('/api/posts', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+
+
+class MemberSearchTests(APITestCase):
+    """
+    Member search matches a substring of a name or email, ignoring case.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+        cls.smith = cls.create_member('ann', last_name='Goldsmith')
+        cls.others = [cls.create_member(f'friend{i}') for i in range(6)]
+
+    def search(self, text):
+        self.login(self.viewer)
+        response = self.client.get('/api/members', {'search': text})
+        return {member['email'] for member in response.json()}
+
+    def test_substrings(self):
+        self.assertEqual(self.search('SMITH'), {'ann@example.com'})
+        self.assertEqual(self.search('ann'), {'ann@example.com'})
+        self.assertEqual(len(self.search('example.com')), 8)
+        self.assertEqual(self.search('friend3@'), {'friend3@example.com'})
+        # Short texts, too short for the trigram index, still match.
+        self.assertEqual(self.search('d5'), {'friend5@example.com'})
+
+    def test_whole_text(self):
+        self.assertEqual(self.search('ann goldsmith'), set())
+        self.assertEqual(self.search('"'), set())
+        self.assertEqual(len(self.search('')), 8)
+
+    def test_index_follows_changes(self):
+        friend = self.others[0]
+        friend.first_name = 'Zelda'
+        friend.save()
+        self.assertEqual(self.search('zeld'), {'friend0@example.com'})
+        friend.delete()
+        self.assertEqual(self.search('zeld'), set())
@@ -0,0 +1,176 @@
+"""
+Sharding posts and their activity by author.
+"""
+import io
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import override_settings
+
+from api.deletion import purge_object
+from api.models import Comment, Friendship, Like, Member, Post
+from api.sharding import (
+    add_shard_database,
+    remove_shard_database,
+    reserve_id_ranges,
+    shard_for_member
+)
+
+from .base import SocialGraphTestCase
+
+SHARD_ALIAS = 'shard1'
+
+
+@override_settings(DATABASE_SHARDS=['default', SHARD_ALIAS])
+class ShardingTests(SocialGraphTestCase):
+    """
+    Posts live on their author's shard: rebalancing moves the seeded posts
+    there, and the API reads, merges and writes them across shards.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # The second shard exists for these tests only, in memory; the test
+        # runner never sees it, so it is migrated here.
+        add_shard_database(SHARD_ALIAS, ':memory:')
+        cls.databases = {'default', SHARD_ALIAS}
+        cls.addClassCleanup(remove_shard_database, SHARD_ALIAS)
+        with override_settings(DATABASE_SHARDS=['default', SHARD_ALIAS]):
+            call_command('migrate', database=SHARD_ALIAS, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        reserve_id_ranges(using=SHARD_ALIAS)
+        super().setUpTestData()
+        call_command('rebalance_shards', batch_size=4, stdout=io.StringIO())
+        cls.moved = [
+            post for post in cls.posts
+            if shard_for_member(post.author_id) == SHARD_ALIAS
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.viewer)
+
+    def login_on(self, shard):
+        member = next(
+            member for member in [self.viewer, *self.others]
+            if shard_for_member(member.id) == shard
+        )
+        self.login(member)
+        return member
+
+    def create_post(self, content):
+        response = self.client.post(
+            '/api/posts',
+            {'content': content},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def test_rebalance(self):
+        moved_ids = [post.id for post in self.moved]
+        self.assertTrue(moved_ids)
+        self.assertFalse(Post.objects.filter(id__in=moved_ids).exists())
+        self.assertFalse(Comment.objects.filter(post_id__in=moved_ids).exists())
+        self.assertEqual(
+            Like.objects.using(SHARD_ALIAS).filter(post_id__in=moved_ids).count(),
+            len(moved_ids) * self.likers
+        )
+        self.assertEqual(
+            Post.objects.count() + Post.objects.using(SHARD_ALIAS).count(),
+            len(self.posts)
+        )
+        output = io.StringIO()
+        call_command('rebalance_shards', stdout=output)
+        self.assertIn('Moved 0 posts.', output.getvalue())
+
+    def test_feed_merges_shards(self):
+        expected = [
+            post.id for post in sorted(
+                [*Post.objects.all(), *Post.objects.using(SHARD_ALIAS)],
+                key=lambda post: (post.created_at, post.id),
+                reverse=True
+            )
+        ]
+        response = self.client.get('/api/posts')
+        self.assertEqual([post['id'] for post in response.json()], expected)
+        self.assertEqual(
+            {post['likes_count'] for post in response.json()},
+            {self.likers}
+        )
+
+        ids = []
+        url, query = '/api/posts', {'limit': 4}
+        while url:
+            response = self.client.get(url, query)
+            ids += [post['id'] for post in response.json()]
+            link = response.get('Link')
+            url, query = link and link[1:link.index('>')], None
+        self.assertEqual(ids, expected)
+
+    def test_writes_on_author_shard(self):
+        self.login_on(SHARD_ALIAS)
+        post_id = self.create_post('Sharded #shards')
+        self.assertGreaterEqual(post_id, settings.DATABASE_SHARD_ID_SPAN)
+        self.assertTrue(Post.objects.using(SHARD_ALIAS).filter(id=post_id).exists())
+
+        response = self.client.post(f'/api/posts/{post_id}/like')
+        self.assertEqual(response.json()['likes_count'], 1)
+        first = self.client.post(
+            f'/api/posts/{post_id}/comments',
+            {'content': 'Hi #shards'},
+            content_type='application/json'
+        ).json()['id']
+        response = self.client.post(
+            f'/api/posts/{post_id}/comments',
+            {'content': 'Reply', 'parent': first},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+        post = self.client.get(f'/api/posts/{post_id}').json()
+        self.assertEqual(
+            (post['likes_count'], post['comments_count'], post['is_liked']),
+            (1, 2, True)
+        )
+        comments = self.client.get(f'/api/posts/{post_id}/comments').json()
+        self.assertEqual([comment['parent'] for comment in comments], [None, first])
+
+        # Timelines and search merge both shards, newest first.
+        self.login_on('default')
+        other_id = self.create_post('Primary #shards')
+        self.login(self.viewer)
+        timeline = self.client.get('/api/hashtags/shards/posts').json()['results']
+        self.assertEqual(
+            [(entry['post']['id'], entry['comment_id']) for entry in timeline],
+            [(other_id, None), (post_id, first), (post_id, None)]
+        )
+        results = self.client.get('/api/posts/search', {'q': 'shards'}).json()['results']
+        self.assertEqual({post['id'] for post in results}, {post_id, other_id})
+
+    def test_purges_on_shards(self):
+        post = self.moved[0]
+        self.login(post.author)
+        self.assertEqual(self.client.delete(f'/api/posts/{post.id}').status_code, 204)
+        call_command('purge_deleted', stdout=io.StringIO())
+        self.assertFalse(Post.all_objects.using(SHARD_ALIAS).filter(id=post.id).exists())
+        self.assertFalse(Like.objects.using(SHARD_ALIAS).filter(post_id=post.id).exists())
+
+        liker = self.others[0]
+        purge_object(Member, liker.id)
+        for alias in ('default', SHARD_ALIAS):
+            self.assertFalse(Like.objects.using(alias).filter(member=liker).exists())
+            self.assertFalse(Comment.objects.using(alias).filter(author=liker).exists())
+
+    def test_primary_enforces_foreign_keys(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Friendship.objects.create(member=self.viewer, friend_id=10 ** 9)
+            connection.check_constraints()
+        # Rows on the other shard reference members on the primary.
+        with connections[SHARD_ALIAS].cursor() as cursor:
+            cursor.execute('PRAGMA foreign_keys')
+            self.assertEqual(cursor.fetchone()[0], 0)
@@ -0,0 +1,67 @@
+"""
+Single-flight caching of hot reads.
+"""
+from django.test import override_settings
+
+from api import singleflight
+from api.models import Friendship, Member, Post
+
+from .base import APITestCase
+
+
+class SingleFlightTests(APITestCase):
+    """
+    Cached reads are served until a write invalidates them, even one made
+    while they were computed, and a worker only releases the refresh lock
+    it holds.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+        cls.friend = cls.create_member('friend')
+        Friendship.objects.create(member=cls.viewer, friend=cls.friend)
+        Friendship.objects.create(member=cls.friend, friend=cls.viewer)
+        cls.post = Post.objects.create(author=cls.friend, content='Cached')
+
+    def test_keeps_other_workers_lock(self):
+        cache = singleflight.get_cache()
+        cache.add('sf:lock:answer', 'other', timeout=60)
+        with override_settings(SINGLEFLIGHT_LOCK_TIMEOUT=0.05):
+            self.assertEqual(singleflight.cached_compute('answer', lambda: 42), 42)
+        self.assertEqual(cache.get('sf:lock:answer'), 'other')
+
+        cache.delete('sf:lock:answer')
+        self.assertEqual(singleflight.cached_compute('other', lambda: 1), 1)
+        self.assertIsNone(cache.get('sf:lock:other'))
+
+    def test_invalidate(self):
+        self.login(self.viewer)
+        url = f'/api/members/{self.friend.id}'
+        self.assertEqual(self.client.get(url).json()['bio'], '')
+        Member.objects.filter(id=self.friend.id).update(bio='Changed')
+        self.assertEqual(self.client.get(url).json()['bio'], '')
+        singleflight.invalidate(f'member:{self.friend.id}')
+        self.assertEqual(self.client.get(url).json()['bio'], 'Changed')
+
+    def test_write_during_compute(self):
+        def compute():
+            # A write lands while the old value is being computed.
+            singleflight.invalidate('answer')
+            return 'stale'
+
+        self.assertEqual(singleflight.cached_compute('answer', compute), 'stale')
+        self.assertEqual(singleflight.cached_compute('answer', lambda: 'fresh'), 'fresh')
+        self.assertEqual(singleflight.cached_compute('answer', lambda: 'later'), 'fresh')
+
+    def test_post_follows_author_profile(self):
+        self.login(self.friend)
+        url = f'/api/posts/{self.post.id}'
+        self.assertEqual(self.client.get(url).json()['author']['first_name'], 'Friend')
+        response = self.client.put(
+            f'/api/members/{self.friend.id}',
+            {'first_name': 'Renamed'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).json()['author']['first_name'], 'Renamed')
@@ -0,0 +1,64 @@
+"""
+Hashtag and mention indexes.
+"""
+import io
+
+from django.core.management import call_command
+
+from api.models import Comment, HashtagUse, Mention, Post
+
+from .base import SocialGraphTestCase
+
+
+class TagTests(SocialGraphTestCase):
+    """
+    Hashtags and mentions are indexed on write and by the backfill.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.viewer)
+
+    def timeline(self, name):
+        response = self.client.get(f'/api/hashtags/{name}/posts')
+        self.assertEqual(response.status_code, 200)
+        return [
+            (entry['post']['id'], entry['comment_id'])
+            for entry in response.json()['results']
+        ]
+
+    def test_write_paths(self):
+        post_id = self.client.post(
+            '/api/posts',
+            {'content': 'Big #News, #news & @friend0@example.com @nobody@example.com'},
+            content_type='application/json'
+        ).json()['id']
+        comment_id = self.client.post(
+            f'/api/posts/{self.posts[-1].id}/comments',
+            {'content': 'Also #NEWS'},
+            content_type='application/json'
+        ).json()['id']
+        self.assertEqual(self.timeline('news'), [(self.posts[-1].id, comment_id), (post_id, None)])
+        self.assertEqual(
+            list(Mention.objects.values_list('member_id', 'post_id')),
+            [(self.others[0].id, post_id)]
+        )
+
+        self.client.delete(f'/api/comments/{comment_id}')
+        self.assertEqual(self.timeline('news'), [(post_id, None)])
+
+        stranger = self.create_member('stranger')
+        Post.objects.create(author=stranger, content='#news')
+        call_command('backfill_tags', only='posts', stdout=io.StringIO())
+        self.assertEqual(self.timeline('news'), [(post_id, None)])
+
+    def test_backfill(self):
+        for post in self.posts[:5]:
+            Post.objects.filter(id=post.id).update(content='#old post @viewer@example.com')
+        Comment.objects.filter(id=self.own_comment.id).update(content='#old too')
+        call_command('backfill_tags', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(len(self.timeline('old')), 6)
+        self.assertEqual(Mention.objects.filter(member=self.viewer).count(), 5)
+        # Idempotent: a rerun finds every row indexed already.
+        call_command('backfill_tags', stdout=io.StringIO())
+        self.assertEqual(HashtagUse.objects.count(), 6)
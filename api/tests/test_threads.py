@@ -0,0 +1,100 @@
+"""
+Threaded comments.
+"""
+from api.models import Comment, HashtagUse
+
+from .base import SocialGraphTestCase
+
+
+class ThreadTests(SocialGraphTestCase):
+    """
+    Replies are listed depth-first under their parent and page by path.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.viewer)
+        self.url = f'/api/posts/{self.own_post.id}/comments'
+
+    def reply(self, parent, content):
+        response = self.client.post(
+            self.url,
+            {'content': content, 'parent': parent},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def contents(self, **query):
+        response = self.client.get(self.url, query)
+        self.assertEqual(response.status_code, 200)
+        return [comment['content'] for comment in response.json()]
+
+    def test_display_order(self):
+        root = self.own_comment.id
+        top_level = self.contents()
+        first = self.reply(root, 'First')
+        self.reply(root, 'Second')
+        self.reply(first, 'Nested')
+        self.assertEqual(top_level[-1], 'Mine')
+        self.assertEqual(
+            self.contents(),
+            top_level + ['First', 'Nested', 'Second']
+        )
+        self.assertEqual(self.contents(parent=root), ['First', 'Nested', 'Second'])
+        self.assertEqual(self.contents(parent=root, depth=1), ['First', 'Second'])
+
+        comments = self.client.get(self.url, {'parent': first}).json()
+        self.assertEqual(
+            [(c['parent'], c['depth']) for c in comments],
+            [(first, 2)]
+        )
+        self.assertEqual(Comment.objects.get(id=root).reply_count, 2)
+
+    def test_paging(self):
+        for i in range(5):
+            self.reply(self.own_comment.id, f'Reply {i}')
+        url, query, seen = self.url, {'parent': self.own_comment.id, 'limit': 2}, []
+        while url:
+            response = self.client.get(url, query)
+            seen += [comment['content'] for comment in response.json()]
+            link = response.get('Link')
+            url = link and link[1:link.index('>')]
+            query = None
+        self.assertEqual(seen, [f'Reply {i}' for i in range(5)])
+
+        response = self.client.get(self.url, {'cursor': 'bogus', 'limit': 2})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_parent(self):
+        other = Comment.objects.filter(post=self.posts[-1]).first()
+        response = self.client.post(
+            self.url,
+            {'content': 'Hi', 'parent': other.id},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'parent': other.id})
+        self.assertEqual(response.status_code, 404)
+
+        parent = self.own_comment.id
+        with self.settings(COMMENT_MAX_DEPTH=3):
+            for _ in range(2):
+                parent = self.reply(parent, 'Deeper')
+            response = self.client.post(
+                self.url,
+                {'content': 'Too deep', 'parent': parent},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_subtree(self):
+        root = self.own_comment.id
+        first = self.reply(root, 'First #thread')
+        self.reply(first, 'Nested #thread')
+        self.reply(root, 'Second')
+        response = self.client.delete(f'/api/comments/{first}')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.contents(parent=root), ['Second'])
+        self.assertEqual(Comment.objects.get(id=root).reply_count, 1)
+        self.assertFalse(HashtagUse.objects.exists())
@@ -0,0 +1,73 @@
+"""
+Stored trending scores.
+"""
+import math
+
+from api.models import Comment, Like, Post, PostScore
+from api.trending import COMMENT_WEIGHT, LIKE_WEIGHT, event_log_weight
+
+from .base import APITestCase
+
+
+class TrendingTests(APITestCase):
+    """
+    Likes and comments add up in the post's stored score; unliking takes
+    the like's term back out.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = cls.create_member('viewer')
+        cls.liker = cls.create_member('liker')
+        cls.post = Post.objects.create(author=cls.viewer, content='Trending')
+        cls.other_post = Post.objects.create(author=cls.liker, content='Quiet')
+
+    def like(self, member, post):
+        self.login(member)
+        response = self.client.post(f'/api/posts/{post.id}/like')
+        self.assertEqual(response.status_code, 200)
+
+    def score(self, post):
+        scores = PostScore.objects.filter(post=post)
+        return scores.values_list('score', flat=True).first()
+
+    def test_scores_add_up(self):
+        post = self.post
+        self.like(self.liker, post)
+        self.like(self.viewer, post)
+        self.client.post(
+            f'/api/posts/{post.id}/comments',
+            {'content': 'Nice'},
+            content_type='application/json'
+        )
+        terms = [
+            event_log_weight(LIKE_WEIGHT, like.created_at.timestamp())
+            for like in Like.objects.filter(post=post)
+        ]
+        comment = Comment.objects.get(post=post)
+        terms.append(event_log_weight(COMMENT_WEIGHT, comment.created_at.timestamp()))
+        high = max(terms)
+        expected = high + math.log2(sum(2 ** (term - high) for term in terms))
+        self.assertAlmostEqual(self.score(post), expected, places=3)
+
+        self.like(self.viewer, self.other_post)
+        trending = self.client.get('/api/posts/trending').json()
+        self.assertEqual(
+            [entry['id'] for entry in trending],
+            [post.id, self.other_post.id]
+        )
+
+    def test_toggling_does_not_pump(self):
+        post = self.post
+        self.like(self.liker, post)
+        for _ in range(3):
+            self.like(self.liker, post)
+            self.like(self.liker, post)
+        like = Like.objects.get(member=self.liker, post=post)
+        self.assertAlmostEqual(
+            self.score(post),
+            event_log_weight(LIKE_WEIGHT, like.created_at.timestamp()),
+            places=6
+        )
+        self.like(self.liker, post)
+        self.assertIsNone(self.score(post))
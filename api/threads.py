@@ -0,0 +1,110 @@
+"""
+Threaded comments.
+
+Each comment stores its materialized path (``Comment.path``): the ids of
+its ancestors and itself as fixed-width hex segments. With the
+``(post, path)`` index,
+
+* a post's comments ordered by path are its threads depth-first, each
+  reply right after its parent, in one range scan;
+* a subtree is the range ``root.path < path < root.path + '~'`` ("~"
+  sorts after every hex digit), so it loads, pages and deletes without
+  recursive queries;
+* pages continue after the path of their last comment.
+
+A comment's path needs its id, so it is written right after the insert,
+in the same transaction, which also counts the reply on its parent.
+Comments are stored with their post, on its shard (see api.sharding).
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Length
+
+from .models import Comment
+from .pagination import decode_cursor, encode_cursor
+from .sharding import live_members, shard_of, using, with_authors
+from .tags import forget_comments
+
+PATH = re.compile(r'^(?:[0-9a-f]{%d})+$' % Comment.SEGMENT_LENGTH)
+# Sorts after every hex digit: the exclusive end of a subtree's range.
+SUBTREE_END = '~'
+
+
+def subtree(queryset, root):
+    """Restrict comments to the descendants of root."""
+    return queryset.filter(path__gt=root.path, path__lt=root.path + SUBTREE_END)
+
+
+def create_comment(parent=None, alias=None, **fields):
+    """
+    Create a comment, as a reply to parent if given, on shard alias, and
+    set its path.
+    """
+    comments = using(Comment.objects, alias)
+    with transaction.atomic(using=alias):
+        comment = comments.create(parent=parent, **fields)
+        comment.path = (parent.path if parent else '') + Comment.segment(comment.id)
+        comments.filter(id=comment.id).update(path=comment.path)
+        if parent is not None:
+            comments.filter(id=parent.id).update(
+                reply_count=F('reply_count') + 1
+            )
+    return comment
+
+
+def can_reply_to(parent):
+    return parent.depth + 1 < settings.COMMENT_MAX_DEPTH
+
+
+def delete_thread(comment):
+    """Delete comment with all its replies; return how many were deleted."""
+    alias = shard_of(comment)
+    comments = using(Comment.objects, alias)
+    with transaction.atomic(using=alias):
+        replies = subtree(comments.filter(post_id=comment.post_id), comment)
+        ids = [comment.id, *replies.values_list('id', flat=True)]
+        forget_comments(ids, alias)
+        comments.filter(id__in=ids).delete()
+        if comment.parent_id is not None:
+            comments.filter(id=comment.parent_id).update(
+                reply_count=Greatest(F('reply_count') - 1, 0)
+            )
+    return len(ids)
+
+
+def thread_page(post, root=None, depth=None, limit=None, cursor=None, model=Comment):
+    """
+    Return (comments, next_cursor): the post's comments, or root's
+    replies, in display order. depth limits how many levels below the post
+    (or root) are included; limit and cursor page through the result.
+    model is ArchivedComment for an archived post.
+    """
+    comments = using(model.objects, shard_of(post)).filter(
+        *live_members('author'),
+        post_id=post.id
+    )
+    comments = with_authors(comments)
+    if root is not None:
+        comments = subtree(comments, root)
+    if depth is not None:
+        levels = depth + (root.depth + 1 if root is not None else 0)
+        comments = comments.annotate(path_length=Length('path')).filter(
+            path_length__lte=levels * model.SEGMENT_LENGTH
+        )
+    if cursor:
+        (after,) = decode_cursor(cursor, str)
+        if not PATH.match(after):
+            raise ValueError('Invalid cursor')
+        comments = comments.filter(path__gt=after)
+    comments = comments.order_by('path')
+
+    if limit is None:
+        return list(comments), None
+    page = list(comments[:limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        next_cursor = encode_cursor(page[limit - 1].path)
+    return page[:limit], next_cursor
@@ -0,0 +1,202 @@
+"""
+Rate limiting for write and authentication endpoints.
+
+Throttles plug into DRF's ``throttle_classes`` and delegate bookkeeping to
+the store selected by ``THROTTLE_STORE``:
+
+* ``CacheWindowStore`` (the default) keeps a sliding-window counter in the
+  shared Django cache so every worker sees the same budget.
+* ``LocalBucketStore`` keeps a token bucket per client in process memory,
+  so each worker allows the full rate.
+
+Anonymous clients are keyed on their address as DRF's ``get_ident`` finds
+it: the X-Forwarded-For entry added by the ``NUM_PROXIES`` trusted proxies.
+
+Both stores do a constant amount of work per check. Rejected requests are
+logged and counted per scope in the THROTTLE_CACHE_ALIAS cache
+(``rejection_counts``, shown by ``manage.py throttle_status``).
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+
+def parse_rate(rate):
+    """Parse a DRF style rate such as '10/min' into (requests, seconds)."""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class LocalBucketStore:
+    """
+    In-process token buckets, bounded to THROTTLE_MAX_KEYS entries (LRU).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self.max_keys = settings.THROTTLE_MAX_KEYS
+
+    def consume(self, key, capacity, period):
+        """
+        Take one token from the bucket for key.
+
+        Returns 0 when the request is allowed, otherwise the number of
+        seconds until a token becomes available.
+        """
+        refill_rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / refill_rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class CacheWindowStore:
+    """
+    Sliding-window counters in a shared cache for multi-worker deployments.
+
+    The count of the previous fixed window is weighted by how much of it
+    still overlaps the sliding window, which needs one atomic increment and
+    one read per check.
+    """
+
+    def __init__(self):
+        self.cache = caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def consume(self, key, capacity, period):
+        """Count one request for key, see LocalBucketStore.consume."""
+        now = time.time()
+        window = int(now // period)
+        elapsed = now - window * period
+        current_key = f'{key}:{window}'
+        self.cache.add(current_key, 0, timeout=period * 2)
+        current = self.cache.incr(current_key)
+        previous = self.cache.get(f'{key}:{window - 1}', 0)
+        estimate = previous * (period - elapsed) / period + current
+        if estimate <= capacity:
+            return 0
+        # Rejected requests do not use up the budget.
+        self.cache.decr(current_key)
+        return period - elapsed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _rejections_key(scope):
+    return f'throttle:rejections:{scope}'
+
+
+def record_rejection(scope):
+    """Count a request rejected by the throttle of scope."""
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
+    cache.add(_rejections_key(scope), 0, timeout=None)
+    cache.incr(_rejections_key(scope))
+
+
+def rejection_counts():
+    """Requests rejected per scope, by every worker sharing the cache."""
+    totals = caches[settings.THROTTLE_CACHE_ALIAS].get_many(
+        [_rejections_key(scope) for scope in settings.THROTTLE_RATES]
+    )
+    return {
+        scope: totals.get(_rejections_key(scope), 0)
+        for scope in settings.THROTTLE_RATES
+    }
+
+
+def get_store():
+    """Return the process-wide store configured by THROTTLE_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(settings.THROTTLE_STORE)()
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle keyed by member id when authenticated, client IP otherwise.
+
+    Subclasses set ``scope`` to a key of ``THROTTLE_RATES`` and may limit
+    the throttle to some HTTP methods via ``methods``.
+    """
+    scope = None
+    methods = None
+
+    def __init__(self):
+        rate = settings.THROTTLE_RATES.get(self.scope)
+        if rate is None:
+            raise ImproperlyConfigured(
+                f'No throttle rate set for scope {self.scope!r}'
+            )
+        self.capacity, self.period = parse_rate(rate)
+        self.wait_time = 0
+
+    def get_cache_key(self, request):
+        """Identify the client the budget belongs to."""
+        user = getattr(request, 'user', None)
+        if user is not None and getattr(user, 'is_authenticated', False):
+            return f'throttle:{self.scope}:member:{user.id}'
+        return f'throttle:{self.scope}:ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        """Consume one token, recording the rejection when none is left."""
+        if self.methods is not None and request.method not in self.methods:
+            return True
+        key = self.get_cache_key(request)
+        self.wait_time = get_store().consume(key, self.capacity, self.period)
+        if self.wait_time:
+            record_rejection(self.scope)
+            logger.warning(
+                'Throttled %s request to %s (%s)',
+                self.scope,
+                request.path,
+                key
+            )
+            return False
+        return True
+
+    def wait(self):
+        """Seconds the client should wait, sent as Retry-After."""
+        return self.wait_time
+
+
+class LoginRateThrottle(TokenBucketThrottle):
+    scope = 'login'
+
+
+class RegisterRateThrottle(TokenBucketThrottle):
+    scope = 'register'
+
+
+class LikeRateThrottle(TokenBucketThrottle):
+    scope = 'like'
+
+
+class CommentRateThrottle(TokenBucketThrottle):
+    scope = 'comment'
+    methods = ('POST',)
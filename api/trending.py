@@ -0,0 +1,113 @@
+"""
+Trending posts leaderboard.
+
+A post's trending score is an exponentially time-decayed sum of its
+activity. Instead of decaying every score as time passes, each event adds
+``weight * 2 ** (t / half_life)``; relative order is then stable over time
+and an event only touches the score of its own post. Scores are kept as
+base-2 logarithms so the growing exponent never overflows a float.
+
+Each event updates its post's ``PostScore`` row in place with one atomic
+statement, SQLite computing the log-space sum, so concurrent events from
+every worker count. Removing a like subtracts the term its like added, so
+liking and unliking again does not pump a post up the board. The top
+``TRENDING_SIZE`` rows are read through the score index and cached for
+``TRENDING_BOARD_TTL`` seconds (api.singleflight), so the leaderboard is
+served in O(k).
+"""
+import math
+import time
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import F, Value
+from django.db.models.functions import Log, Power
+from django.utils import timezone
+
+from .models import PostScore
+from .singleflight import cached_compute, invalidate
+
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+BOARD_KEY = 'trending'
+
+# Scores within this of the term being removed had nothing else left.
+EPSILON = 1e-9
+
+
+def event_log_weight(weight, when=None):
+    """Log2 of an event's weight scaled to its time."""
+    when = time.time() if when is None else when
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return math.log2(weight) + when / half_life
+
+
+def current_score(log_score, now=None):
+    """Convert a stored log score into today's decayed score."""
+    now = time.time() if now is None else now
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return 2 ** (log_score - now / half_life)
+
+
+def record_activity(post_id, weight, when=None):
+    """Add one weighted event (when: epoch seconds) to a post's score."""
+    connection = connections[router.db_for_write(PostScore)]
+    # log2(2 ** score + 2 ** term), factored so nothing overflows.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO post_scores (post_id, score, updated_at) '
+            'VALUES (%s, %s, %s) ON CONFLICT (post_id) DO UPDATE SET '
+            'score = MAX(score, excluded.score) + LOG(2, 1 + POWER(2, '
+            'MIN(score, excluded.score) - MAX(score, excluded.score))), '
+            'updated_at = excluded.updated_at',
+            [
+                post_id,
+                event_log_weight(weight, when),
+                connection.ops.adapt_datetimefield_value(timezone.now())
+            ]
+        )
+
+
+def remove_activity(post_id, weight, when):
+    """Subtract an event recorded by record_activity from a post's score."""
+    term = event_log_weight(weight, when)
+    scores = PostScore.objects.filter(post_id=post_id)
+    updated = scores.filter(score__gt=term + EPSILON).update(
+        score=F('score') + Log(2, 1 - Power(2, Value(term) - F('score'))),
+        updated_at=timezone.now()
+    )
+    if not updated:
+        scores.filter(score__lte=term + EPSILON).delete()
+
+
+def record_like(post_id, created_at):
+    return record_activity(post_id, LIKE_WEIGHT, created_at.timestamp())
+
+
+def remove_like(post_id, created_at):
+    return remove_activity(post_id, LIKE_WEIGHT, created_at.timestamp())
+
+
+def record_comment(post_id):
+    return record_activity(post_id, COMMENT_WEIGHT)
+
+
+def forget_post(post_id):
+    """Drop a deleted post from the board."""
+    PostScore.objects.filter(post_id=post_id).delete()
+    invalidate(BOARD_KEY)
+
+
+def load_board():
+    return list(
+        PostScore.objects.order_by('-score').values_list(
+            'post_id', 'score'
+        )[:settings.TRENDING_SIZE]
+    )
+
+
+def top_posts(limit):
+    """Return [(post_id, log_score)] of the best posts, best first."""
+    board = cached_compute(BOARD_KEY, load_board, ttl=settings.TRENDING_BOARD_TTL)
+    return board[:limit]
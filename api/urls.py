@@ -6,13 +6,25 @@ from .views import (
     MeView,
     MemberListView,
     MemberDetailView,
+    AvatarUploadView,
+    MemberExportView,
     FriendToggleView,
     PostListCreateView,
     PostDetailView,
+    TrendingPostsView,
+    PostSearchView,
     PostLikeView,
     CommentListCreateView,
-    CommentDeleteView
+    CommentDeleteView,
+    HashtagTimelineView,
+    MentionListView,
+    NotificationListView,
+    NotificationUnreadView,
+    NotificationReadView,
+    ProfileSamplesView,
+    ProfileDownloadView
 )
+from .streams import feed_events
 
 urlpatterns = [
     # Authentication endpoints
@@ -23,15 +35,35 @@ urlpatterns = [
     
     # Members endpoints
     path('members', MemberListView.as_view(), name='member-list'),
-    path('members/<int:pk>', MemberDetailView.as_view(), name='member-detail'),
-    path('members/<int:pk>/friend', FriendToggleView.as_view(), name='friend-toggle'),
+    path('members/<int:id>', MemberDetailView.as_view(), name='member-detail'),
+    path('members/<int:id>/avatar', AvatarUploadView.as_view(), name='member-avatar'),
+    path('members/<int:id>/export', MemberExportView.as_view(), name='member-export'),
+    path('members/<int:id>/friend', FriendToggleView.as_view(), name='friend-toggle'),
     
     # Posts endpoints
     path('posts', PostListCreateView.as_view(), name='post-list-create'),
-    path('posts/<int:pk>', PostDetailView.as_view(), name='post-detail'),
-    path('posts/<int:pk>/like', PostLikeView.as_view(), name='post-like'),
+    path('posts/trending', TrendingPostsView.as_view(), name='post-trending'),
+    path('posts/search', PostSearchView.as_view(), name='post-search'),
+    path('posts/<int:id>', PostDetailView.as_view(), name='post-detail'),
+    path('posts/<int:id>/like', PostLikeView.as_view(), name='post-like'),
     
     # Comments endpoints
-    path('posts/<int:pk>/comments', CommentListCreateView.as_view(), name='comment-list-create'),
-    path('comments/<int:pk>', CommentDeleteView.as_view(), name='comment-delete'),
+    path('posts/<int:id>/comments', CommentListCreateView.as_view(), name='comment-list-create'),
+    path('comments/<int:id>', CommentDeleteView.as_view(), name='comment-delete'),
+    
+    # Hashtag and mention endpoints
+    path('hashtags/<str:name>/posts', HashtagTimelineView.as_view(), name='hashtag-posts'),
+    path('mentions', MentionListView.as_view(), name='mention-list'),
+    
+    # Notifications endpoints
+    path('notifications', NotificationListView.as_view(), name='notification-list'),
+    path('notifications/unread', NotificationUnreadView.as_view(), name='notification-unread'),
+    path('notifications/read', NotificationReadView.as_view(), name='notification-read'),
+    
+    # Real-time events endpoint (ASGI only)
+    path('events', feed_events, name='feed-events'),
+
+    # Profiling endpoints (token holders and admin staff)
+    path('profiling/samples', ProfileSamplesView.as_view(), name='profiling-samples'),
+    path('profiling/requests/<str:profile_id>', ProfileDownloadView.as_view(), name='profiling-request'),
 ]
@@ -1,9 +1,20 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from .models import Member, Post, Comment, Like, Friendship
+from .models import (
+    ArchivedComment,
+    ArchivedLike,
+    ArchivedPost,
+    Comment,
+    Friendship,
+    Like,
+    Member,
+    Notification,
+    Post
+)
 from .serializers import (
     RegisterSerializer,
     LoginSerializer,
@@ -11,15 +22,86 @@ from .serializers import (
     MemberUpdateSerializer,
     PostSerializer,
     PostCreateSerializer,
+    TrendingPostSerializer,
     CommentSerializer,
-    CommentCreateSerializer
+    CommentCreateSerializer,
+    NotificationSerializer,
+    annotate_post_stats,
+    member_stats_context
 )
 from .authentication import (
     CookieAuthentication,
     IsAuthenticatedMember,
     set_auth_cookie,
-    clear_auth_cookie
+    clear_auth_cookie,
+    revoke_sessions
+)
+from .archive import feed_page, find_post, restore_post
+from .events import publish_post_event
+from .deletion import soft_delete_member, soft_delete_post
+from .export import EXPORT_FORMATS, export_filename, stream_export
+from .friends import friend_added, friend_removed, is_friend, visible_to
+from .media import AvatarError, avatar_url, save_avatar
+from .notifications import inbox_page, mark_read, notify
+from .profiling import (
+    IsProfilingAllowed,
+    aggregated_samples,
+    format_collapsed,
+    get_sampler,
+    profile_path
 )
+from .routers import ReplicaReadMixin
+from .search import filter_members, search_posts
+from .sharding import aliases, get_by_id, in_bulk, live_members, shard_of, using
+from .tags import mentions_of, tag_timeline
+from .threads import delete_thread, thread_page
+from .singleflight import cached_compute, invalidate
+from .trending import forget_post, record_like, remove_like, top_posts
+from .throttling import (
+    LoginRateThrottle,
+    RegisterRateThrottle,
+    LikeRateThrottle,
+    CommentRateThrottle
+)
+
+
+def live_post_or_404(id):
+    """
+    The hot post with id, for views about to write to it: an archived post
+    is moved back first (see api.archive).
+    """
+    post = get_by_id(Post.objects, id)
+    if post is None and restore_post(id):
+        post = get_by_id(Post.objects, id)
+    if post is None:
+        raise Http404
+    return post
+
+
+def live_comment_or_404(id):
+    """The hot comment with id, restoring its post from the archive if needed."""
+    comment = get_by_id(Comment.objects, id)
+    if comment is None:
+        archived = get_by_id(ArchivedComment.objects, id)
+        if archived is not None and restore_post(archived.post_id):
+            comment = get_by_id(Comment.objects, id)
+    if comment is None:
+        raise Http404
+    return comment
+
+
+def set_next_link(response, request, next_cursor, **params):
+    """Link the next page of a list response, if there is one."""
+    if next_cursor:
+        query = request.query_params.copy()
+        query['cursor'] = next_cursor
+        for name, value in params.items():
+            query[name] = value
+        response['Link'] = '<{}?{}>; rel="next"'.format(
+            request.build_absolute_uri(request.path),
+            query.urlencode()
+        )
+    return response
 
 
 class RegisterView(APIView):
@@ -28,6 +110,8 @@ class RegisterView(APIView):
     """
     authentication_classes = []
     permission_classes = []
+    throttle_classes = [RegisterRateThrottle]
+    query_budget = {'post': 3}
 
     def post(self, request):
         """Register a new member."""
@@ -51,6 +135,8 @@ class LoginView(APIView):
     """
     authentication_classes = []
     permission_classes = []
+    throttle_classes = [LoginRateThrottle]
+    query_budget = {'post': 2}
 
     def post(self, request):
         """Authenticate member and set session cookie."""
@@ -69,7 +155,7 @@ class LoginView(APIView):
                         'last_name': member.last_name
                     }
                     response = Response(response_data, status=status.HTTP_200_OK)
-                    set_auth_cookie(response, member.id)
+                    set_auth_cookie(response, member)
                     return response
             except Member.DoesNotExist:
                 pass
@@ -87,9 +173,11 @@ class LogoutView(APIView):
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    query_budget = {'post': 2}
 
     def post(self, request):
-        """End current session and clear cookie."""
+        """End the member's sessions and clear cookie."""
+        revoke_sessions(request.user)
         response = Response(
             {'message': 'Successfully logged out'},
             status=status.HTTP_200_OK
@@ -98,12 +186,13 @@ class LogoutView(APIView):
         return response
 
 
-class MeView(APIView):
+class MeView(ReplicaReadMixin, APIView):
     """
     API endpoint to get current member information.
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 3}
 
     def get(self, request):
         """Retrieve current member information."""
@@ -111,46 +200,56 @@ class MeView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class MemberListView(APIView):
+class MemberListView(ReplicaReadMixin, APIView):
     """
     API endpoint to search and list members.
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 5}
 
     def get(self, request):
         """Search members by name or email."""
         search_query = request.query_params.get('search', '')
         
-        members = Member.objects.all()
-        
-        if search_query:
-            members = members.filter(
-                Q(first_name__icontains=search_query) |
-                Q(last_name__icontains=search_query) |
-                Q(email__icontains=search_query)
-            )
+        members = filter_members(Member.objects.all(), search_query)
         
+        members = list(members.order_by('-created_at', '-id'))
         serializer = MemberSerializer(
             members,
             many=True,
-            context={'request': request}
+            context=member_stats_context(request, members)
         )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class MemberDetailView(APIView):
+def member_data(id, shared=True):
     """
-    API endpoint to get or update member profile.
+    Member id's profile without is_friend, shared through the cache unless
+    shared is false.
+    """
+    def compute():
+        return MemberSerializer(get_object_or_404(Member, id=id)).data
+    return cached_compute(f'member:{id}', compute) if shared else compute()
+
+
+class MemberDetailView(ReplicaReadMixin, APIView):
+    """
+    API endpoint to get, update or delete member profile.
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 5, 'put': 6, 'delete': 10}
 
     def get(self, request, id):
         """Retrieve member profile by ID."""
-        member = get_object_or_404(Member, id=id)
-        serializer = MemberSerializer(member, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # The viewer-independent part is shared through the cache; only
+        # is_friend is computed per request. A member pinned to the primary
+        # skips the cache, which a lagging replica may have refilled since
+        # their write.
+        data = dict(member_data(id, shared=not self.pinned))
+        data['is_friend'] = is_friend(request.user.id, id)
+        return Response(data, status=status.HTTP_200_OK)
 
     def put(self, request, id):
         """Update member profile (only own profile)."""
@@ -172,6 +271,7 @@ class MemberDetailView(APIView):
         
         if serializer.is_valid():
             serializer.save()
+            invalidate(f'member:{member.id}')
             response_serializer = MemberSerializer(
                 member,
                 context={'request': request}
@@ -180,6 +280,92 @@ class MemberDetailView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def delete(self, request, id):
+        """Delete own account."""
+        member = get_object_or_404(Member, id=id)
+        
+        if request.user.id != member.id:
+            return Response(
+                {'error': 'Cannot delete other member\'s account'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        soft_delete_member(member)
+        invalidate(f'member:{member.id}')
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        clear_auth_cookie(response)
+        return response
+
+
+class AvatarUploadView(APIView):
+    """
+    API endpoint to upload a member avatar.
+    """
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+    query_budget = {'put': 5}
+
+    def put(self, request, id):
+        """Upload own avatar as the raw image request body."""
+        member = get_object_or_404(Member, id=id)
+        
+        if request.user.id != member.id:
+            return Response(
+                {'error': 'Cannot update other member\'s avatar'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            # Read the underlying Django request so the body is streamed
+            # instead of being parsed into memory by DRF.
+            key = save_avatar(request._request)
+        except AvatarError as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        member.avatar_key = key
+        member.avatar = avatar_url(key)
+        member.save(update_fields=['avatar_key', 'avatar'])
+        invalidate(f'member:{member.id}')
+        serializer = MemberSerializer(member, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class MemberExportView(APIView):
+    """
+    API endpoint to download all of a member's data.
+    """
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 9}
+
+    def get(self, request, id):
+        """Stream own profile, posts, comments, likes and friendships."""
+        if request.user.id != id:
+            return Response(
+                {'error': 'Cannot export other member\'s data'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        # Not "format": DRF reserves it for content negotiation.
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': 'output must be one of: ' + ', '.join(EXPORT_FORMATS)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            stream_export(id, export_format),
+            content_type=EXPORT_FORMATS[export_format][0]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{export_filename(id, export_format)}"'
+        )
+        return response
+
 
 class FriendToggleView(APIView):
     """
@@ -187,6 +373,7 @@ class FriendToggleView(APIView):
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    query_budget = {'post': 5}
 
     def post(self, request, id):
         """Toggle friendship with another member."""
@@ -208,6 +395,8 @@ class FriendToggleView(APIView):
         if friendship:
             # Remove friendship
             friendship.delete()
+            friend_removed(request.user.id, friend.id)
+            invalidate(f'member:{request.user.id}')
             return Response(
                 {
                     'is_friend': False,
@@ -221,6 +410,9 @@ class FriendToggleView(APIView):
                 member=request.user,
                 friend=friend
             )
+            friend_added(request.user.id, friend.id)
+            invalidate(f'member:{request.user.id}')
+            notify(friend.id, request.user, Notification.KIND_FRIEND)
             return Response(
                 {
                     'is_friend': True,
@@ -230,31 +422,71 @@ class FriendToggleView(APIView):
             )
 
 
-class PostListCreateView(APIView):
+class PostListCreateView(ReplicaReadMixin, APIView):
     """
     API endpoint to list news feed and create posts.
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 4, 'post': 12}
 
     def get(self, request):
-        """Get news feed (posts from friends and own posts)."""
-        # Get list of friend IDs
-        friend_ids = Friendship.objects.filter(
-            member=request.user
-        ).values_list('friend_id', flat=True)
-        
-        # Get posts from friends and own posts
-        posts = Post.objects.filter(
-            Q(author=request.user) | Q(author_id__in=friend_ids)
-        ).order_by('-created_at')
+        """
+        Get news feed (posts from friends and own posts), newest first.
+        Without limit or cursor, every post including archived ones; pages
+        continue into archived posts through the Link header.
+        """
+        cursor = request.query_params.get('cursor')
+        limit = None
+        if 'limit' in request.query_params or cursor:
+            try:
+                limit = int(request.query_params.get('limit', settings.FEED_PAGE_SIZE))
+            except ValueError:
+                return Response(
+                    {'error': 'limit must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            limit = max(1, min(limit, settings.FEED_MAX_PAGE_SIZE))
+
+        try:
+            visible = visible_to(request.user)
+            posts, next_cursor = feed_page(
+                [
+                    annotate_post_stats(
+                        using(Post.objects, alias).filter(visible),
+                        request.user
+                    )
+                    for alias in aliases()
+                ],
+                [
+                    annotate_post_stats(
+                        using(ArchivedPost.objects, alias).filter(visible),
+                        request.user,
+                        archived=True
+                    )
+                    for alias in aliases()
+                ],
+                limit=limit,
+                cursor=cursor
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         serializer = PostSerializer(
             posts,
             many=True,
-            context={'request': request}
+            context=member_stats_context(request, [post.author for post in posts])
+        )
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_next_link(
+            response,
+            request,
+            next_cursor,
+            limit=limit or settings.FEED_PAGE_SIZE
         )
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
     def post(self, request):
         """Create a new post."""
@@ -277,22 +509,105 @@ class PostListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class PostSearchView(ReplicaReadMixin, APIView):
+    """
+    API endpoint to search the posts visible in the news feed.
+    """
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 5}
+
+    def get(self, request):
+        """Get own and friends' posts matching q, best match first."""
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.SEARCH_PAGE_SIZE
+            ))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.SEARCH_MAX_PAGE_SIZE))
+
+        try:
+            ranks, next_cursor = search_posts(
+                request.user,
+                request.query_params.get('q', ''),
+                limit,
+                request.query_params.get('cursor')
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        posts_by_id = in_bulk(
+            annotate_post_stats(Post.objects, request.user),
+            list(ranks)
+        )
+        posts = [
+            posts_by_id[post_id]
+            for post_id in ranks
+            if post_id in posts_by_id
+        ]
+
+        serializer = PostSerializer(
+            posts,
+            many=True,
+            context=member_stats_context(request, [post.author for post in posts])
+        )
+        return Response(
+            {'next_cursor': next_cursor, 'results': serializer.data},
+            status=status.HTTP_200_OK
+        )
+
+
 class PostDetailView(APIView):
     """
     API endpoint to get or delete a specific post.
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 8, 'delete': 10}
 
     def get(self, request, id):
         """Retrieve a specific post by ID."""
-        post = get_object_or_404(Post, id=id)
-        serializer = PostSerializer(post, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Shared through the cache without the viewer-dependent fields,
+        # which are filled in per request. The author is read from their
+        # own entry, which profile updates invalidate.
+        data = dict(cached_compute(f'post:{id}', lambda: self.shared_data(id)))
+        like_model = ArchivedLike if data.pop('archived') else Like
+        alias = data.pop('shard', None)
+        author = dict(member_data(data.pop('author_id')))
+        author['is_friend'] = is_friend(request.user.id, author['id'])
+        data['author'] = author
+        data['is_liked'] = using(like_model.objects, alias).filter(
+            member=request.user,
+            post_id=id
+        ).exists()
+        return Response(data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def shared_data(id):
+        post = find_post(
+            id,
+            cold=annotate_post_stats(ArchivedPost.objects, None, archived=True)
+        )
+        if post is None:
+            raise Http404
+        serializer = PostSerializer(post)
+        del serializer.fields['author']
+        return {
+            **serializer.data,
+            'author_id': post.author_id,
+            'archived': isinstance(post, ArchivedPost),
+            'shard': shard_of(post)
+        }
 
     def delete(self, request, id):
         """Delete own post."""
-        post = get_object_or_404(Post, id=id)
+        post = live_post_or_404(id)
         
         # Check if user is the author
         if post.author.id != request.user.id:
@@ -301,23 +616,65 @@ class PostDetailView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        post.delete()
+        soft_delete_post(post)
+        forget_post(post.id)
+        invalidate(f'post:{post.id}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class TrendingPostsView(ReplicaReadMixin, APIView):
+    """
+    API endpoint to list trending posts.
+    """
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 4}
+
+    def get(self, request):
+        """Get the posts with the highest time-decayed activity."""
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.TRENDING_SIZE))
+
+        scores = dict(top_posts(limit))
+        posts_by_id = in_bulk(
+            annotate_post_stats(Post.objects, request.user),
+            list(scores)
+        )
+        posts = [
+            posts_by_id[post_id]
+            for post_id in scores
+            if post_id in posts_by_id
+        ]
+
+        context = member_stats_context(request, [post.author for post in posts])
+        context['scores'] = scores
+        serializer = TrendingPostSerializer(posts, many=True, context=context)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class PostLikeView(APIView):
     """
     API endpoint to toggle like on a post.
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    throttle_classes = [LikeRateThrottle]
+    query_budget = {'post': 8}
 
     def post(self, request, id):
         """Like or unlike a post."""
-        post = get_object_or_404(Post, id=id)
+        post = live_post_or_404(id)
+        likes = using(Like.objects, shard_of(post))
+        live_likes = likes.filter(*live_members('member'))
         
         # Check if like exists
-        like = Like.objects.filter(
+        like = likes.filter(
             member=request.user,
             post=post
         ).first()
@@ -325,7 +682,9 @@ class PostLikeView(APIView):
         if like:
             # Unlike
             like.delete()
-            likes_count = Like.objects.filter(post=post).count()
+            remove_like(post.id, like.created_at)
+            invalidate(f'post:{post.id}')
+            likes_count = live_likes.filter(post=post).count()
             return Response(
                 {
                     'is_liked': False,
@@ -336,11 +695,20 @@ class PostLikeView(APIView):
             )
         else:
             # Like
-            Like.objects.create(
+            like = likes.create(
                 member=request.user,
                 post=post
             )
-            likes_count = Like.objects.filter(post=post).count()
+            invalidate(f'post:{post.id}')
+            likes_count = live_likes.filter(post=post).count()
+            record_like(post.id, like.created_at)
+            notify(post.author_id, request.user, Notification.KIND_LIKE, post=post)
+            publish_post_event(
+                'post_liked',
+                post,
+                request.user,
+                likes_count=likes_count
+            )
             return Response(
                 {
                     'is_liked': True,
@@ -351,35 +719,84 @@ class PostLikeView(APIView):
             )
 
 
-class CommentListCreateView(APIView):
+class CommentListCreateView(ReplicaReadMixin, APIView):
     """
     API endpoint to list and create comments on a post.
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    throttle_classes = [CommentRateThrottle]
+    query_budget = {'get': 6, 'post': 15}
 
     def get(self, request, id):
-        """Get all comments for a specific post."""
-        post = get_object_or_404(Post, id=id)
-        comments = Comment.objects.filter(post=post).order_by('created_at')
+        """
+        Get a post's comment threads in display order, or the replies to
+        one comment (parent), optionally depth-limited and paged; the next
+        page is linked in the Link header.
+        """
+        post = find_post(id)
+        if post is None:
+            raise Http404
+        model = ArchivedComment if isinstance(post, ArchivedPost) else Comment
+        try:
+            options = {
+                name: int(request.query_params[name])
+                for name in ('parent', 'depth', 'limit')
+                if name in request.query_params
+            }
+        except ValueError:
+            return Response(
+                {'error': 'parent, depth and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        root = None
+        if 'parent' in options:
+            root = get_object_or_404(
+                using(model.objects, shard_of(post)),
+                id=options['parent'],
+                post_id=post.id
+            )
+        limit = options.get('limit')
+        if limit is not None:
+            limit = max(1, min(limit, settings.COMMENT_MAX_PAGE_SIZE))
+
+        try:
+            comments, next_cursor = thread_page(
+                post,
+                root=root,
+                depth=max(1, options['depth']) if 'depth' in options else None,
+                limit=limit,
+                cursor=request.query_params.get('cursor'),
+                model=model
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         serializer = CommentSerializer(
             comments,
             many=True,
-            context={'request': request}
+            context=member_stats_context(
+                request,
+                [comment.author for comment in comments]
+            )
         )
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_next_link(response, request, next_cursor)
 
     def post(self, request, id):
         """Create a new comment on a post."""
-        post = get_object_or_404(Post, id=id)
+        post = live_post_or_404(id)
         
         serializer = CommentCreateSerializer(
             data=request.data,
-            context={'request': request, 'post_id': post.id}
+            context={'request': request, 'post_id': post.id, 'post': post}
         )
         
         if serializer.is_valid():
             comment = serializer.save()
+            invalidate(f'post:{post.id}')
             response_serializer = CommentSerializer(
                 comment,
                 context={'request': request}
@@ -398,10 +815,11 @@ class CommentDeleteView(APIView):
     """
     authentication_classes = [CookieAuthentication]
     permission_classes = [IsAuthenticatedMember]
+    query_budget = {'delete': 9}
 
     def delete(self, request, id):
-        """Delete own comment."""
-        comment = get_object_or_404(Comment, id=id)
+        """Delete own comment with its replies."""
+        comment = live_comment_or_404(id)
         
         # Check if user is the author
         if comment.author.id != request.user.id:
@@ -410,5 +828,238 @@ class CommentDeleteView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        comment.delete()
+        delete_thread(comment)
+        invalidate(f'post:{comment.post_id}')
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def reference_page(request, references, next_cursor):
+    """Response data for a page of hashtag uses or mentions."""
+    posts_by_id = in_bulk(
+        annotate_post_stats(Post.objects, request.user),
+        [reference['post_id'] for reference in references]
+    )
+    posts = list(posts_by_id.values())
+    post_data = dict(zip(
+        posts_by_id,
+        PostSerializer(
+            posts,
+            many=True,
+            context=member_stats_context(request, [post.author for post in posts])
+        ).data
+    ))
+    return {
+        'next_cursor': next_cursor,
+        'results': [
+            {
+                'post': post_data[reference['post_id']],
+                'comment_id': reference['comment_id'],
+                'created_at': reference['created_at']
+            }
+            for reference in references
+            if reference['post_id'] in post_data
+        ]
+    }
+
+
+class HashtagTimelineView(ReplicaReadMixin, APIView):
+    """
+    API endpoint to list the own and friends' posts using a hashtag.
+    """
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 5}
+
+    def get(self, request, name):
+        """Get posts and comments tagged with name, newest first."""
+        try:
+            limit = int(request.query_params.get('limit', settings.TAG_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.TAG_MAX_PAGE_SIZE))
+
+        try:
+            references, next_cursor = tag_timeline(
+                request.user,
+                name,
+                limit,
+                request.query_params.get('cursor')
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            reference_page(request, references, next_cursor),
+            status=status.HTTP_200_OK
+        )
+
+
+class MentionListView(ReplicaReadMixin, APIView):
+    """
+    API endpoint to list the posts and comments mentioning the current member.
+    """
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 5}
+
+    def get(self, request):
+        """Get mentions of the current member, newest first."""
+        try:
+            limit = int(request.query_params.get('limit', settings.TAG_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.TAG_MAX_PAGE_SIZE))
+
+        try:
+            references, next_cursor = mentions_of(
+                request.user,
+                limit,
+                request.query_params.get('cursor')
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            reference_page(request, references, next_cursor),
+            status=status.HTTP_200_OK
+        )
+
+
+class NotificationListView(ReplicaReadMixin, APIView):
+    """
+    API endpoint to page through the current member's notifications.
+    """
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 3}
+
+    def get(self, request):
+        """Get notifications, newest activity first, with the unread count."""
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.NOTIFICATION_PAGE_SIZE
+            ))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.NOTIFICATION_MAX_PAGE_SIZE))
+
+        try:
+            notifications, next_cursor = inbox_page(
+                request.user,
+                limit,
+                request.query_params.get('cursor')
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            {
+                'unread_count': request.user.unread_notifications,
+                'next_cursor': next_cursor,
+                'results': NotificationSerializer(notifications, many=True).data
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class NotificationUnreadView(APIView):
+    """
+    API endpoint to get the notification badge count.
+    """
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+    query_budget = {'get': 2}
+
+    def get(self, request):
+        """Get the number of unread notifications."""
+        return Response(
+            {'unread_count': request.user.unread_notifications},
+            status=status.HTTP_200_OK
+        )
+
+
+class NotificationReadView(APIView):
+    """
+    API endpoint to mark notifications as read.
+    """
+    authentication_classes = [CookieAuthentication]
+    permission_classes = [IsAuthenticatedMember]
+    query_budget = {'post': 6}
+
+    def post(self, request):
+        """Mark the given notification ids, or all notifications, read."""
+        ids = request.data.get('ids')
+        if ids is not None and (
+            not isinstance(ids, list)
+            or not all(isinstance(value, int) for value in ids)
+        ):
+            return Response(
+                {'error': 'ids must be a list of integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        marked = mark_read(request.user, ids)
+        return Response(
+            {
+                'marked': marked,
+                'unread_count': request.user.unread_notifications
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class ProfileSamplesView(APIView):
+    """
+    API endpoint to download the always-on sampler's stacks of all workers.
+    """
+    authentication_classes = []
+    permission_classes = [IsProfilingAllowed]
+    query_budget = {'get': 2}
+
+    def get(self, request):
+        """Get collapsed stacks, optionally of one view class."""
+        sampler = get_sampler()
+        if sampler is not None:
+            sampler.flush()
+        counts = aggregated_samples(request.query_params.get('view'))
+        return HttpResponse(
+            format_collapsed(counts),
+            content_type='text/plain; charset=utf-8'
+        )
+
+
+class ProfileDownloadView(APIView):
+    """
+    API endpoint to download the profile of a single request.
+    """
+    authentication_classes = []
+    permission_classes = [IsProfilingAllowed]
+    query_budget = {'get': 2}
+
+    def get(self, request, profile_id):
+        """Get a stored collapsed-stack or pstats profile."""
+        path = profile_path(profile_id)
+        try:
+            profile = open(path, 'rb') if path else None
+        except FileNotFoundError:
+            profile = None
+        if profile is None:
+            return Response(
+                {'error': 'Profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return FileResponse(profile, as_attachment=True, filename=profile_id)
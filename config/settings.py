@@ -82,6 +82,9 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "api.authentication.CookieAuthentication",
     ],
+    # nginx appends the client address to X-Forwarded-For; throttles key
+    # anonymous clients on that entry, not on ones the client sent.
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", "1")),
 }
 
 # drf-spectacular configuration
@@ -94,14 +97,29 @@ SPECTACULAR_SETTINGS = {
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "api.compression.CompressionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "api.middleware.BrowserMiddleware",
+    "api.routers.PrimaryPinningMiddleware",
+    "api.profiling.ProfilingMiddleware",
+]
+
+# Run by api.middleware.BrowserMiddleware for everything outside
+# API_PATH_PREFIX (the admin): the JSON API uses CookieAuthentication and
+# never touches sessions, messages or CSRF tokens.
+API_PATH_PREFIX = "/api/"
+BROWSER_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# The admin checks look for its middleware in MIDDLEWARE only; it runs
+# from BROWSER_MIDDLEWARE for the admin's paths.
+SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -119,7 +137,37 @@ TEMPLATES = [
     },
 ]
 
+# Lean production startup (DJANGO_LEAN_STARTUP=1): the API authenticates
+# with CookieAuthentication only, so the admin, sessions and messages are
+# not loaded, and the OpenAPI schema is generated at build time instead of
+# loading drf_spectacular in every worker.
+LEAN_STARTUP = os.environ.get("DJANGO_LEAN_STARTUP") == "1"
+
+if LEAN_STARTUP:
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS
+        if app not in (
+            "django.contrib.admin",
+            "django.contrib.sessions",
+            "django.contrib.messages",
+            "drf_spectacular",
+        )
+    ]
+    BROWSER_MIDDLEWARE = [
+        middleware for middleware in BROWSER_MIDDLEWARE
+        if middleware not in (
+            "django.contrib.sessions.middleware.SessionMiddleware",
+            "django.contrib.auth.middleware.AuthenticationMiddleware",
+            "django.contrib.messages.middleware.MessageMiddleware",
+        )
+    ]
+    TEMPLATES[0]["OPTIONS"]["context_processors"] = [
+        "django.template.context_processors.request",
+    ]
+    del REST_FRAMEWORK["DEFAULT_SCHEMA_CLASS"]
+
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
 
 
 # Database
@@ -128,11 +176,277 @@ WSGI_APPLICATION = "config.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "persistent" / "db" / "db.sqlite3",
+        # DJANGO_DB_PATH points a server at another file, e.g. the seeded
+        # database of `manage.py loadtest`.
+        "NAME": os.environ.get("DJANGO_DB_PATH") or BASE_DIR / "persistent" / "db" / "db.sqlite3",
+        # WAL lets readers, including online backups, run alongside a
+        # writer. SQLITE_JOURNAL_MODE=delete restores the rollback journal.
+        "OPTIONS": {
+            "init_command": "PRAGMA journal_mode={};".format(
+                os.environ.get("SQLITE_JOURNAL_MODE", "wal")
+            ),
+        },
+    }
+}
+
+# Read replicas: comma-separated paths of read-only SQLite copies. Other
+# engines (e.g. Postgres replicas) can be added to DATABASES directly and
+# listed in DATABASE_REPLICAS. Copies of the WAL-mode primary need
+# `PRAGMA journal_mode=delete` before they can be opened read-only.
+DATABASE_REPLICAS = []
+for index, path in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICA_PATHS", "").split(","))
+):
+    alias = f"replica{index + 1}"
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"file:{path.strip()}?mode=ro",
+        "TEST": {"MIRROR": "default"},
     }
+    DATABASE_REPLICAS.append(alias)
+
+# Shards (api.sharding): comma-separated paths of SQLite files holding, with
+# the primary (shard 0), posts and their likes, comments and references,
+# spread by author. Each shard allocates ids from its own range of
+# DATABASE_SHARD_ID_SPAN; comment ids must stay below 16**8. Rows on the
+# other shards reference members kept on the primary, which SQLite cannot
+# check, so those shards use a backend that does not enforce foreign keys;
+# the primary keeps enforcing them.
+SHARD_ENGINE = "api.backends.sqlite3"
+DATABASE_SHARDS = []
+DATABASE_SHARD_ID_SPAN = int(os.environ.get("DATABASE_SHARD_ID_SPAN", str(2 ** 28)))
+for index, path in enumerate(
+    filter(None, os.environ.get("DATABASE_SHARD_PATHS", "").split(","))
+):
+    alias = f"shard{index + 1}"
+    DATABASES[alias] = {
+        "ENGINE": SHARD_ENGINE,
+        "NAME": path.strip(),
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+    }
+    DATABASE_SHARDS.append(alias)
+if DATABASE_SHARDS:
+    DATABASE_SHARDS.insert(0, "default")
+# Posts moved per transaction by `manage.py rebalance_shards`.
+DATABASE_SHARD_REBALANCE_BATCH_SIZE = 500
+
+DATABASE_ROUTERS = ["api.routers.ShardRouter", "api.routers.ReplicaRouter"]
+
+# Members who just wrote read from the primary for this many seconds. The
+# pin is kept in a cache every worker reads, so it holds wherever the
+# member's next request lands.
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", "5"))
+REPLICA_PIN_CACHE_ALIAS = os.environ.get("REPLICA_PIN_CACHE_ALIAS", "shared")
+# Workers add their per-alias read counts to totals in the same cache this
+# often (`manage.py replica_status` shows them).
+REPLICA_USAGE_FLUSH_SECONDS = 10
+
+
+# Caches: "default" is per process. "shared" (api.cache) is one SQLite file
+# read and written by every gunicorn worker and the ASGI server, for state
+# they must agree on; the *_CACHE_ALIAS settings below that name it are
+# checked to be shared (api.checks). DJANGO_CACHE_PATH moves the file.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "api.cache.SQLiteCache",
+        "LOCATION": os.environ.get("DJANGO_CACHE_PATH") or BASE_DIR / "persistent" / "cache" / "cache.sqlite3",
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    },
 }
 
 
+# Real-time feed events (server-sent events, served by config.asgi)
+# EVENTS_BROKER selects the pub/sub backend: "api.events.CacheBroker" relays
+# events from the gunicorn workers that publish them to the ASGI server
+# (uvicorn, see supervisord.conf) streaming them, through the cache named by
+# EVENTS_CACHE_ALIAS; "api.events.LocalBroker" keeps them inside one
+# process, for a single ASGI process serving everything.
+
+EVENTS_BROKER = os.environ.get("EVENTS_BROKER", "api.events.CacheBroker")
+EVENTS_CACHE_ALIAS = os.environ.get("EVENTS_CACHE_ALIAS", "shared")
+EVENTS_CACHE_TTL = 60
+EVENTS_POLL_INTERVAL = 0.5
+# A sequence number taken but not written yet is waited for this long.
+EVENTS_GAP_SECONDS = 2
+EVENTS_QUEUE_SIZE = 100
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_RETRY_MS = 3000
+
+
+# Rate limiting (api.throttling)
+# THROTTLE_STORE is "api.throttling.CacheWindowStore" (one budget for all
+# workers, through THROTTLE_CACHE_ALIAS) or "api.throttling.LocalBucketStore"
+# (per worker: the effective limit is multiplied by the worker count).
+
+THROTTLE_STORE = os.environ.get("THROTTLE_STORE", "api.throttling.CacheWindowStore")
+THROTTLE_CACHE_ALIAS = os.environ.get("THROTTLE_CACHE_ALIAS", "shared")
+THROTTLE_MAX_KEYS = 100_000
+THROTTLE_RATES = {
+    "login": "10/min",
+    "register": "5/hour",
+    "like": "60/min",
+    "comment": "20/min",
+}
+
+
+# Trending posts leaderboard (api.trending)
+
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get("TRENDING_HALF_LIFE_HOURS", "6"))
+TRENDING_SIZE = 100
+# The board is reread from post_scores at most this often per worker.
+TRENDING_BOARD_TTL = 10
+
+
+# News feed paging and hot/cold archival (api.archive, manage.py archive_posts)
+
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+# Posts older than this move to the archive tables with their likes and
+# comments when archive_posts runs.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_BATCH_PAUSE = 0.01
+ARCHIVE_CACHE_ALIAS = os.environ.get("ARCHIVE_CACHE_ALIAS", "default")
+# Workers see a new archive run after at most this many seconds.
+ARCHIVE_WATERMARK_TTL = 300
+
+
+# Soft deletion and chunked purging (api.deletion)
+
+DELETION_PURGE_IN_BACKGROUND = os.environ.get("DELETION_PURGE_IN_BACKGROUND", "1") == "1"
+DELETION_CHUNK_SIZE = 5000
+DELETION_CHUNK_PAUSE = 0.01
+# Seconds without progress after which a running job counts as abandoned
+# (its worker was killed) and is run again.
+DELETION_JOB_LEASE = 300
+# A failed job is run again after DELETION_JOB_RETRY_DELAY seconds, doubled
+# after each further failure, until it has been tried
+# DELETION_JOB_MAX_ATTEMPTS times; `purge_deleted --retry-failed` then
+# requeues it.
+DELETION_JOB_RETRY_DELAY = 60
+DELETION_JOB_MAX_ATTEMPTS = 5
+
+
+# Avatar uploads (api.media)
+
+AVATAR_MAX_BYTES = 5 * 1024 * 1024
+# Avatars are written here until validated, outside MEDIA_ROOT (served by
+# nginx) but on the same filesystem, so they are moved into it atomically.
+AVATAR_STAGING_DIR = BASE_DIR / "persistent" / "uploads"
+AVATAR_SIZES = (64, 256)
+AVATAR_THUMBNAIL_WORKERS = int(os.environ.get("AVATAR_THUMBNAIL_WORKERS", "2"))
+
+
+# Cached friend-id sets (api.friends)
+
+FRIEND_CACHE_ALIAS = os.environ.get("FRIEND_CACHE_ALIAS", "shared")
+FRIEND_CACHE_TTL = 60 * 60
+# A worker rereads the shared cache after this many seconds, so friend
+# changes made through another worker can take this long to show up there.
+FRIEND_CACHE_LOCAL_TTL = 5
+FRIEND_CACHE_LOCAL_SIZE = 10_000
+# Larger sets are filtered with a subquery rather than inlined ids: past
+# about a hundred ids, building and planning the longer IN list costs more
+# than the indexed subquery (manage.py benchmark friends).
+FRIEND_CACHE_MAX_INLINE = 100
+
+
+# Request coalescing for member and post detail reads (api.singleflight)
+
+SINGLEFLIGHT_CACHE_ALIAS = os.environ.get("SINGLEFLIGHT_CACHE_ALIAS", "shared")
+SINGLEFLIGHT_TTL = 30
+SINGLEFLIGHT_LOCK_TIMEOUT = 5
+# XFetch beta: > 1 refreshes earlier, < 1 later.
+SINGLEFLIGHT_BETA = 1.0
+
+
+# Profiling (api.profiling)
+
+# Sent in X-Profiling-Token to profile requests and download profiles;
+# empty leaves it to Django admin staff, whose session is only loaded
+# outside API_PATH_PREFIX, so API requests then need the token.
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN", "")
+PROFILING_DIR = BASE_DIR / "persistent" / "profiles"
+PROFILING_REQUEST_INTERVAL = 0.001
+# Always-on sampling of every worker, aggregated per view class. Off by
+# default. To turn it on, start the workers with PROFILING_SAMPLER=1 and a
+# PROFILING_TOKEN. Each worker then flushes its stacks under PROFILING_DIR
+# every PROFILING_FLUSH_INTERVAL seconds. GET /api/profiling/samples, sent
+# with that token in X-Profiling-Token, returns every worker's stacks
+# merged; add ?view=<view class> for one view.
+PROFILING_SAMPLER = os.environ.get("PROFILING_SAMPLER", "0") == "1"
+PROFILING_SAMPLE_INTERVAL = float(os.environ.get("PROFILING_SAMPLE_INTERVAL", "0.01"))
+PROFILING_FLUSH_INTERVAL = 30
+
+
+# Online backups (api.backup, manage.py backup_database)
+
+BACKUP_DIR = BASE_DIR / "persistent" / "backups"
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", "7"))
+# 256 pages is 1 MB with the default 4 KB page size: a writer waits for at
+# most one step's copy.
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_PAUSE = 0.005
+BACKUP_MAX_RESTARTS = 3
+
+
+# Streaming member data export (api.export)
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+# Bulk member import (api.imports, manage.py import_members)
+
+IMPORT_BATCH_SIZE = 1000
+
+# Notifications inbox (api.notifications)
+
+NOTIFICATION_PAGE_SIZE = 20
+NOTIFICATION_MAX_PAGE_SIZE = 100
+
+
+# Response compression (api.compression, manage.py precompress_static)
+
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get("RESPONSE_COMPRESSION_MIN_SIZE", "1024"))
+RESPONSE_COMPRESSION_GZIP_LEVEL = int(os.environ.get("RESPONSE_COMPRESSION_GZIP_LEVEL", "6"))
+# Used when the optional brotli package is installed.
+RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.environ.get("RESPONSE_COMPRESSION_BROTLI_QUALITY", "5"))
+RESPONSE_COMPRESSION_TYPES = ["application/json", "text/html", "text/plain"]
+# Built assets that nginx serves with gzip_static.
+STATIC_PRECOMPRESS_DIRS = [BASE_DIR / "react" / "build", STATIC_ROOT]
+STATIC_PRECOMPRESS_EXTENSIONS = [
+    ".js", ".css", ".html", ".json", ".map", ".svg", ".txt", ".yml", ".ico",
+]
+STATIC_PRECOMPRESS_MIN_SIZE = 1024
+
+
+# Threaded comments (api.threads)
+
+# Levels of replies allowed, at most 31: paths are 8 characters per level
+# in a 255-character column.
+COMMENT_MAX_DEPTH = 16
+COMMENT_MAX_PAGE_SIZE = 200
+
+
+# Hashtags and mentions (api.tags, manage.py backfill_tags)
+
+TAG_PAGE_SIZE = 20
+TAG_MAX_PAGE_SIZE = 100
+TAG_BACKFILL_BATCH_SIZE = 2000
+
+
+# Full-text post search (api.search)
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+# Words beyond this are ignored; every word narrows the match.
+SEARCH_MAX_TERMS = 10
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
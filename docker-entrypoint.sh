@@ -3,28 +3,54 @@ set -euxo pipefail
 
 echo "==> Django Pre-Start Script"
 
-# Remove existing database for fresh start on each deploy
-echo "==> Removing existing database..."
-if [ -f "/app/persistent/db/db.sqlite3" ]; then
-    rm -f /app/persistent/db/db.sqlite3
-    echo "==> Database removed successfully"
+# STARTUP_MODE=production (the image default) keeps the database between
+# deploys, only migrates when the migrations changed and runs the workers
+# with the lean settings (DJANGO_LEAN_STARTUP). STARTUP_MODE=fresh restores
+# the old behaviour: a new database and superuser on every start.
+STARTUP_MODE="${STARTUP_MODE:-production}"
+
+DB_PATH="/app/persistent/db/db.sqlite3"
+MIGRATIONS_STAMP="/app/persistent/db/.migrations-stamp"
+
+if [ "$STARTUP_MODE" = fresh ]; then
+    echo "==> Removing existing database..."
+    if [ -f "$DB_PATH" ]; then
+        rm -f "$DB_PATH" "$DB_PATH-wal" "$DB_PATH-shm" "$MIGRATIONS_STAMP"
+        echo "==> Database removed successfully"
+    else
+        echo "==> No existing database found, creating new one"
+    fi
 else
-    echo "==> No existing database found, creating new one"
+    export DJANGO_LEAN_STARTUP=1
 fi
 
 # Create persistent dirs
 /bin/mkdir -p /app/persistent/db
 /bin/mkdir -p /app/persistent/media
+# Uploads being written (AVATAR_STAGING_DIR); none survive a restart.
+rm -rf /app/persistent/uploads /app/persistent/media/tmp
+/bin/mkdir -p /app/persistent/uploads
+
+# The shared cache (api.cache) starts empty on every start.
+/bin/mkdir -p /app/persistent/cache
+rm -f /app/persistent/cache/cache.sqlite3 /app/persistent/cache/cache.sqlite3-wal /app/persistent/cache/cache.sqlite3-shm
 
-# Run migrations
-echo "==> Running database migrations..."
+[ -f "$DB_PATH" ] && DB_INIT=false || DB_INIT=true
 
-[ -f "/app/persistent/db/db.sqlite3" ] && DB_INIT=false || DB_INIT=true
+# Fingerprint of everything that can add migrations: our migration files,
+# the pinned dependencies and the startup mode (which changes the apps).
+STAMP="$(cat requirements.txt api/migrations/*.py | sha256sum | cut -d' ' -f1)-$STARTUP_MODE"
 
-DJANGO_SETTINGS_MODULE="config.settings" /opt/venv/bin/python \
-    manage.py migrate --noinput
+if [ "$DB_INIT" = false ] && [ -f "$MIGRATIONS_STAMP" ] && [ "$(cat "$MIGRATIONS_STAMP")" = "$STAMP" ]; then
+    echo "==> No pending migrations, skipping migrate"
+else
+    echo "==> Running database migrations..."
+    DJANGO_SETTINGS_MODULE="config.settings" /opt/venv/bin/python \
+        manage.py migrate --noinput
+    echo "$STAMP" > "$MIGRATIONS_STAMP"
+fi
 
-if [ "$DB_INIT" = true ]; then
+if [ "$DB_INIT" = true ] && [ "$STARTUP_MODE" = fresh ]; then
     DJANGO_SETTINGS_MODULE="config.settings" DJANGO_SUPERUSER_PASSWORD="$DJANGO_SUPERUSER_PASSWORD" /opt/venv/bin/python \
         manage.py createsuperuser --noinput \
         --username "$DJANGO_SUPERUSER_USERNAME" \
@@ -35,4 +61,4 @@ fi
 
 echo "==> Pre-start script completed successfully!"
 
-exec /usr/bin/supervisord -c /etc/supervisor/conf.d/supervisord.conf
\ No newline at end of file
+exec /usr/bin/supervisord -c /etc/supervisor/conf.d/supervisord.conf
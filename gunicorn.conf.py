@@ -1,17 +1,126 @@
 """Gunicorn configuration for Docker deployment"""
 
+import importlib.util
+import math
+import os
+import time
+
 # Server socket - bind to different port for nginx upstream
-bind = "127.0.0.1:8001"
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8001")
+
+
+# Worker sizing, from the CPUs and memory the container may actually use
+# (cgroup limits rather than the host's totals). Every value can be pinned
+# through the environment:
+#   GUNICORN_WORKER_CLASS  sync (default), gthread, or an async class such
+#                          as gevent or uvicorn.workers.UvicornWorker when
+#                          that package is installed
+#   GUNICORN_WORKERS, GUNICORN_THREADS, GUNICORN_TIMEOUT
+#   GUNICORN_WORKER_MEMORY_MB  expected RSS of a busy worker
+#   GUNICORN_RESERVED_MEMORY_MB  left for the master, nginx and the page cache
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit():
+    """CPUs available to this container: the cgroup quota or the affinity."""
+    cpus = len(os.sched_getaffinity(0))
+    quota = period = None
+    cpu_max = _read("/sys/fs/cgroup/cpu.max")  # cgroup v2: "quota period"
+    if cpu_max and not cpu_max.startswith("max"):
+        quota, period = (int(value) for value in cpu_max.split())
+    else:  # cgroup v1
+        quota = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        quota = int(quota) if quota and quota != "-1" else None
+        period = int(period) if period else None
+    if quota and period:
+        cpus = min(cpus, max(1, math.ceil(quota / period)))
+    return cpus
+
+
+def memory_limit_mb():
+    """Memory available to this container in MB: the cgroup limit or RAM."""
+    limits = []
+    for path in (
+        "/sys/fs/cgroup/memory.max",
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+    ):
+        value = _read(path)
+        if value and value.isdigit():
+            limits.append(int(value) // (1024 * 1024))
+    meminfo = _read("/proc/meminfo") or ""
+    for line in meminfo.splitlines():
+        if line.startswith("MemTotal:"):
+            limits.append(int(line.split()[1]) // 1024)
+    # Unlimited cgroups report a huge number; the smallest value is real.
+    return min(limits) if limits else None
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def _importable(worker_class):
+    """Whether a worker class's third-party package is installed."""
+    module = {
+        "gevent": "gevent",
+        "eventlet": "eventlet",
+        "tornado": "tornado",
+    }.get(worker_class, worker_class.rpartition(".")[0])
+    return not module or importlib.util.find_spec(module.split(".")[0]) is not None
+
 
-# Worker processes
-workers = 2
-worker_class = "sync"
+def autotune():
+    """Return (worker_class, workers, threads) for this container."""
+    cpus = cpu_limit()
+    worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+    if worker_class not in ("sync", "gthread") and not _importable(worker_class):
+        print(f"[gunicorn.conf] {worker_class} is not installed, using gthread")
+        worker_class = "gthread"
+
+    if worker_class == "sync":
+        # One request per process: cover I/O waits with extra processes.
+        workers, threads = 2 * cpus + 1, 1
+    elif worker_class == "gthread":
+        # Threads overlap database and socket waits; the GIL bounds CPU work
+        # per process, so keep one process per CPU plus one.
+        workers, threads = cpus + 1, 4
+    else:
+        # Async workers multiplex connections within each process.
+        workers, threads = cpus, 1
+
+    memory = memory_limit_mb()
+    if memory:
+        per_worker = _env_int("GUNICORN_WORKER_MEMORY_MB") or 120
+        reserved = _env_int("GUNICORN_RESERVED_MEMORY_MB") or 256
+        workers = min(workers, max(1, (memory - reserved) // per_worker))
+
+    return (
+        worker_class,
+        _env_int("GUNICORN_WORKERS") or workers,
+        _env_int("GUNICORN_THREADS") or threads,
+    )
+
+
+worker_class, workers, threads = autotune()
 worker_connections = 1000
 max_requests = 10000
 max_requests_jitter = 1000
 
-# Timeouts
-timeout = 300
+# Timeouts: a sync worker busy with one request for longer than this is
+# killed, truncating the response. nginx streams bodies both ways
+# unbuffered, so a worker is busy for the whole transfer of a streamed
+# export (/api/members/<id>/export) or an avatar upload on a slow link;
+# keep this at least nginx's 300s proxy_read_timeout/client_body_timeout.
+# gthread and async workers only use it to detect hung processes.
+timeout = _env_int("GUNICORN_TIMEOUT") or 300
 keepalive = 5
 graceful_timeout = 30
 
@@ -36,3 +145,41 @@ limit_request_field_size = 8190
 
 # Preload app for better performance
 preload_app = True
+
+
+# Startup report: how long the master took to load the app and the RSS of
+# each process once ready (see also `manage.py benchmark startup`).
+_started = time.monotonic()
+
+
+def _rss_mb(pid):
+    """Resident set size of a process in MB, from /proc."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def when_ready(server):
+    server.log.info(
+        "Startup report: master pid %s ready in %.2fs, RSS %s MB; "
+        "%s x %s worker(s), %s thread(s) each",
+        server.pid,
+        time.monotonic() - _started,
+        _rss_mb(server.pid),
+        workers,
+        worker_class,
+        threads
+    )
+
+
+def post_worker_init(worker):
+    worker.log.info(
+        "Startup report: worker pid %s RSS %s MB",
+        worker.pid,
+        _rss_mb(worker.pid)
+    )